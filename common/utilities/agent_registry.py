@@ -0,0 +1,197 @@
+"""
+Read access to the agent status registry maintained by status-updater.py.
+
+The registry lives in a project's ``shared-state/`` directory in one of three
+layouts, which take precedence in this order:
+
+  - ``agent-status.db``   SQLite (WAL) database; table ``agents`` holds
+                          ``name``, ``status`` and the JSON ``record``
+  - ``agent-status.d/``   one JSON record per agent, named by the
+                          percent-quoted agent name plus ``.json``
+  - ``agent-status.json`` a single document with ``agents`` and
+                          ``team_metrics``
+
+status-updater.py writes the registry; control-plane.py and
+file-lock-manager.py (and status-updater's federation index) read other
+processes' registries through this module, so the layout and the team
+metric rules are defined once.  Readers never take the registry lock:
+every layout commits atomically, and a registry migrated away mid-read
+falls through to the next layout.
+"""
+
+import json
+import os
+import sqlite3
+from urllib.parse import quote, unquote
+
+# Registry files, relative to the project's shared-state directory
+STATUS_FILE_NAME = "agent-status.json"
+SHARD_DIR_NAME = "agent-status.d"
+STATUS_DB_NAME = "agent-status.db"
+
+# Valid status values
+VALID_STATUSES = {"active", "awaiting", "blocked", "completed", "offline"}
+
+
+def metric_bucket(record):
+    """Return the team_metrics bucket an agent record counts towards.
+
+    Statuses outside ``VALID_STATUSES`` (hand edits, older tools) count as
+    ``offline``.
+    """
+    status = record.get("status", "offline")
+    return status if status in VALID_STATUSES else "offline"
+
+
+def compute_metrics(agents):
+    """Count agent records per status.
+
+    Args:
+        agents (dict): Mapping of agent names to their status records.
+
+    Returns:
+        dict: ``total_agents`` plus one count per valid status.
+    """
+    counts = {s: 0 for s in VALID_STATUSES}
+    for record in agents.values():
+        counts[metric_bucket(record)] += 1
+
+    return {
+        "total_agents": len(agents),
+        "active": counts["active"],
+        "awaiting": counts["awaiting"],
+        "blocked": counts["blocked"],
+        "completed": counts["completed"],
+        "offline": counts["offline"],
+    }
+
+
+def shard_filename(agent_name):
+    """Return the shard file name holding *agent_name*'s record."""
+    return quote(agent_name, safe="") + ".json"
+
+
+def shard_agent_name(filename):
+    """Return the agent a shard file name belongs to, or None if it is not a
+    shard (temporary files from atomic writes start with a dot)."""
+    if not filename.endswith(".json") or filename.startswith("."):
+        return None
+    return unquote(filename[:-len(".json")])
+
+
+def read_shard(path):
+    """Return the record in shard *path*, or None if missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            record = json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError, IOError):
+        return None
+    return record if isinstance(record, dict) else None
+
+
+class ShardReader:
+    """Merges a shard directory, re-parsing only shards that changed.
+
+    Parsed records are kept per file and reused while the file's inode,
+    mtime and size match, so a merge costs one ``stat`` per agent plus a
+    parse of the shards rewritten since the previous merge.  Subclasses can
+    override ``changed`` to track what each merge replaced.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def changed(self, old_record, new_record):
+        """Called for every shard whose record appeared, changed or vanished."""
+
+    def records(self, directory):
+        """Return ``{agent_name: record}`` for every shard in *directory*."""
+        merged = {}
+        seen = set()
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            name = shard_agent_name(entry.name)
+            if name is None:
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            seen.add(entry.path)
+            cached = self._entries.get(entry.path)
+            if cached is None or cached[0] != signature:
+                old_record = cached[1] if cached else None
+                cached = (signature, read_shard(entry.path))
+                self._entries[entry.path] = cached
+                if old_record is not None or cached[1] is not None:
+                    self.changed(old_record, cached[1])
+            if cached[1] is not None:
+                merged[name] = cached[1]
+        for path in set(self._entries) - seen:
+            old_record = self._entries.pop(path)[1]
+            if old_record is not None:
+                self.changed(old_record, None)
+        return merged
+
+
+def read_agents(state_dir, status=None, shards=None, timeout=1.0):
+    """Read every agent record in the registry under *state_dir*.
+
+    Args:
+        state_dir (Path): The project's ``shared-state`` directory.
+        status (str, optional): Only return agents in this metrics bucket.
+        shards (ShardReader, optional): Reader whose cache persists across
+            calls; a fresh one is used otherwise.
+        timeout (float): Seconds to wait for a locked SQLite database.
+
+    Returns:
+        dict: ``{agent_name: record}`` (empty if there is no registry).
+    """
+    db_path = state_dir / STATUS_DB_NAME
+    if db_path.is_file():
+        query = "SELECT name, record FROM agents"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=timeout)
+            try:
+                return {name: json.loads(record)
+                        for name, record in conn.execute(query, params)}
+            finally:
+                conn.close()
+        except (sqlite3.Error, json.JSONDecodeError):
+            pass  # migrated away mid-read; fall through to the other layouts
+
+    shard_dir = state_dir / SHARD_DIR_NAME
+    if shard_dir.is_dir():
+        agents = (shards or ShardReader()).records(shard_dir)
+    else:
+        try:
+            with open(state_dir / STATUS_FILE_NAME, "r", encoding="utf-8") as fh:
+                agents = json.load(fh).get("agents", {})
+        except (FileNotFoundError, json.JSONDecodeError, IOError, AttributeError):
+            return {}
+        if not isinstance(agents, dict):
+            return {}
+        agents = {name: record for name, record in agents.items()
+                  if isinstance(record, dict)}
+    if status is not None:
+        agents = {name: record for name, record in agents.items()
+                  if metric_bucket(record) == status}
+    return agents
+
+
+def read_registry(state_dir, shards=None):
+    """Return ``{"agents": ..., "team_metrics": ...}`` for *state_dir*.
+
+    The metrics are always counted from the records with ``metric_bucket``,
+    whichever layout they came from.
+    """
+    agents = read_agents(state_dir, shards=shards)
+    return {"agents": agents, "team_metrics": compute_metrics(agents)}
@@ -3,7 +3,7 @@
 Sforza Control Plane -- terminal dashboard for monitoring projects.
 
 Reads from shared-workspace/project-status.json and related files to display
-an auto-refreshing terminal dashboard with:
+a live terminal dashboard (redrawn as soon as those files change) with:
 
   - Active teams with status, phase, progress, and cost
   - Budget summary with visual progress bar
@@ -36,6 +36,15 @@ import tty
 from datetime import datetime
 from pathlib import Path
 
+from agent_registry import ShardReader, read_registry
+from coordination import (
+    COMMIT_EVENTS,
+    IN_DELETE,
+    IN_MODIFY,
+    IN_MOVED_FROM,
+    open_file_watcher,
+)
+
 # ---------------------------------------------------------------------------
 # Path constants (relative to project root)
 # ---------------------------------------------------------------------------
@@ -44,6 +53,15 @@ STATUS_FILE = "shared-workspace/project-status.json"
 COMMUNICATION_FILE = "shared-workspace/cross-team-communication.md"
 DEPENDENCY_FILE = "shared-workspace/dependency-tracker.md"
 AGENT_STATUS_FILE = "shared-state/agent-status.json"
+AGENT_SHARD_DIR = "shared-state/agent-status.d"
+AGENT_STATUS_DB = "shared-state/agent-status.db"
+AGENT_EVENT_LOG = "shared-state/agent-status.events"
+
+# Poll interval for the file watcher when inotify is unavailable (seconds)
+WATCH_POLL_INTERVAL = 0.25
+
+# After a change, wait this long for related writes before reloading (seconds)
+WATCH_SETTLE = 0.03
 
 # ---------------------------------------------------------------------------
 # Rich detection
@@ -165,26 +183,22 @@ def read_project_status(project_root):
         return empty
 
 
+# Reused across refreshes so only shards that changed are re-parsed
+_AGENT_SHARDS = ShardReader()
+
+
 def read_agent_status(project_root):
-    """Read the per-agent status registry if it exists.
+    """Read the per-agent status registry, whatever layout it uses.
+
+    Shards are merged through a cache keyed by inode, mtime and size, so a
+    refresh only re-reads agents that heartbeated since the last one; a
+    SQLite registry is read without blocking its writers.  ``team_metrics``
+    are counted from the records with status-updater's rules.
 
     Returns:
-        dict: The parsed agent-status.json, or an empty structure.
+        dict: ``agents`` (empty without a registry) and ``team_metrics``.
     """
-    path = project_root / AGENT_STATUS_FILE
-    empty = {"agents": {}, "team_metrics": {}}
-    if not path.is_file():
-        return empty
-    try:
-        with open(path, "r", encoding="utf-8") as fh:
-            data = json.load(fh)
-        if isinstance(data, dict):
-            data.setdefault("agents", {})
-            data.setdefault("team_metrics", {})
-            return data
-        return empty
-    except (json.JSONDecodeError, IOError):
-        return empty
+    return read_registry((project_root / AGENT_STATUS_FILE).parent, shards=_AGENT_SHARDS)
 
 
 def read_communication_log(project_root, max_entries=8):
@@ -319,6 +333,59 @@ def read_dependency_tracker(project_root):
     return entries
 
 
+# ---------------------------------------------------------------------------
+# Source cache
+# ---------------------------------------------------------------------------
+
+# Parsed data sources: key -> (stat signature, value)
+_SOURCE_CACHE = {}
+
+
+def _stat_signature(paths):
+    """Return (inode, mtime_ns, size) for each of *paths* (None if missing)."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _cached_source(key, paths, loader):
+    """Return ``loader()``, reusing the last result while *paths* are unchanged.
+
+    The files are stat'ed before *loader* runs, so a write that races the
+    read can only leave an older signature behind and force a re-read next
+    time -- never a stale result.
+    """
+    signature = _stat_signature(paths)
+    cached = _SOURCE_CACHE.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    value = loader()
+    _SOURCE_CACHE[key] = (signature, value)
+    return value
+
+
+def _read_agent_status_cached(project_root):
+    """``read_agent_status`` behind the source cache.
+
+    Sharded registries bypass it: their shards are rewritten individually and
+    ``_AGENT_SHARDS`` already caches each one.  For SQLite the -wal file
+    is part of the signature, as committed writes land there first.
+    """
+    db_path = project_root / AGENT_STATUS_DB
+    if not db_path.is_file() and (project_root / AGENT_SHARD_DIR).is_dir():
+        return read_agent_status(project_root)
+    paths = [db_path, project_root / (AGENT_STATUS_DB + "-wal"),
+             project_root / AGENT_STATUS_FILE]
+    return _cached_source(("agents", project_root), paths,
+                          lambda: read_agent_status(project_root))
+
+
 # ---------------------------------------------------------------------------
 # Budget helpers
 # ---------------------------------------------------------------------------
@@ -359,6 +426,37 @@ def _extract_progress(value):
     return 0
 
 
+def _format_eta(info, now=None):
+    """Format an agent's ``eta`` forecast (written by status-updater.py).
+
+    Returns:
+        str: Time to completion with its range, e.g. ``~12m (8-20m)``, or
+        ``-`` when there is no forecast.
+    """
+    eta = info.get("eta")
+    if not isinstance(eta, dict):
+        return "-"
+    now = now or datetime.utcnow()
+
+    def minutes(key):
+        try:
+            delta = datetime.fromisoformat(eta[key]) - now
+        except (KeyError, TypeError, ValueError):
+            return None
+        return max(0, round(delta.total_seconds() / 60))
+
+    def label(mins):
+        return f"{mins // 60}h{mins % 60:02d}m" if mins >= 60 else f"{mins}m"
+
+    expected = minutes("completion")
+    if expected is None:
+        return "-"
+    low, high = minutes("earliest"), minutes("latest")
+    if low is None or high is None or low == high:
+        return f"~{label(expected)}"
+    return f"~{label(expected)} ({label(low)}-{label(high)})"
+
+
 def compute_budget(project_data):
     """Compute budget summary from project data.
 
@@ -625,6 +723,7 @@ def render_rich(project_data, deps_md, comms, budget, agent_data, show_detail):
         agent_table.add_column("Status", justify="center", ratio=1)
         agent_table.add_column("Task", ratio=3)
         agent_table.add_column("Progress", justify="center", ratio=1)
+        agent_table.add_column("ETA", justify="center", ratio=1)
 
         for name, info in sorted(agents.items()):
             status = info.get("status", "offline")
@@ -635,6 +734,7 @@ def render_rich(project_data, deps_md, comms, budget, agent_data, show_detail):
                 _status_dot_rich(status),
                 str(task),
                 f"{progress}%",
+                _format_eta(info),
             )
         console.print(agent_table)
         console.print()
@@ -671,7 +771,7 @@ def render_rich(project_data, deps_md, comms, budget, agent_data, show_detail):
     detail_hint = "'d' details ON" if show_detail else "'d' for details"
     console.print(
         f"[dim]Press 'r' to refresh | 'q' to quit | {detail_hint}  "
-        f"(auto-refresh 5s)[/dim]"
+        f"(live)[/dim]"
     )
 
 
@@ -936,7 +1036,8 @@ def render_ansi(project_data, deps_md, comms, budget, agent_data, show_detail):
         col_astatus = 8
         col_atask = max(20, min(30, w // 3))
         col_aprog = 10
-        awidths = [col_aname, col_astatus, col_atask, col_aprog]
+        col_aeta = 18
+        awidths = [col_aname, col_astatus, col_atask, col_aprog, col_aeta]
 
         print(_draw_table_top(awidths))
         print(_draw_table_row(
@@ -945,6 +1046,7 @@ def render_ansi(project_data, deps_md, comms, budget, agent_data, show_detail):
                 f"{_BOLD}Status{_RESET}",
                 f"{_BOLD}Task{_RESET}",
                 f"{_BOLD}Progress{_RESET}",
+                f"{_BOLD}ETA{_RESET}",
             ],
             awidths,
         ))
@@ -955,7 +1057,7 @@ def render_ansi(project_data, deps_md, comms, budget, agent_data, show_detail):
             task = _truncate(str(info.get("current_task", "-")), col_atask)
             progress = info.get("progress", 0)
             print(_draw_table_row(
-                [name, _ansi_status_dot(status), task, f"{progress}%"],
+                [name, _ansi_status_dot(status), task, f"{progress}%", _format_eta(info)],
                 awidths,
             ))
 
@@ -994,7 +1096,7 @@ def render_ansi(project_data, deps_md, comms, budget, agent_data, show_detail):
     detail_hint = "'d' details ON" if show_detail else "'d' for details"
     print(
         f"{_DIM}Press 'r' to refresh | 'q' to quit | {detail_hint}  "
-        f"(auto-refresh 5s){_RESET}"
+        f"(live){_RESET}"
     )
 
 
@@ -1029,16 +1131,9 @@ class _RawTerminal:
             except termios.error:
                 pass
 
-    def key_available(self, timeout=0.1):
-        """Check if a keypress is available within *timeout* seconds."""
-        if self._fd is None:
-            time.sleep(timeout)
-            return False
-        try:
-            rlist, _, _ = select.select([sys.stdin], [], [], timeout)
-            return bool(rlist)
-        except (ValueError, OSError):
-            return False
+    def fileno(self):
+        """The stdin descriptor in raw mode, or ``None`` if not a TTY."""
+        return self._fd
 
     def read_key(self):
         """Read a single character from stdin."""
@@ -1054,28 +1149,119 @@ class _RawTerminal:
 import io  # noqa: E402 (placed here to keep the class self-contained)
 
 
+# ---------------------------------------------------------------------------
+# File watching
+# ---------------------------------------------------------------------------
+#
+# The dashboard sleeps in one select() on stdin and coordination.py's file
+# watcher instead of polling: an inotify descriptor on Linux, stat polling
+# elsewhere.  A SQLite agent registry is followed through its change-event
+# log, since readers touch the -wal file.
+
+# inotify events that refresh the dashboard: commits, appends to the event
+# log, and registries renamed away or deleted by a migration
+WATCH_EVENTS = COMMIT_EVENTS | IN_MODIFY | IN_MOVED_FROM | IN_DELETE
+
+
+def _watched_paths(project_root):
+    """Files whose changes should refresh the dashboard.
+
+    A path named ``*`` stands for every file in its directory.  The data
+    directories themselves are included so the watcher notices them being
+    created (or a registry migrating) after startup.
+    """
+    return [
+        project_root / "shared-workspace",
+        project_root / "shared-state",
+        project_root / STATUS_FILE,
+        project_root / COMMUNICATION_FILE,
+        project_root / DEPENDENCY_FILE,
+        project_root / AGENT_STATUS_FILE,
+        project_root / AGENT_SHARD_DIR,
+        project_root / AGENT_SHARD_DIR / "*",
+        project_root / AGENT_STATUS_DB,
+        project_root / AGENT_EVENT_LOG,
+    ]
+
+
+def _wait_for_input(term, watcher, timeout):
+    """Sleep until a key is pressed, a watched file changes, or *timeout* passes.
+
+    stdin and the inotify descriptor share one select(), so an idle dashboard
+    does no work at all; with the stat fallback the select wakes every
+    ``WATCH_POLL_INTERVAL`` to poll.
+
+    Returns:
+        str: ``"key"``, ``"change"`` or ``"timeout"``.
+    """
+    deadline = time.monotonic() + timeout
+    fds = [fd for fd in (term.fileno(), watcher.fileno()) if fd is not None]
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return "timeout"
+        wait = remaining if watcher.fileno() is not None else min(remaining, WATCH_POLL_INTERVAL)
+        try:
+            ready, _, _ = select.select(fds, [], [], wait)
+        except InterruptedError:
+            continue
+        if term.fileno() is not None and term.fileno() in ready:
+            return "key"
+        if watcher.fileno() is None or watcher.fileno() in ready:
+            if watcher.drain():
+                # Let a burst of related writes land before reloading
+                time.sleep(WATCH_SETTLE)
+                watcher.drain()
+                return "change"
+
+
 # ---------------------------------------------------------------------------
 # Main dashboard loop
 # ---------------------------------------------------------------------------
 
 def _load_all_data(project_root):
-    """Read all data sources and return them as a tuple."""
-    project_data = read_project_status(project_root)
-    deps_md = read_dependency_tracker(project_root)
-    comms = read_communication_log(project_root)
-    budget = compute_budget(project_data)
-    agent_data = read_agent_status(project_root)
+    """Read all data sources and return them as a tuple.
+
+    Each source is re-parsed only if its file changed since the last call
+    (see ``_cached_source``), and the budget only if the project status did.
+    """
+    project_data = _cached_source(
+        ("status", project_root), [project_root / STATUS_FILE],
+        lambda: read_project_status(project_root),
+    )
+    deps_md = _cached_source(
+        ("deps", project_root), [project_root / DEPENDENCY_FILE],
+        lambda: read_dependency_tracker(project_root),
+    )
+    comms = _cached_source(
+        ("comms", project_root), [project_root / COMMUNICATION_FILE],
+        lambda: read_communication_log(project_root),
+    )
+    cached = _SOURCE_CACHE.get(("budget", project_root))
+    if cached is not None and cached[0] is project_data:
+        budget = cached[1]
+    else:
+        budget = compute_budget(project_data)
+        _SOURCE_CACHE[("budget", project_root)] = (project_data, budget)
+    agent_data = _read_agent_status_cached(project_root)
     return project_data, deps_md, comms, budget, agent_data
 
 
 def run_dashboard(project_root, refresh_interval=5):
     """Run the auto-refreshing dashboard loop.
 
+    Data is reloaded as soon as one of the watched files changes; otherwise
+    the loop sleeps, redrawing from the data it already has every
+    *refresh_interval* seconds so relative times stay current.
+
     Args:
         project_root (Path): Absolute path to the project directory.
-        refresh_interval (int): Seconds between auto-refreshes.
+        refresh_interval (int): Seconds between redraws when nothing changes.
     """
     show_detail = False
+    watcher = open_file_watcher(
+        _watched_paths(project_root), WATCH_EVENTS, WATCH_POLL_INTERVAL
+    )
 
     # Handle Ctrl+C gracefully
     def _sigint_handler(sig, frame):
@@ -1085,12 +1271,13 @@ def run_dashboard(project_root, refresh_interval=5):
 
     signal.signal(signal.SIGINT, _sigint_handler)
 
+    data = None
     with _RawTerminal() as term:
         while True:
-            # Load data
-            project_data, deps_md, comms, budget, agent_data = _load_all_data(
-                project_root
-            )
+            # Load data (only on startup, on change, or on 'r')
+            if data is None:
+                data = _load_all_data(project_root)
+            project_data, deps_md, comms, budget, agent_data = data
 
             # Render
             if _USE_RICH:
@@ -1102,22 +1289,26 @@ def run_dashboard(project_root, refresh_interval=5):
                     project_data, deps_md, comms, budget, agent_data, show_detail
                 )
 
-            # Wait for keypress or timeout
-            elapsed = 0.0
-            poll_interval = 0.15  # check keys every 150ms
-            while elapsed < refresh_interval:
-                if term.key_available(poll_interval):
-                    key = term.read_key()
-                    if key in ("q", "Q"):
-                        _clear_screen()
-                        print("Control Plane exited.")
-                        return
-                    elif key in ("r", "R"):
-                        break  # force refresh
-                    elif key in ("d", "D"):
-                        show_detail = not show_detail
-                        break  # re-render immediately
-                elapsed += poll_interval
+            # Sleep until a keypress, a file change, or the redraw timeout
+            while True:
+                wake = _wait_for_input(term, watcher, refresh_interval)
+                if wake == "change":
+                    data = None
+                    break
+                if wake == "timeout":
+                    break
+                key = term.read_key()
+                if key in ("q", "Q"):
+                    watcher.close()
+                    _clear_screen()
+                    print("Control Plane exited.")
+                    return
+                elif key in ("r", "R"):
+                    data = None
+                    break  # force refresh
+                elif key in ("d", "D"):
+                    show_detail = not show_detail
+                    break  # re-render immediately
 
 
 def run_once(project_root):
@@ -1148,7 +1339,7 @@ def _build_parser():
             "  %(prog)s --project /path/to/my-project\n"
             "  %(prog)s                                  # auto-detect from cwd\n"
             "  %(prog)s --once                           # single render, then exit\n"
-            "  %(prog)s --refresh 10                     # refresh every 10 seconds\n"
+            "  %(prog)s --refresh 10                     # redraw every 10 seconds when idle\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
@@ -1166,7 +1357,10 @@ def _build_parser():
         type=int,
         default=5,
         metavar="SEC",
-        help="Auto-refresh interval in seconds (default: 5).",
+        help=(
+            "Redraw interval in seconds when nothing changes (default: 5); "
+            "file changes are shown immediately."
+        ),
     )
     parser.add_argument(
         "--once",
@@ -0,0 +1,398 @@
+"""
+Shared plumbing for the coordination utilities.
+
+file-lock-manager.py, status-updater.py and control-plane.py all keep their
+state in small files under a project's ``shared-state/`` directory, which
+many agent processes read and write at once.  The helpers they have in
+common live here, next to the scripts (which are always run in place):
+
+  - ``atomic_write_text`` -- replace a file so readers never see a partial
+    write, keeping the permissions a plain ``open(path, "w")`` would give
+  - ``pid_alive`` -- whether a process recorded in the shared state still runs
+  - ``open_file_watcher`` -- wait for shared-state files to change, with
+    inotify where available and stat polling elsewhere
+  - ``broker_request`` / ``BrokerServer`` / ``serve_broker_socket`` -- the
+    Unix-socket protocol the optional resident brokers speak
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import time
+
+# The process umask, read once at import before any threads exist.  Files
+# created through mkstemp start out 0600; atomically replaced files are given
+# the mode a plain ``open(path, "w")`` would have produced instead.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def replacement_mode(path):
+    """Return *path*'s current permission bits, or 0666 less the umask."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def directory_mode():
+    """Return the mode ``mkdir`` would give a new directory (0777 less the umask)."""
+    return 0o777 & ~_UMASK
+
+
+def atomic_write_text(path, text, create_dirs=True):
+    """Write *text* to *path* via a temporary file and an atomic rename.
+
+    The temporary file lives in the same directory and is fsynced before the
+    rename, so readers see either the old or the new document and never a
+    partial one.  With *create_dirs* False a missing parent directory raises
+    ``FileNotFoundError`` instead of being created.
+    """
+    if create_dirs:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(
+        prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent)
+    )
+    try:
+        os.fchmod(fd, replacement_mode(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def pid_alive(pid):
+    """Return False only if *pid* is known not to exist on this host."""
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError, TypeError, OverflowError):
+        return True
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Change watchers
+# ---------------------------------------------------------------------------
+#
+# Waiters sleep on a watcher instead of polling.  On Linux that is an
+# inotify descriptor on the directories holding the watched files (the
+# tools commit with renames, which arrive as IN_MOVED_TO); where inotify is
+# unavailable the watcher falls back to stat polling.  Either kind can be
+# used blocking, through ``wait``, or from a caller's own select() loop,
+# through ``fileno`` and ``drain``.
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+# Events that mean a watched file was (re)written or replaced
+COMMIT_EVENTS = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Report changes to *paths* through a descriptor usable with select().
+
+    A path named ``*`` stands for every file in its directory.  Paths whose
+    directory does not exist yet are watched once it appears.
+    """
+
+    def __init__(self, paths, mask=COMMIT_EVENTS):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths = list(paths)
+        self._mask = mask
+        # Watch descriptor -> file names of interest in that directory
+        self._names = {}
+        self._any = set()
+        try:
+            self._arm(strict=True)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _arm(self, strict=False):
+        """Watch every parent directory that exists (idempotent)."""
+        for path in self._paths:
+            if not path.parent.is_dir():
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, str(path.parent).encode(), self._mask)
+            if wd < 0:
+                if strict:
+                    raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+                continue
+            self._names.setdefault(wd, set()).add(path.name.encode())
+            if path.name == "*":
+                self._any.add(wd)
+
+    def fileno(self):
+        return self._fd
+
+    def drain(self):
+        """Consume pending events; return True if a watched file changed."""
+        changed = False
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + _INOTIFY_EVENT.size <= len(buf):
+                wd, _, _, length = _INOTIFY_EVENT.unpack_from(buf, offset)
+                offset += _INOTIFY_EVENT.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if wd in self._any or name in self._names.get(wd, ()):
+                    changed = True
+        if changed:
+            self._arm()  # pick up directories created since the last change
+        return changed
+
+    def wait(self, timeout):
+        """Block until a watched file changes or *timeout* seconds pass.
+
+        Returns:
+            bool: True if a watched file changed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                ready, _, _ = select.select([self._fd], [], [], remaining)
+            except InterruptedError:
+                continue
+            if not ready:
+                return False
+            if self.drain():
+                return True
+
+    def close(self):
+        os.close(self._fd)
+
+
+class StatWatcher:
+    """Portable fallback that polls each file's inode, mtime and size.
+
+    ``fileno`` is None: callers with their own select() loop wake every
+    *poll_interval* seconds and call ``drain``.
+    """
+
+    def __init__(self, paths, poll_interval=0.1):
+        self._paths = list(paths)
+        self.poll_interval = poll_interval
+        self._last = self._signature()
+
+    def _signature(self):
+        signature = []
+        for path in self._paths:
+            if path.name == "*":
+                path = path.parent  # renames into a directory bump its mtime
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+                continue
+            signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        return signature
+
+    def fileno(self):
+        return None
+
+    def drain(self):
+        """Return True if a watched file changed since the last call."""
+        current = self._signature()
+        if current != self._last:
+            self._last = current
+            return True
+        return False
+
+    def wait(self, timeout):
+        """Block until a watched file changes or *timeout* seconds pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.drain():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            pause = self.poll_interval
+            if deadline is not None:
+                pause = min(pause, max(0.0, deadline - time.monotonic()))
+            time.sleep(pause)
+
+    def close(self):
+        pass
+
+
+def open_file_watcher(paths, mask=COMMIT_EVENTS, poll_interval=0.1):
+    """Return an inotify watcher for *paths*, or a stat poller if unsupported.
+
+    Args:
+        paths (list[Path]): Files to watch; ``dir/*`` watches a whole directory.
+        mask (int): inotify events that count as a change.
+        poll_interval (float): Seconds between polls for the stat fallback.
+    """
+    try:
+        return InotifyWatcher(paths, mask)
+    except (OSError, AttributeError):
+        return StatWatcher(paths, poll_interval)
+
+
+# ---------------------------------------------------------------------------
+# Resident brokers
+# ---------------------------------------------------------------------------
+#
+# A broker is an optional resident process that serves a tool's operations
+# over a Unix socket using newline-delimited JSON: each request is
+# ``{"op": <name>, "args": {...}}`` and each reply is
+# ``{"ok": true, "result": ...}`` or ``{"ok": false, "error": <message>}``.
+
+# Sentinel returned by broker_request when no broker is reachable
+NO_BROKER = object()
+
+
+def broker_request(sock_path, op, args=None, timeout=5.0, label="broker"):
+    """Send one operation to the broker listening on *sock_path*.
+
+    Args:
+        sock_path (Path): The broker's socket.
+        op (str): Operation name.
+        args (dict, optional): Keyword arguments for the operation.
+        timeout (float): Seconds to wait for the reply (None waits forever).
+        label (str): Broker name used in error messages.
+
+    Returns:
+        The operation result, or ``NO_BROKER`` if no broker is listening.
+
+    Raises:
+        RuntimeError: If the broker rejected or failed the operation.
+    """
+    if not sock_path.exists():
+        return NO_BROKER
+
+    request = json.dumps({"op": op, "args": args or {}}) + "\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(sock_path))
+            sock.sendall(request.encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as reader:
+                line = reader.readline()
+    except FileNotFoundError:
+        return NO_BROKER
+    except ConnectionRefusedError:
+        # Socket left behind by a broker that died; clear it for direct mode
+        try:
+            sock_path.unlink()
+        except OSError:
+            pass
+        return NO_BROKER
+    except OSError as exc:
+        raise RuntimeError(f"{label} unreachable: {exc}") from exc
+
+    if not line:
+        raise RuntimeError(f"{label} closed the connection")
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error", f"{label} error"))
+    return reply.get("result")
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    """Serve newline-delimited JSON requests on one client connection."""
+
+    def handle(self):
+        operations = self.server.operations
+        for raw in self.rfile:
+            try:
+                request = json.loads(raw)
+                op = request["op"]
+                args = request.get("args", {})
+            except (ValueError, TypeError, KeyError):
+                reply = {"ok": False, "error": "malformed request"}
+            else:
+                func = operations.get(op)
+                if func is None:
+                    reply = {"ok": False, "error": f"unknown operation {op!r}"}
+                else:
+                    try:
+                        reply = {"ok": True, "result": func(**args)}
+                    except Exception as exc:
+                        # Report the failure rather than dropping the client
+                        reply = {"ok": False, "error": str(exc) or type(exc).__name__}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves *operations* (``{name: callable}``) on the socket *sock_path*."""
+
+    daemon_threads = True
+
+    def __init__(self, sock_path, operations):
+        self.operations = operations
+        super().__init__(str(sock_path), _BrokerHandler)
+
+
+def claim_broker_socket(sock_path):
+    """Prepare *sock_path* for a new broker.
+
+    Returns:
+        bool: False if another broker already answers on *sock_path*;
+        otherwise True, with any stale socket removed.
+    """
+    sock_path.parent.mkdir(parents=True, exist_ok=True)
+    if sock_path.exists():
+        try:
+            if broker_request(sock_path, "ping", timeout=1.0) is not NO_BROKER:
+                return False
+        except RuntimeError:
+            pass
+        sock_path.unlink(missing_ok=True)
+    return True
+
+
+def serve_broker_socket(server, sock_path, label="broker"):
+    """Serve *server* in the foreground until SIGINT or SIGTERM.
+
+    The socket is removed on the way out, so clients fall back to direct
+    mode as soon as the broker stops.
+    """
+    def _sigterm_handler(sig, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _sigterm_handler)
+    print(f"{label} listening on {sock_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            sock_path.unlink()
+        except OSError:
+            pass
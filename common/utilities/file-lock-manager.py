@@ -6,33 +6,167 @@ Prevents write conflicts during multi-agent workflows by maintaining a
 JSON-based file ownership registry. Each lock records which agent owns
 which file, when the lock was acquired, and an optional reason.
 
-Locks automatically expire after 30 minutes to prevent deadlocks from
-crashed or abandoned agent sessions.
+Each lock is a lease: it expires ``ttl`` seconds (30 minutes by default)
+after it was acquired or last renewed, so locks held by crashed or abandoned
+agent sessions are reclaimed automatically.  Agents that run a ``keepalive``
+can take short leases that free within seconds of the agent dying.
+
+Every registry operation runs as a transaction: an exclusive ``fcntl`` lock on
+a sidecar ``.lock`` file serializes the read-modify-write cycle across
+processes, and changes are committed by writing a temporary file and
+atomically renaming it over the registry.  Concurrent agents therefore never
+both win the same file, and a crash mid-write cannot truncate the registry.
+
+An optional resident broker (``serve``) keeps the registry in memory and
+answers requests over a Unix socket, journaling to disk in the background.
+When a broker is running the CLI forwards each command to it; otherwise it
+operates on the registry file directly.
 
 Usage:
-    python file-lock-manager.py acquire <file_path> <agent_name> [reason]
+    python file-lock-manager.py acquire <file_path> <agent_name> [reason] [--mode shared] [--wait [--timeout N]]
     python file-lock-manager.py release <file_path> <agent_name>
+    python file-lock-manager.py upgrade   <file_path> <agent_name> [--wait [--timeout N]]
+    python file-lock-manager.py downgrade <file_path> <agent_name>
+    python file-lock-manager.py renew     <agent_name> [paths...] [--ttl N]
+    python file-lock-manager.py keepalive <agent_name> [--ttl N] [--pid PID]
     python file-lock-manager.py check   <file_path>
+    python file-lock-manager.py deadlocks [--break] [--victim-policy POLICY]
+    python file-lock-manager.py stats [--top N] [--reset]
+    python file-lock-manager.py version <file_path>
+    python file-lock-manager.py commit-check <file_path> <agent_name> <version> [--from FILE]
+    python file-lock-manager.py acquire-many <agent_name> [paths...] [--glob PATTERN]
+    python file-lock-manager.py release-many <agent_name> [paths...] [--glob PATTERN]
+    python file-lock-manager.py migrate --store {json,sharded,journal} [--shards N]
+    python file-lock-manager.py serve
+
+With ``--wait`` an agent joins a persistent FIFO queue for a held path and
+sleeps (on inotify, or the broker's condition variable) until a release or
+expiry hands the lock to it; plain acquires never jump that queue.  Each new
+wait is checked against a wait-for graph of queued agents, lock holders and
+the ``blocked_by`` edges in ``agent-status.json``; a wait that would close a
+cycle is refused (or another waiter aborted, per the victim policy).
+
+Large teams can ``migrate`` the registry to a sharded layout under
+``shared-state/locks/shards/``: file locks are spread over N shard files by
+hash of their path, so a transaction reads and rewrites only the one or two
+shards it touches rather than the whole registry.  The ``journal`` layout
+instead appends each acquire, renew and release to a checksummed log
+(replayed on top of a snapshot and compacted as it grows), which also
+leaves an audit trail of who held what and when.
+
+Locks are exclusive by default.  ``--mode shared`` takes a read lock that
+any number of agents can hold together; it conflicts only with exclusive
+holders.  A reader can ``upgrade`` to exclusive (ahead of other waiters,
+once the other readers leave) and a writer can ``downgrade`` to shared.
+New readers queue behind waiting writers, so writers are never starved.
+
+Agents editing mostly disjoint files can skip locking: note a file's
+``version`` (a content hash, cached by inode and mtime) when reading it,
+then ``commit-check`` the edit, which atomically confirms that nobody
+changed or locked the file in the meantime before installing it.
+
+Locks may cover a single file, a directory subtree (``src/api/``) or a glob
+(``src/**/*.py``).  A lock conflicts with locks on enclosing directories and
+matching globs, and directory/glob locks also conflict with anything inside
+them.
 
 Examples:
     python file-lock-manager.py acquire src/main.py implementation-a "Refactoring entry point"
+    python file-lock-manager.py acquire src/api/ implementation-b "API rewrite"
     python file-lock-manager.py check src/main.py
     python file-lock-manager.py release src/main.py implementation-a
 """
 
+import abc
 import argparse
+import fcntl
+import functools
+import glob
+import hashlib
 import json
 import os
+import posixpath
+import re
 import sys
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from agent_registry import read_agents
+from coordination import (
+    NO_BROKER,
+    BrokerServer,
+    atomic_write_text,
+    broker_request,
+    claim_broker_socket,
+    open_file_watcher,
+    pid_alive,
+    serve_broker_socket,
+)
+
 # Path to the shared lock registry (relative to project root)
 LOCK_FILE = "shared-state/file-ownership.json"
 
-# Locks older than this are considered expired and can be reclaimed
+# Default lease length for locks acquired without an explicit TTL.  Agents
+# that run a keepalive can use much shorter leases (see ``renew_leases``).
 LOCK_DURATION = timedelta(minutes=30)
 
+# Keepalives renew a lease after this fraction of its TTL has elapsed
+RENEW_FRACTION = 1 / 3
+
+# Persistent FIFO queues of agents blocked in ``acquire --wait``
+WAIT_QUEUE_FILE = "shared-state/locks/wait-queue.json"
+
+# Directory of the sharded registry layout; its ``manifest.json`` records
+# the shard count and switches every process over to that layout
+SHARD_DIR = "shared-state/locks/shards"
+
+# Number of file-lock shards ``migrate --store sharded`` creates by default
+DEFAULT_SHARD_COUNT = 64
+
+# Shard holding every directory and glob lock
+SCOPED_SHARD = "scoped"
+
+# Directory of the journal layout (snapshot.json plus journal.log)
+JOURNAL_DIR = "shared-state/locks/journal"
+
+# Journal size that triggers a snapshot and rotation (bytes)
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+
+# Rotated journal segments kept as an audit trail
+JOURNAL_ARCHIVES = 3
+
+# Compact per-path contention counters and per-agent hold-time samples
+STATS_FILE = "shared-state/locks/stats.json"
+
+# Size of the pending stats event log that triggers folding it in (bytes)
+STATS_LOG_COMPACT_BYTES = 256 * 1024
+
+# Most recent hold times kept per agent for the percentile report
+STATS_HOLD_SAMPLES = 256
+
+# Content-hash cache used by optimistic commit checks
+HASH_CACHE_FILE = "shared-state/locks/hash-cache.json"
+
+# Files whose hashes the cache remembers
+HASH_CACHE_ENTRIES = 4096
+
+# Poll interval for waiters when inotify is unavailable (seconds)
+WATCH_POLL_INTERVAL = 0.1
+
+# Unix socket the optional lock broker listens on (relative to project root)
+BROKER_SOCKET = "shared-state/file-lock-broker.sock"
+
+# How often the broker journals its in-memory registry to disk (seconds)
+BROKER_FLUSH_INTERVAL = 0.05
+
+# How long the CLI waits for a broker reply before giving up (seconds)
+BROKER_TIMEOUT = 5.0
+
 # ISO format used for serializing timestamps
 _ISO_FMT = "%Y-%m-%dT%H:%M:%S.%f"
 
@@ -63,38 +197,662 @@ def _read_locks():
     """Read the current lock registry from disk.
 
     Returns:
-        dict: Mapping of file paths to their lock records.  Each record has
-        keys: ``agent``, ``acquired``, ``reason``.
+        _LockRegistry: Mapping of lock keys to their lock records, indexed by
+        path.  Each record has keys: ``agent``, ``acquired``, ``reason`` and,
+        for directory and glob locks, ``scope``.
     """
     lock_path = _resolve_lock_file()
     if not lock_path.exists():
-        return {}
+        return _LockRegistry()
 
     try:
         with open(lock_path, "r", encoding="utf-8") as fh:
             data = json.load(fh)
     except (json.JSONDecodeError, IOError):
-        return {}
+        return _LockRegistry()
 
     if not isinstance(data, dict):
-        return {}
-    return data
+        return _LockRegistry()
+    return _LockRegistry(data)
 
 
 def _write_locks(locks):
-    """Persist the lock registry to disk.
+    """Persist the lock registry to disk atomically.
 
     Args:
         locks (dict): The full lock registry to write.
     """
+    atomic_write_text(_resolve_lock_file(), json.dumps(locks, indent=2))
+
+
+def _resolve_wait_queue_file():
+    """Resolve the wait-queue path alongside the lock registry."""
+    return _resolve_lock_file().parent.parent / WAIT_QUEUE_FILE
+
+
+def _read_waiters():
+    """Read the persistent wait queues.
+
+    Returns:
+        dict: Mapping of lock keys to FIFO lists of waiter entries.
+    """
+    path = _resolve_wait_queue_file()
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError, IOError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@contextmanager
+def _registry_guard():
+    """Hold the cross-process ``fcntl`` lock on ``<registry>.lock``."""
     lock_path = _resolve_lock_file()
     lock_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(lock_path, "w", encoding="utf-8") as fh:
-        json.dump(locks, fh, indent=2)
+    guard_path = lock_path.with_name(lock_path.name + ".lock")
+    with open(guard_path, "a") as guard:
+        fcntl.flock(guard.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(guard.fileno(), fcntl.LOCK_UN)
+
+
+# ---------------------------------------------------------------------------
+# Registry stores
+# ---------------------------------------------------------------------------
+#
+# A store loads the registry (or just the part a transaction needs), and
+# turns what a transaction changed into a list of files to rewrite.  Disk
+# stores run each transaction under the registry guard; the broker's memory
+# store keeps everything resident and writes through a disk store lazily.
+
+class _DiskStore(abc.ABC):
+    """Common transaction logic for the on-disk registry layouts."""
+
+    name = None
+
+    @abc.abstractmethod
+    def load(self, keys=None):
+        """Return a ``_LockRegistry`` covering *keys* (everything if None)."""
+
+    @abc.abstractmethod
+    def pending_writes(self, locks):
+        """Return the writes (see ``_apply_writes``) that persist everything
+        *locks* changed, and mark it clean."""
+
+    @abc.abstractmethod
+    def records(self):
+        """Return ``{key: record}`` for the whole registry."""
+
+    @abc.abstractmethod
+    def watch_paths(self, key=None):
+        """Return the files whose changes can affect *key* (or any key)."""
+
+    @contextmanager
+    def transaction(self, keys=None):
+        with _registry_guard():
+            if _resolve_broker_socket().exists():
+                # The broker's in-memory copy would overwrite this write
+                raise RuntimeError(
+                    "A lock broker owns the registry; send requests through it"
+                )
+            locks = self.load(keys)
+            yield locks
+            _apply_writes(self.pending_writes(locks))
+
+    @contextmanager
+    def view(self, keys=None):
+        yield self.load(keys)
+
+    def watcher(self, key=None):
+        """Return a watcher that wakes when the relevant registry files change."""
+        return _open_file_watcher(self.watch_paths(key))
+
+    def read_stats(self):
+        with _registry_guard():
+            return _fold_stats_log()
+
+    def record_stats(self, events):
+        # Runs inside transaction(), so the guard is already held.  Events
+        # are appended to a log (statistics don't warrant an fsync) and
+        # folded into the stats file when it grows or is read.
+        log_path = _resolve_stats_file().with_suffix(".log")
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as fh:
+            if fh.tell() == 0 and not _resolve_stats_file().exists():
+                # First event ever: persist the collection start now, or the
+                # first fold would stamp ``since`` after the events it covers
+                atomic_write_text(_resolve_stats_file(), _ContentionStats().dump())
+            for event in events:
+                fh.write(json.dumps(event, separators=(",", ":")) + "\n")
+            size = fh.tell()
+        if size > STATS_LOG_COMPACT_BYTES:
+            _fold_stats_log()
+
+    def reset_stats(self):
+        with _registry_guard():
+            _resolve_stats_file().with_suffix(".log").unlink(missing_ok=True)
+            atomic_write_text(_resolve_stats_file(), _ContentionStats().dump())
+
+
+class _JsonStore(_DiskStore):
+    """Registry kept in the single ``file-ownership.json`` document.
+
+    Every transaction reads and, if anything changed, rewrites the whole
+    document.  Read-only views skip the guard because commits are atomic
+    renames.
+    """
+
+    name = "json"
+
+    def load(self, keys=None):
+        locks = _read_locks()
+        locks.waiters = _read_waiters()
+        return locks
+
+    def pending_writes(self, locks):
+        writes = []
+        if locks.waiters_dirty:
+            writes.append((_resolve_wait_queue_file(), json.dumps(locks.waiters, indent=2)))
+        if locks.dirty:
+            writes.append((_resolve_lock_file(), json.dumps(locks, indent=2)))
+        locks.mark_clean()
+        return writes
+
+    def records(self):
+        return _read_locks().items()
+
+    def watch_paths(self, key=None):
+        return [_resolve_lock_file(), _resolve_wait_queue_file()]
+
+
+class _ShardedStore(_DiskStore):
+    """Registry split across shard files under ``shared-state/locks/shards/``.
+
+    File locks are spread over *shard_count* files by a hash of their key;
+    directory and glob locks share one ``scoped`` shard, which is always
+    loaded because any path's enclosing locks may live there.  A transaction
+    on a file therefore reads and rewrites two small files, however large
+    the registry grows.  Requests involving a directory or glob load every
+    shard, since their descendants can be anywhere.
+    """
+
+    name = "sharded"
+
+    def __init__(self, shard_count):
+        self.shard_count = shard_count
+        self.directory = _resolve_shard_dir()
+
+    def shard_of(self, key, scope):
+        if scope != "file":
+            return SCOPED_SHARD
+        return f"{zlib.crc32(key.encode('utf-8')) % self.shard_count:03d}"
+
+    def _shard_path(self, name):
+        return self.directory / f"{name}.json"
+
+    def _read_shard(self, name):
+        try:
+            with open(self._shard_path(name), "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _all_shards(self):
+        return [p.stem for p in self.directory.glob("*.json") if p.stem != "manifest"]
+
+    def load(self, keys=None):
+        waiters = _read_waiters()
+        if keys is None:
+            names = self._all_shards()
+        else:
+            # Promotion and deadlock checks also need the queued paths' shards
+            wanted = list(keys) + [
+                (key, entry.get("scope", "file"))
+                for key, queue in waiters.items()
+                for entry in queue
+            ]
+            if any(scope != "file" for _, scope in wanted):
+                names = self._all_shards()
+            else:
+                names = {self.shard_of(k, s) for k, s in wanted} | {SCOPED_SHARD}
+        data = {}
+        for name in names:
+            data.update(self._read_shard(name))
+        locks = _LockRegistry(data)
+        locks.waiters = waiters
+        return locks
+
+    def pending_writes(self, locks):
+        writes = []
+        if locks.waiters_dirty:
+            writes.append((_resolve_wait_queue_file(), json.dumps(locks.waiters, indent=2)))
+        touched = {self.shard_of(key, scope) for key, scope in locks.changed}
+        if touched:
+            contents = {name: {} for name in touched}
+            for key, record in locks.items():
+                name = self.shard_of(key, _record_scope(record))
+                if name in contents:
+                    contents[name][key] = record
+            for name in sorted(touched):
+                writes.append((self._shard_path(name), json.dumps(contents[name], indent=2)))
+        locks.mark_clean()
+        return writes
+
+    def records(self):
+        # Merge lazily, one shard at a time
+        for name in self._all_shards():
+            yield from self._read_shard(name).items()
+
+    def watch_paths(self, key=None):
+        paths = [_resolve_wait_queue_file()]
+        if key is None or key[1] != "file":
+            return paths + [self.directory / "*"]
+        return paths + [
+            self._shard_path(self.shard_of(*key)),
+            self._shard_path(SCOPED_SHARD),
+        ]
+
+
+class _JournalStore(_DiskStore):
+    """Registry kept as a snapshot plus an append-only journal.
+
+    Every committed change appends one record per lock to ``journal.log``
+    under ``shared-state/locks/journal/``; a transaction's records go out in
+    a single write and fsync (in the broker, a whole flush interval's worth).
+    Loading replays the journal on top of ``snapshot.json``.  Once the
+    journal passes ``JOURNAL_COMPACT_BYTES`` the current state is written
+    as a new snapshot and the journal rotated into ``journal.log.1`` ..
+    ``journal.log.<JOURNAL_ARCHIVES>``, which keep the recent audit trail
+    of who held what and when.
+
+    Each line is ``<crc32 as 8 hex digits> <json record>`` where the record
+    has ``seq``, ``at``, ``op`` (``acquire``, ``renew``, ``release``,
+    ``upgrade`` or ``downgrade``; see ``_journal_op``), ``key`` and, unless
+    the lock is gone, the lock ``record``.  Lines failing
+    their checksum (a write torn by a crash) are skipped on replay.
+    """
+
+    name = "journal"
+
+    def __init__(self):
+        self.directory = _resolve_journal_dir()
+        self.snapshot_path = self.directory / "snapshot.json"
+        self.journal_path = self.directory / "journal.log"
+
+    def _replay(self):
+        """Return ``(locks dict, last seq)`` rebuilt from snapshot and journal."""
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as fh:
+                snapshot = json.load(fh)
+            data = dict(snapshot.get("locks", {}))
+            seq = int(snapshot.get("seq", 0))
+        except (FileNotFoundError, json.JSONDecodeError, IOError, AttributeError, ValueError):
+            data, seq = {}, 0
+        for entry in _read_journal(self.journal_path):
+            if entry["seq"] <= seq:
+                continue  # already folded into the snapshot
+            seq = entry["seq"]
+            if "record" in entry:
+                data[entry["key"]] = entry["record"]
+            else:
+                data.pop(entry["key"], None)
+        return data, seq
+
+    def load(self, keys=None):
+        data, seq = self._replay()
+        locks = _LockRegistry(data)
+        locks.journal_seq = seq
+        locks.waiters = _read_waiters()
+        return locks
+
+    def pending_writes(self, locks):
+        writes = []
+        if locks.waiters_dirty:
+            writes.append((_resolve_wait_queue_file(), json.dumps(locks.waiters, indent=2)))
+        seq = getattr(locks, "journal_seq", 0)
+        if locks.changed:
+            at = datetime.utcnow().strftime(_ISO_FMT)
+            lines = []
+            for key in sorted({key for key, _ in locks.changed}):
+                seq += 1
+                record = locks.get(key)
+                entry = {"seq": seq, "at": at, "key": key,
+                         "op": _journal_op(locks.before.get(key), record)}
+                if record is not None:
+                    entry["record"] = record
+                lines.append(_journal_line(entry))
+            text = "".join(lines)
+            writes.append((self.journal_path, text, "append"))
+            locks.journal_seq = seq
+            try:
+                size = self.journal_path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if size + len(text) > JOURNAL_COMPACT_BYTES:
+                writes.extend(self._compaction_writes(dict(locks), seq))
+        locks.mark_clean()
+        return writes
+
+    def _compaction_writes(self, data, seq):
+        """Snapshot *data* as of *seq* and rotate the journal into the archives."""
+        writes = [(self.snapshot_path, json.dumps({"seq": seq, "locks": data}, indent=2))]
+        for n in range(JOURNAL_ARCHIVES - 1, 0, -1):
+            older = self.directory / f"journal.log.{n}"
+            writes.append((older, self.directory / f"journal.log.{n + 1}", "rename"))
+        writes.append((self.journal_path, self.directory / "journal.log.1", "rename"))
+        return writes
+
+    def initial_writes(self, data):
+        """Writes that start a fresh journal holding *data*."""
+        return [
+            (self.snapshot_path, json.dumps({"seq": 0, "locks": data}, indent=2)),
+            (self.journal_path, ""),
+        ]
+
+    def records(self):
+        return self._replay()[0].items()
+
+    def watch_paths(self, key=None):
+        return [_resolve_wait_queue_file(), self.journal_path, self.snapshot_path]
+
+
+def _journal_op(before, after):
+    """Name the change from record *before* to *after* for the journal.
+
+    A shared lock that loses one holder but keeps others is a ``release``
+    that still carries the remaining record; one that gains a holder is an
+    ``acquire``.
+    """
+    if after is None:
+        return "release"
+    if before is None:
+        return "acquire"
+    if _record_mode(before) != _record_mode(after):
+        return "downgrade" if _record_mode(after) == "shared" else "upgrade"
+    old, new = dict(_holders(before)), dict(_holders(after))
+    if new.keys() - old.keys():
+        return "acquire"
+    if old.keys() - new.keys():
+        return "release"
+    return "renew"
+
+
+def _journal_line(entry):
+    payload = json.dumps(entry, separators=(",", ":"))
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+
+
+def _read_journal(path):
+    """Yield the intact entries of the journal at *path*, in order."""
+    try:
+        fh = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with fh:
+        for line in fh:
+            crc, _, payload = line.rstrip("\n").partition(" ")
+            try:
+                if int(crc, 16) != zlib.crc32(payload.encode("utf-8")):
+                    continue
+                entry = json.loads(payload)
+            except ValueError:
+                continue
+            yield entry
+
+
+def _append_text(path, text):
+    """Append *text* to *path* with one write and one fsync.
+
+    If a previous append was torn mid-line, a newline is written first so
+    the new records start on a line of their own.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab+") as fh:
+        fh.seek(0, os.SEEK_END)
+        if fh.tell():
+            fh.seek(-1, os.SEEK_END)
+            if fh.read(1) != b"\n":
+                text = "\n" + text
+        fh.write(text.encode("utf-8"))
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def _apply_writes(writes):
+    """Carry out the ``(path, payload[, mode])`` writes a store asked for.
+
+    The default mode atomically replaces *path* with the text *payload*;
+    ``append`` appends it, and ``rename`` moves *path* to *payload* if it
+    exists.
+    """
+    for path, payload, *mode in writes:
+        mode = mode[0] if mode else "replace"
+        if mode == "append":
+            _append_text(path, payload)
+        elif mode == "rename":
+            try:
+                os.replace(path, payload)
+            except FileNotFoundError:
+                pass
+        else:
+            atomic_write_text(path, payload)
+
+
+def _resolve_journal_dir():
+    return _resolve_lock_file().parent.parent / JOURNAL_DIR
+
+
+def _resolve_shard_dir():
+    return _resolve_lock_file().parent.parent / SHARD_DIR
+
+
+def _disk_store():
+    """Return the store for the layout the registry currently uses.
+
+    A ``manifest.json`` in the shard directory switches every process to
+    the sharded layout and a journal snapshot to the journal layout;
+    otherwise the single JSON document is used.
+    """
+    manifest = _resolve_shard_dir() / "manifest.json"
+    try:
+        with open(manifest, "r", encoding="utf-8") as fh:
+            return _ShardedStore(int(json.load(fh)["shards"]))
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError, TypeError):
+        pass
+    if (_resolve_journal_dir() / "snapshot.json").exists():
+        return _JournalStore()
+    return _JsonStore()
+
+
+class _MemoryStore:
+    """In-memory registry served by the lock broker.
+
+    Transactions are serialized by a thread lock and only mark the registry
+    dirty; a background journal thread writes the changes through *disk* at
+    most every *flush_interval* seconds, so no operation waits on I/O.
+    Every committed change bumps ``generation`` and wakes broker threads
+    blocked in ``wait_for_lock``.
+    """
+
+    def __init__(self, disk, flush_interval=BROKER_FLUSH_INTERVAL):
+        self.disk = disk
+        self.locks = disk.load()
+        self.stats = _fold_stats_log()  # serve_broker holds the guard
+        self._stats_dirty = False
+        self.flush_interval = flush_interval
+        self.generation = 0
+        self._mutex = threading.RLock()
+        self._changed = threading.Condition(self._mutex)
+        self._dirty = threading.Event()
+        self._stopping = threading.Event()
+        self._journal = threading.Thread(
+            target=self._journal_loop, name="lock-journal", daemon=True
+        )
+        self._journal.start()
+
+    @contextmanager
+    def transaction(self, keys=None):
+        with self._mutex:
+            version = self.locks.version
+            yield self.locks
+            if self.locks.version != version:
+                self.generation += 1
+                self._changed.notify_all()
+                self._dirty.set()
+
+    @contextmanager
+    def view(self, keys=None):
+        with self._mutex:
+            yield self.locks
+
+    def records(self):
+        with self._mutex:
+            return list(self.locks.items())
+
+    def read_stats(self):
+        with self._mutex:
+            return _ContentionStats(json.loads(self.stats.dump()))
+
+    def record_stats(self, events):
+        with self._mutex:
+            self.stats.apply(events)
+            self._stats_dirty = True
+            self._dirty.set()
+
+    def reset_stats(self):
+        with self._mutex:
+            self.stats = _ContentionStats()
+            self._stats_dirty = True
+            self._dirty.set()
+
+    def flush(self):
+        """Write the registry changes made since the last flush to disk."""
+        if not self._dirty.is_set():
+            return
+        with self._mutex:
+            self._dirty.clear()
+            writes = self.disk.pending_writes(self.locks)
+            if self._stats_dirty:
+                writes.append((_resolve_stats_file(), self.stats.dump()))
+                self._stats_dirty = False
+        with _registry_guard():
+            _apply_writes(writes)
+
+    def watcher(self, key=None):
+        """Return a watcher that wakes on the next committed transaction."""
+        return _GenerationWatcher(self)
+
+    def close(self):
+        """Stop the journal thread and write a final snapshot."""
+        self._stopping.set()
+        self._dirty.set()
+        self._journal.join()
+        self.flush()
+
+    def _journal_loop(self):
+        while not self._stopping.is_set():
+            self._dirty.wait()
+            if self._stopping.is_set():
+                break
+            try:
+                self.flush()
+            except OSError as exc:
+                print(f"lock broker: journal write failed: {exc}", file=sys.stderr)
+                self._dirty.set()
+            self._stopping.wait(self.flush_interval)
+
+
+# ---------------------------------------------------------------------------
+# Change watchers
+# ---------------------------------------------------------------------------
+#
+# Agents blocked in wait_for_lock sleep on a watcher instead of polling the
+# registry.  In file mode that is coordination.py's file watcher on the
+# registry files; inside the broker waiters block on a condition variable
+# signalled by every transaction.
+
+class _GenerationWatcher:
+    """Wake when the broker's in-memory store commits a change."""
+
+    def __init__(self, store):
+        self._store = store
+        self._seen = store.generation
+
+    def wait(self, timeout):
+        store = self._store
+        with store._changed:
+            store._changed.wait_for(lambda: store.generation != self._seen, timeout)
+            changed = store.generation != self._seen
+            self._seen = store.generation
+        return changed
+
+    def close(self):
+        pass
+
+
+def _open_file_watcher(paths):
+    """Return a watcher (see coordination.py) for the registry files *paths*."""
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    return open_file_watcher(paths, poll_interval=WATCH_POLL_INTERVAL)
+
+
+# Store override for this process.  The broker installs a _MemoryStore;
+# everywhere else each operation picks the on-disk layout in use.
+_STORE = None
+
+
+def _active_store():
+    return _STORE if _STORE is not None else _disk_store()
+
+
+@contextmanager
+def _registry_transaction(keys=None):
+    """Run a read-modify-write cycle on the registry as one critical section.
+
+    Before the transaction commits, queued waiters whose locks have become
+    available are granted them, so a release hands the path straight to the
+    next agent in line, and the contention events it recorded are added to
+    the statistics.
+
+    Args:
+        keys (list, optional): ``(key, scope)`` pairs the transaction will
+            touch.  Sharded stores load only the shards these need; ``None``
+            loads the whole registry.
+
+    Yields:
+        _LockRegistry: The mutable lock registry.
+    """
+    store = _active_store()
+    with store.transaction(keys) as locks:
+        yield locks
+        if locks.waiters:
+            _promote_waiters(locks, datetime.utcnow())
+        if locks.events:
+            events, locks.events = locks.events, []
+            store.record_stats(events)
+
+
+def _registry_view(keys=None):
+    """Read the registry (or the part covering *keys*) without modifying it.
+
+    Yields:
+        dict: The lock registry (treat as read-only).
+    """
+    return _active_store().view(keys)
+
+
+def _registry_records():
+    """Iterate over every ``(key, record)`` pair, merging shards lazily."""
+    return _active_store().records()
 
 
 def _is_expired(lock_record):
-    """Check whether a lock record has exceeded LOCK_DURATION.
+    """Check whether a lock record's lease has run out.
 
     Args:
         lock_record (dict): A single lock entry with an ``acquired`` timestamp.
@@ -102,203 +860,2000 @@ def _is_expired(lock_record):
     Returns:
         bool: True if the lock is expired.
     """
-    try:
-        acquired = datetime.strptime(lock_record["acquired"], _ISO_FMT)
-    except (KeyError, ValueError):
+    expires = _expires_at(lock_record)
+    if expires is None:
         return True  # malformed records are treated as expired
-    return datetime.utcnow() - acquired > LOCK_DURATION
+    return datetime.utcnow() > expires
+
+
+def _expires_at(lock_record):
+    """Return the time *lock_record*'s lease ends, or None if it is malformed.
+
+    A lease runs for ``ttl`` seconds from its last renewal (or from
+    acquisition if it was never renewed).  Records written before leases
+    existed have no ``ttl`` and fall back to ``LOCK_DURATION``.  A shared
+    lock lasts as long as its longest-lived holder's lease.
+    """
+    if _record_mode(lock_record) == "shared":
+        expiries = [_expires_at(lease) for _, lease in _holders(lock_record)]
+        expiries = [e for e in expiries if e is not None]
+        return max(expiries) if expiries else None
+    try:
+        started = datetime.strptime(
+            lock_record.get("renewed") or lock_record["acquired"], _ISO_FMT
+        )
+        ttl = lock_record.get("ttl")
+        duration = LOCK_DURATION if ttl is None else timedelta(seconds=float(ttl))
+    except (KeyError, ValueError, TypeError):
+        return None
+    return started + duration
+
+
+def _lease_seconds(ttl):
+    """Validate a requested lease length, defaulting to ``LOCK_DURATION``."""
+    if ttl is None:
+        return int(LOCK_DURATION.total_seconds())
+    ttl = float(ttl)
+    if ttl <= 0:
+        raise ValueError(f"Lease TTL must be positive, got {ttl}")
+    return int(ttl) if ttl.is_integer() else ttl
+
+
+# ---------------------------------------------------------------------------
+# Lock scopes and the path trie index
+# ---------------------------------------------------------------------------
+#
+# A lock covers a single file, a whole directory subtree, or every path
+# matching a glob.  Directory keys end in "/" and glob keys contain
+# wildcards.  Every key is anchored at a node of a path trie: files and
+# directories at their own node, globs at the node of their literal
+# (wildcard-free) prefix.  A conflict check walks only the requested path's
+# ancestors, plus the requested node's subtree for directory/glob requests,
+# so its cost is O(depth) rather than O(number of locks).
+
+SCOPES = ("file", "directory", "glob")
+
+_GLOB_CHARS = frozenset("*?[")
+
+
+def _infer_scope(path):
+    """Guess the scope of *path*: trailing ``/`` is a directory, wildcards a glob."""
+    if path.endswith("/"):
+        return "directory"
+    if any(ch in _GLOB_CHARS for ch in path):
+        return "glob"
+    return "file"
+
+
+def _normalize_key(path, scope=None):
+    """Return the canonical registry key and scope for *path*.
 
+    ``./src//api/`` and ``src/api`` (as a directory) both become
+    ``src/api/``, so equivalent spellings share one lock.
+    """
+    scope = scope or _infer_scope(path)
+    if scope not in SCOPES:
+        raise ValueError(f"Invalid scope '{scope}'. Must be one of: {', '.join(SCOPES)}")
+    key = posixpath.normpath(path.replace(os.sep, "/"))
+    if scope == "directory" and key != "/":
+        key += "/"
+    return key, scope
+
+
+def _record_scope(record):
+    return record.get("scope", "file")
+
+
+# ---------------------------------------------------------------------------
+# Lock modes
+# ---------------------------------------------------------------------------
+#
+# An exclusive lock record names a single ``agent``.  A shared lock record
+# has ``"mode": "shared"`` and a ``holders`` mapping of agent -> lease
+# (``acquired``, ``reason``, ``ttl`` and ``renewed``); each holder's lease
+# expires on its own.  Shared holders are compatible with each other and
+# conflict with any exclusive holder, across scopes as well as on the same
+# path.
+
+MODES = ("exclusive", "shared")
+
+
+def _record_mode(record):
+    return "shared" if record.get("mode") == "shared" else "exclusive"
+
+
+def _holders(record):
+    """Return ``(agent, lease)`` pairs for every holder of *record*."""
+    if _record_mode(record) == "shared":
+        return list(record.get("holders", {}).items())
+    return [(record.get("agent"), record)]
+
+
+def _held_by(record, agent_name):
+    """Return *agent_name*'s lease on *record*, or None."""
+    if record is None:
+        return None
+    for agent, lease in _holders(record):
+        if agent == agent_name:
+            return lease
+    return None
+
+
+def _holder_records(record):
+    """Return one exclusive-style record per live holder of *record*.
+
+    Shared holders are flattened to ``{agent, acquired, reason, ttl, ...}``
+    records tagged with ``"mode": "shared"``, so conflict reports treat
+    every holder alike.
+    """
+    if _record_mode(record) == "exclusive":
+        return [] if _is_expired(record) else [record]
+    views = []
+    for agent, lease in _holders(record):
+        if _is_expired(lease):
+            continue
+        view = dict(lease, agent=agent, mode="shared")
+        if _record_scope(record) != "file":
+            view["scope"] = _record_scope(record)
+        views.append(view)
+    return views
+
+
+def _with_lease(record, agent_name, lease):
+    """Return a copy of *record* with *agent_name*'s lease replaced."""
+    if _record_mode(record) == "exclusive":
+        return lease
+    holders = dict(record.get("holders", {}))
+    holders[agent_name] = lease
+    return dict(record, holders=holders)
+
+
+def _without_holder(record, agent_name):
+    """Return *record* minus *agent_name*, or None if no holder remains."""
+    if _record_mode(record) == "exclusive":
+        return None
+    holders = {a: lease for a, lease in _holders(record) if a != agent_name}
+    return dict(record, holders=holders) if holders else None
+
+
+def _holder_names(record):
+    return [agent for agent, _ in _holders(record)]
+
+
+def _key_parts(key, scope):
+    """Split *key* into the trie components of its anchor node."""
+    parts = [p for p in key.split("/") if p and p != "."]
+    if key.startswith("/"):
+        parts.insert(0, "/")
+    if scope == "glob":
+        # Anchor globs at their literal prefix directory
+        literal = []
+        for part in parts:
+            if any(ch in _GLOB_CHARS for ch in part):
+                break
+            literal.append(part)
+        if len(literal) == len(parts):
+            literal = literal[:-1]
+        return literal
+    return parts
+
+
+@functools.lru_cache(maxsize=512)
+def _glob_regex(pattern):
+    """Compile a path glob where ``*`` stays within one segment and ``**`` spans many."""
+    segments = pattern.split("/")
+    out = []
+    for idx, seg in enumerate(segments):
+        last = idx == len(segments) - 1
+        if seg == "**":
+            out.append(".*" if last else "(?:[^/]+/)*")
+            continue
+        i = 0
+        while i < len(seg):
+            ch = seg[i]
+            if ch == "*":
+                out.append("[^/]*")
+            elif ch == "?":
+                out.append("[^/]")
+            elif ch == "[" and "]" in seg[i + 1:]:
+                end = seg.index("]", i + 1)
+                body = seg[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+            else:
+                out.append(re.escape(ch))
+            i += 1
+        if not last:
+            out.append("/")
+    return re.compile("".join(out) + r"\Z")
+
+
+def _glob_match(pattern, path):
+    return _glob_regex(pattern).match(path) is not None
+
+
+class _TrieNode:
+    __slots__ = ("children", "anchored")
+
+    def __init__(self):
+        self.children = {}
+        self.anchored = {}  # registry key -> scope
+
+
+class _PathTrie:
+    """Prefix tree over path components indexing every registry key."""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key, scope):
+        node = self.root
+        for part in _key_parts(key, scope):
+            node = node.children.setdefault(part, _TrieNode())
+        node.anchored[key] = scope
+
+    def remove(self, key, scope):
+        parts = _key_parts(key, scope)
+        trail = [self.root]
+        for part in parts:
+            child = trail[-1].children.get(part)
+            if child is None:
+                return
+            trail.append(child)
+        trail[-1].anchored.pop(key, None)
+        # Prune nodes that no longer index anything
+        for depth in range(len(parts), 0, -1):
+            node = trail[depth]
+            if node.anchored or node.children:
+                break
+            del trail[depth - 1].children[parts[depth - 1]]
+
+    def walk(self, key, scope):
+        """Return ``(ancestors, node)`` for *key*.
+
+        *ancestors* lists ``(key, scope)`` pairs anchored strictly above the
+        key's node; *node* is the key's own node, or None if it is not in
+        the trie.
+        """
+        ancestors = []
+        node = self.root
+        for part in _key_parts(key, scope):
+            ancestors.extend(node.anchored.items())
+            node = node.children.get(part)
+            if node is None:
+                break
+        return ancestors, node
+
+    def subtree(self, node):
+        """Yield ``(key, scope)`` for every key anchored at or below *node*."""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            yield from current.anchored.items()
+            stack.extend(current.children.values())
+
+
+class _LockRegistry(dict):
+    """Lock registry mapping that keeps a ``_PathTrie`` index in sync.
+
+    ``dirty`` is set whenever a key is assigned or deleted, and ``changed``
+    collects the ``(key, scope)`` pairs involved so sharded stores rewrite
+    only the shards that changed; ``before`` keeps each changed key's record
+    as of the last ``mark_clean`` (None if it was unlocked).  ``version`` counts every modification,
+    wait queues included.  Records are treated as immutable: callers replace
+    a record rather than editing it in place, so the bookkeeping (and the
+    index) always reflect the real state.
+    """
+
+    def __init__(self, data=None):
+        super().__init__()
+        self.trie = _PathTrie()
+        self.changed = set()
+        self.before = {}
+        self.version = 0
+        self._waiters_dirty = False
+        for key, record in (data or {}).items():
+            if isinstance(record, dict):
+                self[key] = record
+        self.dirty = False
+        self.changed.clear()
+        self.before = {}
+        # Wait queues (key -> FIFO list); callers set waiters_dirty on change
+        self.waiters = {}
+        # Contention events recorded during the transaction (see _stat)
+        self.events = []
+
+    @property
+    def waiters_dirty(self):
+        return self._waiters_dirty
+
+    @waiters_dirty.setter
+    def waiters_dirty(self, value):
+        if value:
+            self.version += 1
+        self._waiters_dirty = value
+
+    def mark_clean(self):
+        """Forget pending changes once a store has captured them."""
+        self.dirty = False
+        self.changed.clear()
+        self.before = {}
+        self._waiters_dirty = False
+
+    def __setitem__(self, key, record):
+        if key not in self.before:
+            self.before[key] = self.get(key)
+        if key in self:
+            old_scope = _record_scope(self[key])
+            self.trie.remove(key, old_scope)
+            self.changed.add((key, old_scope))
+        super().__setitem__(key, record)
+        scope = _record_scope(record)
+        self.trie.insert(key, scope)
+        self.changed.add((key, scope))
+        self.dirty = True
+        self.version += 1
+
+    def __delitem__(self, key):
+        if key not in self.before:
+            self.before[key] = self[key]
+        scope = _record_scope(self[key])
+        self.trie.remove(key, scope)
+        super().__delitem__(key)
+        self.changed.add((key, scope))
+        self.dirty = True
+        self.version += 1
+
+
+def _overlaps(request_key, request_scope, other_key, other_scope, relation):
+    """Decide whether a lock on *other_key* conflicts with the request.
+
+    *relation* says where the other key is anchored relative to the
+    request's node: ``"ancestor"``, ``"same"`` or ``"descendant"``.  Glob
+    against glob or directory is treated conservatively as overlapping.
+    """
+    if relation == "ancestor":
+        if other_scope == "directory":
+            return True
+        if other_scope == "glob":
+            return request_scope != "file" or _glob_match(other_key, request_key)
+        return False
+    if relation == "same":
+        if other_key == request_key:
+            return True
+        if request_scope == "file":
+            return other_scope == "glob" and _glob_match(other_key, request_key)
+        return other_scope != "file" or (
+            request_scope == "glob" and _glob_match(request_key, other_key)
+        )
+    # descendant
+    if request_scope == "file":
+        return False
+    if request_scope == "glob" and other_scope == "file":
+        return _glob_match(request_key, other_key)
+    return True
+
+
+def _related_locks(locks, key, scope):
+    """Collect active locks overlapping *key*, grouped by relation.
+
+    Returns:
+        dict: ``{"ancestor": [...], "same": [...], "descendant": [...]}``
+        where each list holds ``(key, record)`` pairs.
+    """
+    related = {"ancestor": [], "same": [], "descendant": []}
+    ancestors, node = locks.trie.walk(key, scope)
+    candidates = [(k, s, "ancestor") for k, s in ancestors]
+    if node is not None:
+        candidates.extend((k, s, "same") for k, s in node.anchored.items())
+        if scope != "file":
+            for child in node.children.values():
+                candidates.extend(
+                    (k, s, "descendant") for k, s in locks.trie.subtree(child)
+                )
+    for other_key, other_scope, relation in candidates:
+        if not _overlaps(key, scope, other_key, other_scope, relation):
+            continue
+        for holder in _holder_records(locks[other_key]):
+            related[relation].append((other_key, holder))
+    return related
+
+
+def _find_conflicts(locks, key, scope, agent_name, mode="exclusive"):
+    """Return ``(key, holder record)`` pairs for active locks of other
+    agents that overlap the requested key and are incompatible with *mode*."""
+    related = _related_locks(locks, key, scope)
+    return [
+        (other_key, record)
+        for group in ("same", "ancestor", "descendant")
+        for other_key, record in related[group]
+        if record.get("agent") != agent_name
+        and not (mode == "shared" and _record_mode(record) == "shared")
+    ]
+
+
+def _holder_summary(other_key, record):
+    return {
+        "file": other_key,
+        "scope": _record_scope(record),
+        "mode": _record_mode(record),
+        "holder": record.get("agent"),
+        "reason": record.get("reason", ""),
+        "acquired": record.get("acquired"),
+    }
+
+
+def _conflict_message(key, existing):
+    label = {"file": "File", "directory": "Directory", "glob": "Pattern"}[
+        _record_scope(existing)
+    ]
+    shared = " (shared)" if _record_mode(existing) == "shared" else ""
+    return (
+        f"{label} {key} is locked{shared} by {existing.get('agent', 'unknown')} "
+        f"(reason: {existing.get('reason', 'none')}). "
+        f"Lock acquired at {existing.get('acquired', 'unknown')}."
+    )
+
+
+def _grant_lock(locks, key, agent_name, reason, now, scope="file", ttl=None,
+                mode="exclusive"):
+    """Record *agent_name* as a holder of *key* with a fresh lease.
+
+    The caller must already have checked ``_find_conflicts``, so any other
+    holder left on the record is expired (or, for a shared grant, shared).
+    A refresh by the current holder keeps its previous reason and TTL unless
+    new ones are given; a holder can switch between modes this way.
+
+    Returns:
+        str: A message describing whether the lock was new, refreshed,
+        upgraded, downgraded, or reclaimed from an expired holder.
+    """
+    existing = locks.get(key)
+    current = _held_by(existing, agent_name)
+    if current is not None:
+        reason = reason or current.get("reason", "")
+        if ttl is None:
+            ttl = current.get("ttl")
+    lease = {
+        "acquired": now.strftime(_ISO_FMT),
+        "reason": reason,
+        "ttl": _lease_seconds(ttl),
+    }
 
-def acquire_lock(file_path, agent_name, reason=""):
+    others = []
+    if existing is not None:
+        others = [(a, l) for a, l in _holders(existing) if a != agent_name]
+    kept = {}
+    for other, other_lease in others:
+        if mode == "shared" and not _is_expired(other_lease):
+            kept[other] = other_lease  # fellow readers stay
+        else:
+            _stat(locks, "reclaim", key, other)
+
+    old_mode = _record_mode(existing) if current is not None else None
+    label = "Shared lock" if mode == "shared" else "Lock"
+    if old_mode is None:
+        _stat(locks, "acquire", key, agent_name)
+        message = f"{label} acquired by {agent_name} on {key}"
+        if others and len(kept) < len(others):
+            expired = [a for a, _ in others if a not in kept]
+            message = (
+                f"Expired lock from {', '.join(expired)} reclaimed by "
+                f"{agent_name} on {key}"
+            )
+    elif old_mode == mode:
+        message = f"{label} refreshed for {agent_name} on {key}"
+    elif mode == "exclusive":
+        message = f"Lock upgraded to exclusive for {agent_name} on {key}"
+    else:
+        message = f"Lock downgraded to shared for {agent_name} on {key}"
+
+    if mode == "shared":
+        kept[agent_name] = lease
+        record = {"mode": "shared", "holders": kept}
+    else:
+        record = dict(lease, agent=agent_name)
+        record = {k: record[k] for k in ("agent", "acquired", "reason", "ttl")}
+    if scope != "file":
+        record["scope"] = scope
+    locks[key] = record
+    return message
+
+
+def acquire_lock(file_path, agent_name, reason="", scope=None, ttl=None, mode="exclusive"):
     """Attempt to acquire an exclusive lock on *file_path* for *agent_name*.
 
-    If the file is already locked by another (non-expired) agent the
-    acquisition is rejected and the function returns information about the
-    current holder.
+    *file_path* may name a single file, a directory subtree (trailing ``/``
+    or ``scope="directory"``) or a glob pattern.  The request is rejected if
+    any other agent holds an active lock on the same path, on an enclosing
+    directory or matching glob, or (for directory and glob requests) on
+    anything inside it.
 
     Args:
-        file_path (str): Path of the file to lock (used as the registry key).
+        file_path (str): Path, directory or pattern to lock.
         agent_name (str): Identifier of the requesting agent.
         reason (str, optional): Human-readable reason for the lock.
+        scope (str, optional): ``file``, ``directory`` or ``glob``; inferred
+            from *file_path* when omitted.
+        ttl (float, optional): Lease length in seconds; defaults to
+            ``LOCK_DURATION``.
+        mode (str): ``exclusive`` (the default) or ``shared``.  Any number
+            of agents may hold a path shared at once.  Re-acquiring a held
+            path in the other mode upgrades or downgrades the lock.
 
     Returns:
         dict: A result dictionary with keys ``success`` (bool), ``message``
-        (str), and optionally ``lock`` (the new or existing lock record).
+        (str), and optionally ``lock`` (the new or first conflicting lock
+        record) and ``conflicts`` (every conflicting holder).
     """
-    locks = _read_locks()
-    now = datetime.utcnow()
+    key, scope = _normalize_key(file_path, scope)
+    _check_mode(mode)
+    with _registry_transaction([(key, scope)]) as locks:
+        now = datetime.utcnow()
+        conflicts = _find_conflicts(locks, key, scope, agent_name, mode)
+        # Holders changing mode go ahead of the queue; everyone else queues
+        # behind waiting writers, so readers can't starve them
+        if not conflicts and _held_by(locks.get(key), agent_name) is None:
+            queued = _queued_ahead(locks, key, agent_name, now)
+            if queued:
+                # Don't jump the queue of agents blocked in wait_for_lock
+                _stat(locks, "reject", key, agent_name)
+                return {
+                    "success": False,
+                    "message": (
+                        f"{len(queued)} agents are already waiting for {key}; "
+                        f"use --wait to join the queue"
+                    ),
+                    "waiters": [entry["agent"] for entry in queued],
+                }
+        if conflicts:
+            # Active lock held by a different agent -- reject
+            _stat(locks, "reject", key, agent_name)
+            blocking_key, existing = conflicts[0]
+            return {
+                "success": False,
+                "message": _conflict_message(blocking_key, existing),
+                "lock": existing,
+                "conflicts": [_holder_summary(k, r) for k, r in conflicts],
+            }
 
-    if file_path in locks:
-        existing = locks[file_path]
+        message = _grant_lock(locks, key, agent_name, reason, now, scope, ttl, mode)
+        return {
+            "success": True,
+            "message": message,
+            "lock": locks[key],
+        }
 
-        # Same agent can re-acquire (refresh) its own lock
-        if existing.get("agent") == agent_name:
-            locks[file_path] = {
-                "agent": agent_name,
-                "acquired": now.strftime(_ISO_FMT),
-                "reason": reason or existing.get("reason", ""),
-            }
-            _write_locks(locks)
+
+def _check_mode(mode):
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode '{mode}'. Must be one of: {', '.join(MODES)}")
+
+
+def upgrade_lock(file_path, agent_name, scope=None, wait=False, timeout=None, pid=None):
+    """Turn *agent_name*'s shared lock on *file_path* into an exclusive one.
+
+    The upgrade succeeds at once if the agent is the only live reader;
+    otherwise it fails, or with *wait* queues ahead of other waiters until
+    the remaining readers release.
+
+    Returns:
+        dict: Result as for ``acquire_lock`` (or ``wait_for_lock``).
+    """
+    key, scope = _normalize_key(file_path, scope)
+    with _registry_view([(key, scope)]) as locks:
+        record = locks.get(key)
+        lease = _held_by(record, agent_name)
+    if lease is None or _is_expired(lease):
+        return {"success": False, "message": f"{agent_name} does not hold a lock on {key}"}
+    if _record_mode(record) == "exclusive":
+        return {"success": True, "message": f"{agent_name} already holds {key} exclusively",
+                "lock": record}
+    if wait:
+        return wait_for_lock(key, agent_name, lease.get("reason", ""), scope, timeout,
+                             pid, lease.get("ttl"))
+    return acquire_lock(key, agent_name, lease.get("reason", ""), scope, lease.get("ttl"))
+
+
+def downgrade_lock(file_path, agent_name, scope=None):
+    """Turn *agent_name*'s exclusive lock on *file_path* into a shared one.
+
+    Readers queued for the path are admitted in the same transaction.
+
+    Returns:
+        dict: Result with ``success``, ``message`` and the new ``lock``.
+    """
+    key, scope = _normalize_key(file_path, scope)
+    with _registry_transaction([(key, scope)]) as locks:
+        record = locks.get(key)
+        lease = _held_by(record, agent_name)
+        if lease is None or _is_expired(lease):
+            return {"success": False, "message": f"{agent_name} does not hold a lock on {key}"}
+        if _record_mode(record) == "shared":
+            return {"success": True, "message": f"{agent_name} already holds {key} shared",
+                    "lock": record}
+        message = _grant_lock(locks, key, agent_name, "", datetime.utcnow(), scope,
+                              mode="shared")
+        return {"success": True, "message": message, "lock": locks[key]}
+
+
+def acquire_many(file_paths, agent_name, reason="", ttl=None, mode="exclusive"):
+    """Acquire locks on every path in *file_paths*, or on none of them.
+
+    All paths are checked and granted inside a single registry transaction,
+    so a whole working set costs one read and one write of the registry.
+    If any path is held by another agent nothing is locked and every
+    conflict is reported.  Each path's scope is inferred as in
+    ``acquire_lock``.
+
+    Args:
+        file_paths (list[str]): Paths to lock.
+        agent_name (str): Identifier of the requesting agent.
+        reason (str, optional): Human-readable reason applied to each lock.
+        ttl (float, optional): Lease length in seconds for every lock.
+        mode (str): ``exclusive`` or ``shared`` for every lock.
+
+    Returns:
+        dict: Result with ``success`` (bool), ``message`` (str), and either
+        ``locks`` (key -> granted record) or ``conflicts`` (holder summaries,
+        each with the ``requested`` key it blocks).
+    """
+    _check_mode(mode)
+    requests = dict(_normalize_key(fpath) for fpath in file_paths)
+    if not requests:
+        return {"success": False, "message": "No file paths given", "conflicts": []}
+
+    with _registry_transaction(list(requests.items())) as locks:
+        now = datetime.utcnow()
+        conflicts = []
+        for key, scope in requests.items():
+            for other_key, record in _find_conflicts(locks, key, scope, agent_name, mode):
+                conflicts.append(dict(_holder_summary(other_key, record), requested=key))
+            if _held_by(locks.get(key), agent_name) is not None:
+                continue
+            for entry in _queued_ahead(locks, key, agent_name, now):
+                conflicts.append({
+                    "file": key,
+                    "scope": entry.get("scope", "file"),
+                    "holder": entry["agent"],
+                    "reason": "queued in wait_for_lock",
+                    "acquired": None,
+                    "requested": key,
+                })
+        if conflicts:
+            blocked = {c["requested"] for c in conflicts}
+            for key in sorted(blocked):
+                _stat(locks, "reject", key, agent_name)
             return {
-                "success": True,
-                "message": f"Lock refreshed for {agent_name} on {file_path}",
-                "lock": locks[file_path],
+                "success": False,
+                "message": (
+                    f"{len(blocked)} of {len(requests)} files are locked by "
+                    f"other agents; no locks were acquired"
+                ),
+                "conflicts": conflicts,
             }
 
-        # If the existing lock is expired, reclaim it
-        if _is_expired(existing):
-            old_agent = existing.get("agent", "unknown")
-            locks[file_path] = {
-                "agent": agent_name,
-                "acquired": now.strftime(_ISO_FMT),
-                "reason": reason,
+        for key, scope in requests.items():
+            _grant_lock(locks, key, agent_name, reason, now, scope, ttl, mode)
+        return {
+            "success": True,
+            "message": f"{len(requests)} locks acquired by {agent_name}",
+            "locks": {key: locks[key] for key in requests},
+        }
+
+
+def _waiter_alive(entry, now):
+    deadline = entry.get("deadline")
+    if deadline and datetime.strptime(deadline, _ISO_FMT) < now:
+        return False
+    return pid_alive(entry.get("pid"))
+
+
+def _queued_ahead(locks, key, agent_name, now):
+    """Return live waiters of other agents already queued for *key*."""
+    return [
+        entry for entry in locks.waiters.get(key, [])
+        if entry.get("agent") != agent_name
+        and not entry.get("aborted")
+        and _waiter_alive(entry, now)
+    ]
+
+
+def _promote_waiters(locks, now):
+    """Hand freed locks to the head of each wait queue.
+
+    Queues are visited oldest-first and only their head entry is considered,
+    so waiters for a path are served strictly in arrival order; a run of
+    shared waiters at the head is admitted together.  Entries
+    whose deadline passed or whose process is gone are dropped; entries
+    aborted by deadlock detection are skipped until their waiter collects
+    them.
+    """
+    def head_time(key):
+        queue = locks.waiters[key]
+        return queue[0].get("enqueued", "") if queue else ""
+
+    for key in sorted(locks.waiters, key=head_time):
+        queue = locks.waiters[key]
+        idx = 0
+        while idx < len(queue):
+            head = queue[idx]
+            if not _waiter_alive(head, now):
+                queue.pop(idx)
+                locks.waiters_dirty = True
+                continue
+            if head.get("aborted"):
+                idx += 1
+                continue
+            scope = head.get("scope", "file")
+            mode = head.get("mode", "exclusive")
+            if _find_conflicts(locks, key, scope, head["agent"], mode):
+                break
+            queue.pop(idx)
+            locks.waiters_dirty = True
+            _grant_lock(
+                locks, key, head["agent"], head.get("reason", ""), now, scope,
+                head.get("ttl"), mode,
+            )
+        if not queue:
+            del locks.waiters[key]
+            locks.waiters_dirty = True
+
+
+def _next_expiry(records, now):
+    """Seconds until the first of *records* expires (None if none will)."""
+    expiries = [_expires_at(record) for record in records]
+    expiries = [e for e in expiries if e is not None]
+    if not expiries:
+        return None
+    return max(0.0, (min(expiries) - now).total_seconds())
+
+
+# ---------------------------------------------------------------------------
+# Deadlock detection
+# ---------------------------------------------------------------------------
+#
+# The wait-for graph has an edge A -> B when agent A is queued for a path
+# that B holds (or B is queued ahead of A for the same path), and when the
+# status registry reports A as blocked_by B.  A cycle means none of its
+# agents can make progress.  wait_for_lock searches for a cycle through each
+# new queue entry as it is added; cycles that contain lock-wait edges are
+# broken by aborting one waiter chosen by the victim policy.
+
+# Victim policies: abort the agent whose wait closed the cycle, the most
+# recently queued waiter in the cycle, or the waiter holding fewest locks
+VICTIM_POLICIES = ("requester", "youngest", "fewest-locks")
+DEADLOCK_VICTIM_POLICY = "requester"
+
+# Status registry maintained by status-updater.py (source of blocked_by)
+AGENT_STATUS_FILE = "shared-state/agent-status.json"
+
+
+def _read_blocked_by():
+    """Return ``{agent: blocked_by}`` for agents the status registry marks blocked."""
+    state_dir = (_resolve_lock_file().parent.parent / AGENT_STATUS_FILE).parent
+    return {
+        name: record["blocked_by"]
+        for name, record in read_agents(state_dir, status="blocked").items()
+        if record.get("blocked_by")
+    }
+
+
+def _wait_for_graph(locks, now):
+    """Build the wait-for graph as ``{agent: {target: edge}}``.
+
+    Each edge is a dict with ``kind`` (``lock``, ``queue`` or ``status``)
+    and, for lock-wait edges, the queued ``key`` and waiter ``ticket``.
+    """
+    graph = {}
+
+    def add(src, dst, edge):
+        if src != dst:
+            graph.setdefault(src, {}).setdefault(dst, edge)
+
+    for key, queue in locks.waiters.items():
+        ahead = []
+        for entry in queue:
+            if entry.get("aborted") or not _waiter_alive(entry, now):
+                continue
+            agent = entry["agent"]
+            edge = {"key": key, "ticket": entry["ticket"]}
+            scope, mode = entry.get("scope", "file"), entry.get("mode", "exclusive")
+            for _, record in _find_conflicts(locks, key, scope, agent, mode):
+                add(agent, record.get("agent"), dict(edge, kind="lock"))
+            for prev in ahead:
+                add(agent, prev, dict(edge, kind="queue"))
+            ahead.append(agent)
+
+    for agent, target in _read_blocked_by().items():
+        add(agent, target, {"kind": "status"})
+    return graph
+
+
+def _cycle_through(graph, agent):
+    """Return a cycle ``[agent, ..., agent]`` through *agent*, or None."""
+    parents = {}
+    stack = list(graph.get(agent, {}))
+    for node in stack:
+        parents.setdefault(node, agent)
+    while stack:
+        node = stack.pop()
+        if node == agent:
+            path = [agent]
+            current = parents[agent]
+            while current != agent:
+                path.append(current)
+                current = parents[current]
+            path.append(agent)
+            path.reverse()
+            return path
+        for nxt in graph.get(node, {}):
+            if nxt not in parents:
+                parents[nxt] = node
+                stack.append(nxt)
+    return None
+
+
+def _cycle_edges(graph, cycle):
+    return [
+        dict(graph[src][dst], waiter=src, holder=dst)
+        for src, dst in zip(cycle, cycle[1:])
+    ]
+
+
+def _choose_victim(locks, edges, requester_ticket, policy):
+    """Pick the lock-wait edge whose waiter should be aborted.
+
+    Returns:
+        dict | None: The chosen edge, or None if the cycle has no waiter we
+        can abort (it consists only of status ``blocked_by`` edges).
+    """
+    policy = policy or DEADLOCK_VICTIM_POLICY
+    if policy not in VICTIM_POLICIES:
+        raise ValueError(
+            f"Invalid victim policy '{policy}'. Must be one of: {', '.join(VICTIM_POLICIES)}"
+        )
+    candidates = [e for e in edges if e["kind"] in ("lock", "queue")]
+    if not candidates:
+        return None
+
+    entries = {
+        entry["ticket"]: entry
+        for queue in locks.waiters.values()
+        for entry in queue
+    }
+    if policy == "requester":
+        for edge in candidates:
+            if edge["ticket"] == requester_ticket:
+                return edge
+        policy = "youngest"
+    if policy == "youngest":
+        return max(candidates, key=lambda e: entries[e["ticket"]].get("enqueued", ""))
+    # Under a sharded store only the shards this transaction loaded are
+    # counted, so "fewest locks" is approximate there
+    held = {}
+    for record in locks.values():
+        for agent in _holder_names(record):
+            held[agent] = held.get(agent, 0) + 1
+    return min(candidates, key=lambda e: held.get(e["waiter"], 0))
+
+
+def _abort_waiter(locks, ticket, cycle):
+    """Mark a queue entry as aborted so its waiter gives up."""
+    for queue in locks.waiters.values():
+        for idx, entry in enumerate(queue):
+            if entry["ticket"] == ticket:
+                queue[idx] = dict(entry, aborted={"reason": "deadlock", "cycle": cycle})
+                locks.waiters_dirty = True
+                return
+
+
+def _strongly_connected(graph):
+    """Tarjan's algorithm; yields components that contain a cycle."""
+    index, low, on_stack, stack, counter = {}, {}, set(), [], [0]
+    components = []
+
+    def visit(node):
+        index[node] = low[node] = counter[0]
+        counter[0] += 1
+        stack.append(node)
+        on_stack.add(node)
+        for nxt in graph.get(node, {}):
+            if nxt not in index:
+                visit(nxt)
+                low[node] = min(low[node], low[nxt])
+            elif nxt in on_stack:
+                low[node] = min(low[node], index[nxt])
+        if low[node] == index[node]:
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            if len(component) > 1:
+                components.append(component)
+
+    for node in list(graph):
+        if node not in index:
+            visit(node)
+    return components
+
+
+def find_deadlocks(break_cycles=False, victim_policy=None):
+    """Report (and optionally break) circular waits between agents.
+
+    Args:
+        break_cycles (bool): Abort one waiter per breakable cycle.
+        victim_policy (str, optional): One of ``VICTIM_POLICIES``; defaults
+            to ``DEADLOCK_VICTIM_POLICY``.
+
+    Returns:
+        dict: ``count`` and ``deadlocks``, a list of cycles each with
+        ``agents``, ``edges``, ``breakable`` and, when broken, ``victim``.
+    """
+    ctx = _registry_transaction() if break_cycles else _registry_view()
+    with ctx as locks:
+        now = datetime.utcnow()
+        graph = _wait_for_graph(locks, now)
+        report = []
+        for component in _strongly_connected(graph):
+            members = set(component)
+            sub = {
+                src: {dst: e for dst, e in graph[src].items() if dst in members}
+                for src in component
             }
-            _write_locks(locks)
+            cycle = _cycle_through(sub, sorted(component)[0])
+            edges = _cycle_edges(sub, cycle)
+            victim = _choose_victim(locks, edges, None, victim_policy)
+            item = {"agents": cycle, "edges": edges, "breakable": victim is not None}
+            if break_cycles and victim is not None:
+                _abort_waiter(locks, victim["ticket"], cycle)
+                item["victim"] = {"agent": victim["waiter"], "key": victim["key"]}
+            report.append(item)
+    return {"count": len(report), "deadlocks": report}
+
+
+def wait_for_lock(file_path, agent_name, reason="", scope=None, timeout=None, pid=None,
+                  ttl=None, victim_policy=None, mode="exclusive"):
+    """Acquire a lock, blocking in a FIFO queue until it is available.
+
+    If the path is free the lock is granted immediately.  Otherwise the
+    agent joins the path's persistent wait queue and sleeps until a release
+    or expiry hands the lock over; the hand-off happens inside the
+    releasing transaction, so the next waiter in line always wins.
+
+    Args:
+        file_path (str): Path, directory or pattern to lock.
+        agent_name (str): Identifier of the requesting agent.
+        reason (str, optional): Human-readable reason for the lock.
+        scope (str, optional): Lock scope; inferred when omitted.
+        timeout (float, optional): Seconds to wait; None waits indefinitely.
+        pid (int, optional): Process to tie the queue entry to.  Entries of
+            processes that have exited are skipped.  Defaults to this process.
+        ttl (float, optional): Lease length in seconds once granted.
+        victim_policy (str, optional): How to break a deadlock this wait
+            would close; see ``VICTIM_POLICIES``.
+        mode (str): ``exclusive`` or ``shared``.  A holder waiting to change
+            mode (an upgrade) queues ahead of agents that hold nothing.
+
+    Returns:
+        dict: Result with ``success`` (bool), ``message`` (str), ``waited``
+        (seconds), ``lock`` on success, and ``deadlock`` (the agent cycle)
+        if the wait was aborted to break a deadlock.
+    """
+    key, scope = _normalize_key(file_path, scope)
+    _check_mode(mode)
+    started = time.monotonic()
+    ticket = uuid.uuid4().hex
+    watcher = _active_store().watcher((key, scope))
+
+    def granted(locks):
+        in_queue = any(e.get("ticket") == ticket for e in locks.waiters.get(key, []))
+        record = locks.get(key)
+        held = _held_by(record, agent_name) is not None and (
+            mode == "shared" or _record_mode(record) == "exclusive"
+        )
+        if not in_queue and held:
+            _stat(locks, "wait", key, agent_name, time.monotonic() - started)
             return {
                 "success": True,
-                "message": (
-                    f"Expired lock from {old_agent} reclaimed by {agent_name} "
-                    f"on {file_path}"
-                ),
-                "lock": locks[file_path],
+                "message": f"Lock acquired by {agent_name} on {key} after waiting",
+                "lock": record,
+                "waited": round(time.monotonic() - started, 3),
             }
+        return None
 
-        # Active lock held by a different agent -- reject
+    try:
+        with _registry_transaction([(key, scope)]) as locks:
+            now = datetime.utcnow()
+            conflicts = _find_conflicts(locks, key, scope, agent_name, mode)
+            holding = _held_by(locks.get(key), agent_name) is not None
+            if not conflicts and (holding or not _queued_ahead(locks, key, agent_name, now)):
+                message = _grant_lock(locks, key, agent_name, reason, now, scope, ttl, mode)
+                return {"success": True, "message": message, "lock": locks[key], "waited": 0.0}
+
+            entry = {
+                "ticket": ticket,
+                "agent": agent_name,
+                "scope": scope,
+                "reason": reason,
+                "pid": pid or os.getpid(),
+                "ttl": _lease_seconds(ttl),
+                "enqueued": now.strftime(_ISO_FMT),
+                "deadline": None,
+                "mode": mode,
+            }
+            if timeout is not None:
+                entry["deadline"] = (now + timedelta(seconds=timeout)).strftime(_ISO_FMT)
+            queue = locks.waiters.setdefault(key, [])
+            if holding:
+                # Upgrades go ahead of agents that hold nothing yet
+                record = locks.get(key)
+                position = 0
+                while position < len(queue) and _held_by(record, queue[position]["agent"]):
+                    position += 1
+                queue.insert(position, entry)
+            else:
+                queue.append(entry)
+            locks.waiters_dirty = True
+
+            # Does this wait close a cycle in the wait-for graph?
+            graph = _wait_for_graph(locks, now)
+            cycle = _cycle_through(graph, agent_name)
+            if cycle is not None:
+                victim = _choose_victim(
+                    locks, _cycle_edges(graph, cycle), ticket, victim_policy
+                )
+                if victim is not None and victim["ticket"] == ticket:
+                    locks.waiters[key].remove(entry)
+                    if not locks.waiters[key]:
+                        del locks.waiters[key]
+                    return {
+                        "success": False,
+                        "message": (
+                            f"Deadlock: waiting for {key} would close the cycle "
+                            f"{' -> '.join(cycle)}"
+                        ),
+                        "deadlock": cycle,
+                        "waited": 0.0,
+                    }
+                if victim is not None:
+                    _abort_waiter(locks, victim["ticket"], cycle)
+            next_wake = _next_expiry([r for _, r in conflicts], now)
+
+        while True:
+            remaining = None
+            if timeout is not None:
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+            # Sleep until notified, the deadline, or a blocking lock expires
+            pauses = [t for t in (remaining, next_wake) if t is not None]
+            watcher.wait(min(pauses) if pauses else None)
+
+            with _registry_transaction([(key, scope)]) as locks:
+                _promote_waiters(locks, datetime.utcnow())
+                result = granted(locks)
+                if result is not None:
+                    return result
+                queue = locks.waiters.get(key, [])
+                mine = next((e for e in queue if e.get("ticket") == ticket), None)
+                if mine is not None and mine.get("aborted"):
+                    queue.remove(mine)
+                    if not queue:
+                        del locks.waiters[key]
+                    locks.waiters_dirty = True
+                    cycle = mine["aborted"].get("cycle", [])
+                    return {
+                        "success": False,
+                        "message": (
+                            f"Wait for {key} aborted to break the deadlock "
+                            f"{' -> '.join(cycle)}"
+                        ),
+                        "deadlock": cycle,
+                        "waited": round(time.monotonic() - started, 3),
+                    }
+                if mine is None:
+                    if timeout is not None and time.monotonic() - started >= timeout:
+                        break  # dropped for passing its own deadline
+                    return {
+                        "success": False,
+                        "message": f"{agent_name} was removed from the wait queue for {key}",
+                        "waited": round(time.monotonic() - started, 3),
+                    }
+                now = datetime.utcnow()
+                next_wake = _next_expiry(
+                    [r for _, r in _find_conflicts(locks, key, scope, agent_name, mode)], now
+                )
+
+        # Timed out: leave the queue unless the lock arrived in the meantime
+        with _registry_transaction([(key, scope)]) as locks:
+            result = granted(locks)
+            if result is not None:
+                return result
+            queue = locks.waiters.get(key, [])
+            position = next(
+                (i for i, e in enumerate(queue) if e.get("ticket") == ticket), None
+            )
+            if position is not None:
+                queue.pop(position)
+                if not queue:
+                    del locks.waiters[key]
+                locks.waiters_dirty = True
+            _stat(locks, "wait", key, agent_name, time.monotonic() - started)
         return {
             "success": False,
-            "message": (
-                f"File {file_path} is locked by {existing.get('agent', 'unknown')} "
-                f"(reason: {existing.get('reason', 'none')}). "
-                f"Lock acquired at {existing.get('acquired', 'unknown')}."
-            ),
-            "lock": existing,
+            "message": f"Timed out after {timeout}s waiting for {key}",
+            "waited": round(time.monotonic() - started, 3),
         }
+    finally:
+        watcher.close()
+
+
+def renew_leases(agent_name, file_paths=None, ttl=None):
+    """Extend the leases on *agent_name*'s locks.
+
+    Only each lock's ``renewed`` timestamp (and ``ttl``, if given) changes;
+    ownership, reason and acquisition time are left alone.  A lease that
+    ran out is revived as long as no other agent has taken the path.
+
+    Args:
+        agent_name (str): Identifier of the lease holder.
+        file_paths (list[str], optional): Locks to renew; all of the agent's
+            locks when omitted.
+        ttl (float, optional): New lease length in seconds; keeps each
+            lock's current TTL when omitted.
+
+    Returns:
+        dict: Result with ``success`` (False if any named lock is no longer
+        held), ``renewed`` (keys), ``missing`` (keys not held by the agent)
+        and ``expires`` (key -> new expiry).
+    """
+    requested = None
+    if file_paths is not None:
+        requested = list(dict(_normalize_key(fpath) for fpath in file_paths).items())
+    with _registry_transaction(requested) as locks:
+        now = datetime.utcnow()
+        if requested is None:
+            keys = [k for k, rec in locks.items() if _held_by(rec, agent_name) is not None]
+        else:
+            keys = [key for key, _ in requested]
+
+        renewed, missing, expires = [], [], {}
+        for key in keys:
+            record = locks.get(key)
+            lease = _held_by(record, agent_name)
+            if lease is None:
+                missing.append(key)
+                continue
+            lease = dict(lease, renewed=now.strftime(_ISO_FMT))
+            if ttl is not None:
+                lease["ttl"] = _lease_seconds(ttl)
+            locks[key] = _with_lease(record, agent_name, lease)
+            renewed.append(key)
+            expires[key] = _expires_at(lease).strftime(_ISO_FMT)
 
-    # No existing lock -- grant a new one
-    locks[file_path] = {
-        "agent": agent_name,
-        "acquired": now.strftime(_ISO_FMT),
-        "reason": reason,
-    }
-    _write_locks(locks)
     return {
-        "success": True,
-        "message": f"Lock acquired by {agent_name} on {file_path}",
-        "lock": locks[file_path],
+        "success": not missing,
+        "message": (
+            f"Renewed {len(renewed)} leases for {agent_name}"
+            + (f"; {len(missing)} no longer held" if missing else "")
+        ),
+        "renewed": renewed,
+        "missing": missing,
+        "expires": expires,
     }
 
 
-def release_lock(file_path, agent_name):
+class LeaseKeeper:
+    """Background thread that keeps an agent's leases alive.
+
+    Renews the agent's locks every ``ttl * RENEW_FRACTION`` seconds until
+    stopped, or until the optional *watch_pid* process exits, after which
+    the leases lapse on their own within one TTL.  Renewals go through the
+    lock broker when one is running.
+
+    Example::
+
+        with LeaseKeeper("impl-a", ttl=30):
+            ...  # locks acquired with ttl=30 stay held while this runs
+    """
+
+    def __init__(self, agent_name, file_paths=None, ttl=30, interval=None,
+                 watch_pid=None, use_broker=True):
+        self.agent_name = agent_name
+        self.file_paths = file_paths
+        self.ttl = ttl
+        self.interval = interval or max(0.1, float(ttl) * RENEW_FRACTION)
+        self.watch_pid = watch_pid
+        self.use_broker = use_broker
+        self.lost = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self.run, name=f"lease-keeper-{agent_name}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def renew_once(self):
+        """Renew the leases now and remember any that were lost."""
+        result = _call_operation("renew", {
+            "agent_name": self.agent_name,
+            "file_paths": self.file_paths,
+            "ttl": self.ttl,
+        }, use_broker=self.use_broker)
+        self.lost.extend(k for k in result.get("missing", []) if k not in self.lost)
+        return result
+
+    def run(self):
+        """Renew until stopped (or the watched process exits)."""
+        while not self._stop.is_set():
+            if self.watch_pid is not None and not pid_alive(self.watch_pid):
+                break
+            try:
+                self.renew_once()
+            except (OSError, RuntimeError) as exc:
+                print(f"lease keeper: renewal failed: {exc}", file=sys.stderr)
+            self._stop.wait(self.interval)
+
+
+def release_lock(file_path, agent_name, scope=None):
     """Release the lock on *file_path* if it is held by *agent_name*.
 
     Args:
-        file_path (str): Path of the file to unlock.
+        file_path (str): Path, directory or pattern to unlock.
         agent_name (str): Identifier of the agent releasing the lock.
+        scope (str, optional): Lock scope; inferred when omitted.
 
     Returns:
         dict: A result dictionary with ``success`` (bool) and ``message`` (str).
     """
-    locks = _read_locks()
+    key, scope = _normalize_key(file_path, scope)
+    with _registry_transaction([(key, scope)]) as locks:
+        if key not in locks:
+            return {
+                "success": True,
+                "message": f"No lock exists for {key} (nothing to release)",
+            }
+
+        existing = locks[key]
+        if _held_by(existing, agent_name) is None:
+            holder = ", ".join(str(a) for a in _holder_names(existing)) or "unknown"
+            return {
+                "success": False,
+                "message": (
+                    f"Cannot release lock on {key}: held by {holder}, "
+                    f"not {agent_name}"
+                ),
+            }
 
-    if file_path not in locks:
+        _release_holder(locks, key, agent_name, datetime.utcnow())
         return {
             "success": True,
-            "message": f"No lock exists for {file_path} (nothing to release)",
+            "message": f"Lock released by {agent_name} on {key}",
         }
 
-    existing = locks[file_path]
-    holder = existing.get("agent", "unknown")
 
-    if holder != agent_name:
+def _release_holder(locks, key, agent_name, now):
+    """Drop *agent_name* from the lock on *key*, deleting it if no holder is left."""
+    record = locks[key]
+    _stat(locks, "hold", key, agent_name, _held_seconds(_held_by(record, agent_name), now))
+    remaining = _without_holder(record, agent_name)
+    if remaining is None:
+        del locks[key]
+    else:
+        locks[key] = remaining
+
+
+def release_many(file_paths, agent_name):
+    """Release *agent_name*'s locks on every path in *file_paths*.
+
+    Like ``acquire_many`` this is all-or-nothing: if any path is held by a
+    different agent, no lock is released and the offending paths are listed.
+    Paths that are not locked at all are skipped.
+
+    Args:
+        file_paths (list[str]): Paths to unlock.
+        agent_name (str): Identifier of the agent releasing the locks.
+
+    Returns:
+        dict: Result with ``success`` (bool), ``message`` (str), and either
+        ``released`` (list of keys) or ``conflicts``.
+    """
+    requested = dict(_normalize_key(fpath) for fpath in file_paths)
+    keys = list(requested)
+    with _registry_transaction(list(requested.items())) as locks:
+        conflicts = [
+            {"file": key, "holder": ", ".join(str(a) for a in _holder_names(locks[key]))}
+            for key in keys
+            if key in locks and _held_by(locks[key], agent_name) is None
+        ]
+        if conflicts:
+            return {
+                "success": False,
+                "message": (
+                    f"{len(conflicts)} files are held by other agents; "
+                    f"no locks were released"
+                ),
+                "conflicts": conflicts,
+            }
+
+        released = [key for key in keys if key in locks]
+        now = datetime.utcnow()
+        for key in released:
+            _release_holder(locks, key, agent_name, now)
         return {
-            "success": False,
-            "message": (
-                f"Cannot release lock on {file_path}: held by {holder}, "
-                f"not {agent_name}"
-            ),
+            "success": True,
+            "message": f"{len(released)} locks released by {agent_name}",
+            "released": released,
         }
 
-    del locks[file_path]
-    _write_locks(locks)
-    return {
-        "success": True,
-        "message": f"Lock released by {agent_name} on {file_path}",
-    }
-
 
-def check_lock(file_path):
+def check_lock(file_path, scope=None):
     """Check the lock status of *file_path*.
 
+    Besides the lock on the path itself, reports the holders of enclosing
+    directory and glob locks (``ancestors``) and, for directory and glob
+    queries, of locks inside the queried subtree (``descendants``).
+
     Args:
-        file_path (str): Path to query.
+        file_path (str): Path, directory or pattern to query.
+        scope (str, optional): Lock scope; inferred when omitted.
 
     Returns:
         dict: Lock status with ``locked`` (bool), ``expired`` (bool if locked),
-        ``holder`` (str or None), ``reason`` (str or None), and
-        ``acquired`` (str or None).
+        ``holder`` (str or None; comma-separated readers for a shared lock,
+        which also lists them in ``holders``), ``reason`` (str or None),
+        ``acquired`` (str or None), ``mode`` (str or None), ``scope`` (str),
+        ``ancestors`` and
+        ``descendants`` (lists of holder summaries), and ``waiters`` (agents
+        queued for the path, in order).
     """
-    locks = _read_locks()
-
-    if file_path not in locks:
-        return {
+    key, scope = _normalize_key(file_path, scope)
+    with _registry_view([(key, scope)]) as locks:
+        record = locks.get(key)
+        related = _related_locks(locks, key, scope)
+        waiters = [entry.get("agent") for entry in locks.waiters.get(key, [])]
+
+    ancestors = [_holder_summary(k, r) for k, r in related["ancestor"]]
+    descendants = [_holder_summary(k, r) for k, r in related["descendant"]]
+    for other_key, other in related["same"]:
+        if other_key == key:
+            continue
+        summary = _holder_summary(other_key, other)
+        if summary["scope"] == "directory":
+            ancestors.append(summary)
+        else:
+            descendants.append(summary)
+
+    if record is None:
+        result = {
             "locked": False,
             "holder": None,
             "reason": None,
             "acquired": None,
         }
-
-    record = locks[file_path]
-    expired = _is_expired(record)
-    return {
-        "locked": not expired,
-        "expired": expired,
-        "holder": record.get("agent"),
-        "reason": record.get("reason", ""),
-        "acquired": record.get("acquired"),
-    }
+    elif _record_mode(record) == "shared":
+        live = _holder_records(record)
+        first = live[0] if live else {}
+        result = {
+            "locked": bool(live),
+            "expired": not live,
+            "holder": ", ".join(view["agent"] for view in live) or None,
+            "reason": first.get("reason"),
+            "acquired": min((view.get("acquired", "") for view in live), default=None),
+            "holders": [view["agent"] for view in live],
+        }
+    else:
+        expired = _is_expired(record)
+        result = {
+            "locked": not expired,
+            "expired": expired,
+            "holder": record.get("agent"),
+            "reason": record.get("reason", ""),
+            "acquired": record.get("acquired"),
+        }
+    result["mode"] = None if record is None else _record_mode(record)
+    result["scope"] = scope
+    result["ancestors"] = ancestors
+    result["descendants"] = descendants
+    result["waiters"] = waiters
+    return result
 
 
 def list_locks():
     """List all current locks with their status.
 
     Returns:
-        list[dict]: A list of lock records augmented with the file path and
-        expiration status.
+        list[dict]: A list of lock records augmented with the file path,
+        scope, mode and expiration status.  Shared locks appear once per
+        holder.
     """
-    locks = _read_locks()
     results = []
-    for fpath, record in locks.items():
-        results.append({
-            "file": fpath,
-            "agent": record.get("agent"),
-            "reason": record.get("reason", ""),
-            "acquired": record.get("acquired"),
-            "expired": _is_expired(record),
-        })
+    for fpath, record in _registry_records():
+        for agent, lease in _holders(record):
+            results.append({
+                "file": fpath,
+                "scope": _record_scope(record),
+                "mode": _record_mode(record),
+                "agent": agent,
+                "reason": lease.get("reason", ""),
+                "acquired": lease.get("acquired"),
+                "expired": _is_expired(lease),
+            })
     return results
 
 
 def clean_expired():
     """Remove all expired locks from the registry.
 
+    Expired readers are dropped from shared locks that other readers
+    still hold.
+
     Returns:
         dict: Summary with ``removed`` (int) and ``remaining`` (int).
     """
-    locks = _read_locks()
-    expired_keys = [fp for fp, rec in locks.items() if _is_expired(rec)]
-    for key in expired_keys:
-        del locks[key]
-    _write_locks(locks)
+    with _registry_transaction() as locks:
+        removed = 0
+        for key, record in list(locks.items()):
+            for agent, lease in _holders(record):
+                if not _is_expired(lease):
+                    continue
+                _stat(locks, "reclaim", key, agent or "unknown")
+                removed += 1
+                record = _without_holder(record, agent)
+                if record is None:
+                    break
+            if record is None:
+                del locks[key]
+            elif record is not locks[key]:
+                locks[key] = record
+        return {
+            "removed": removed,
+            "remaining": len(locks),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Optimistic concurrency
+# ---------------------------------------------------------------------------
+#
+# Instead of locking, an agent can note a file's version (its content hash)
+# when it reads it, write its edit to a scratch file, and ask
+# ``commit_check`` to install the edit.  Inside a registry transaction the
+# check confirms the file still has the version the agent read and that no
+# other agent holds a lock on it, then renames the scratch file into place,
+# so two optimistic writers can never both succeed against the same version.
+# Hashes are cached by (inode, mtime, size): re-checking an unchanged file
+# costs one stat.
+
+# Version reported for a file that does not exist (optimistic creation)
+ABSENT_VERSION = "absent"
+
+
+class _HashCache:
+    """Content hashes keyed by path, valid while (inode, mtime, size) match.
+
+    The cache is kept in memory and persisted to ``HASH_CACHE_FILE`` so
+    short-lived CLI processes share it; it is bounded to the most recently
+    hashed ``HASH_CACHE_ENTRIES`` files.
+    """
+
+    def __init__(self):
+        self._entries = None
+        self._dirty = False
+        self._mutex = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(_resolve_hash_cache_file(), "r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+            except (FileNotFoundError, json.JSONDecodeError, IOError):
+                data = {}
+            self._entries = data if isinstance(data, dict) else {}
+        return self._entries
+
+    def version(self, path):
+        """Return the version of the file at *path* (``ABSENT_VERSION`` if missing)."""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return ABSENT_VERSION
+        signature = [st.st_ino, st.st_mtime_ns, st.st_size]
+        with self._mutex:
+            entries = self._load()
+            cached = entries.get(path)
+            if cached is not None and cached[:3] == signature:
+                return cached[3]
+        digest = _hash_file(path)
+        with self._mutex:
+            entries.pop(path, None)  # re-insert as most recent
+            entries[path] = signature + [digest]
+            while len(entries) > HASH_CACHE_ENTRIES:
+                del entries[next(iter(entries))]
+            self._dirty = True
+        return digest
+
+    def save(self):
+        with self._mutex:
+            if not self._dirty:
+                return
+            text = json.dumps(self._entries, separators=(",", ":"))
+            self._dirty = False
+        try:
+            atomic_write_text(_resolve_hash_cache_file(), text)
+        except OSError:
+            pass  # only a cache
+
+
+_HASHES = _HashCache()
+
+
+def _resolve_hash_cache_file():
+    return _resolve_lock_file().parent.parent / HASH_CACHE_FILE
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return "sha256:" + digest.hexdigest()
+
+
+def file_version(file_path, real_path=None):
+    """Return the current version of *file_path* for a later ``commit_check``.
+
+    Args:
+        file_path (str): Path as used for locking.
+        real_path (str, optional): Filesystem location of the file when it
+            differs from *file_path* (the CLI passes an absolute path so the
+            broker resolves it the same way).
+
+    Returns:
+        dict: ``file`` (lock key) and ``version`` (content hash, or
+        ``"absent"`` if the file does not exist).
+    """
+    key, _ = _normalize_key(file_path, "file")
+    version = _HASHES.version(real_path or file_path)
+    _HASHES.save()
+    return {"file": key, "version": version}
+
+
+def commit_check(file_path, agent_name, expected, source=None, real_path=None):
+    """Validate (and optionally apply) an optimistic write to *file_path*.
+
+    The check succeeds if the file's current version equals *expected* and
+    no other agent holds a lock covering it.  With *source* the new content
+    is installed by renaming *source* over the file inside the same
+    transaction, so the check and the write are one atomic step.
+
+    Args:
+        file_path (str): Path as used for locking.
+        agent_name (str): Identifier of the writing agent.
+        expected (str): Version returned by ``file_version`` at read time.
+        source (str, optional): Scratch file holding the new content; it
+            must be on the same filesystem as the target.
+        real_path (str, optional): Filesystem location of the file, as for
+            ``file_version``.
+
+    Returns:
+        dict: Result with ``success``, ``message``, ``version`` (current, or
+        new once written) and, on failure, ``conflicts`` or ``expected``.
+    """
+    key, scope = _normalize_key(file_path, "file")
+    target = real_path or file_path
+    with _registry_transaction([(key, scope)]) as locks:
+        conflicts = _find_conflicts(locks, key, scope, agent_name)
+        if conflicts:
+            _stat(locks, "reject", key, agent_name)
+            return {
+                "success": False,
+                "message": _conflict_message(*conflicts[0]),
+                "conflicts": [_holder_summary(k, r) for k, r in conflicts],
+            }
+        current = _HASHES.version(target)
+        if current != expected:
+            _stat(locks, "reject", key, agent_name)
+            _HASHES.save()
+            return {
+                "success": False,
+                "message": f"{key} changed since it was read; re-read and retry",
+                "expected": expected,
+                "version": current,
+            }
+        if source is None:
+            _HASHES.save()
+            return {"success": True, "message": f"{key} is unchanged", "version": current}
+
+        try:
+            os.replace(source, target)
+        except OSError as exc:
+            # Missing scratch file, or one on another filesystem (EXDEV)
+            _HASHES.save()
+            return {
+                "success": False,
+                "message": f"Could not install {source} as {key}: {exc.strerror or exc}",
+                "version": current,
+            }
+        version = _HASHES.version(target)
+        _HASHES.save()
+        _stat(locks, "acquire", key, agent_name)
+        return {
+            "success": True,
+            "message": f"Committed {key} for {agent_name}",
+            "version": version,
+        }
+
+
+STORES = ("json", "sharded", "journal")
+
+
+def migrate_store(store, shards=DEFAULT_SHARD_COUNT):
+    """Move the registry to another on-disk layout.
+
+    ``json`` keeps every lock in ``file-ownership.json``; ``sharded`` spreads
+    them over *shards* files under ``shared-state/locks/shards/`` so each
+    transaction only rewrites the shards it touches; ``journal`` appends
+    each change to a log under ``shared-state/locks/journal/`` and compacts
+    it into a snapshot.  Re-running ``sharded`` with a different shard count
+    reshards the registry.
+
+    Args:
+        store (str): ``json``, ``sharded`` or ``journal``.
+        shards (int): Number of file-lock shards for the sharded layout.
+
+    Returns:
+        dict: Result with ``success``, ``message`` and ``store``.
+    """
+    if store not in STORES:
+        raise ValueError(f"Invalid store '{store}'. Must be one of: {', '.join(STORES)}")
+    if store == "sharded" and shards < 1:
+        raise ValueError(f"Shard count must be positive, got {shards}")
+
+    with _registry_guard():
+        if _resolve_broker_socket().exists():
+            return {
+                "success": False,
+                "message": "Stop the lock broker before migrating the registry",
+            }
+        source = _disk_store()
+        data = dict(source.records())
+
+        # Retire the current layouts first: the sharded manifest and the
+        # journal snapshot are what select them
+        shard_dir = _resolve_shard_dir()
+        if shard_dir.is_dir():
+            for path in shard_dir.glob("*.json"):
+                path.unlink()
+        journal = _JournalStore()
+        for path in (journal.snapshot_path, journal.journal_path):
+            path.unlink(missing_ok=True)  # rotated segments stay as history
+
+        if store == "sharded":
+            locks = _LockRegistry(data)
+            locks.changed = {(key, _record_scope(rec)) for key, rec in locks.items()}
+            _apply_writes(_ShardedStore(shards).pending_writes(locks))
+            atomic_write_text(
+                shard_dir / "manifest.json", json.dumps({"shards": shards}, indent=2)
+            )
+        elif store == "journal":
+            _apply_writes(journal.initial_writes(data))
+        # The JSON document is ignored by the other layouts; don't leave
+        # stale locks in it
+        _write_locks(data if store == "json" else {})
+
     return {
-        "removed": len(expired_keys),
-        "remaining": len(locks),
+        "success": True,
+        "message": f"Migrated {len(data)} locks from the {source.name} store to {store}",
+        "store": store,
     }
 
 
+# ---------------------------------------------------------------------------
+# Contention statistics
+# ---------------------------------------------------------------------------
+#
+# Operations record contention events on the registry during a transaction;
+# _registry_transaction appends them to ``stats.log``, which is folded into
+# the compact ``stats.json`` when it grows or is read (the broker keeps the
+# statistics in memory and journals them with the registry).  Per path we
+# count acquisitions, rejections, waits (with total and maximum wait time),
+# holds (with total hold time) and expired locks reclaimed; per agent we
+# keep the most recent hold times for percentiles.
+
+_PATH_COUNTERS = (
+    "acquired", "rejected", "waits", "wait_total", "wait_max",
+    "holds", "hold_total", "reclaimed",
+)
+
+
+def _stat(locks, kind, key, agent, seconds=None):
+    """Record a contention event on *locks* for the current transaction.
+
+    *kind* is one of ``acquire``, ``reject``, ``wait``, ``hold`` or
+    ``reclaim``; ``wait`` and ``hold`` carry a duration in *seconds*.
+    """
+    locks.events.append((kind, key, agent, seconds))
+
+
+def _held_seconds(record, now):
+    try:
+        acquired = datetime.strptime(record["acquired"], _ISO_FMT)
+    except (KeyError, ValueError, TypeError):
+        return 0.0
+    return max(0.0, (now - acquired).total_seconds())
+
+
+def _resolve_stats_file():
+    return _resolve_lock_file().parent.parent / STATS_FILE
+
+
+def _fold_stats_log():
+    """Fold the pending event log into the stats file; call under the guard.
+
+    Returns:
+        _ContentionStats: The up-to-date statistics.
+    """
+    stats = _ContentionStats.load()
+    log_path = _resolve_stats_file().with_suffix(".log")
+    try:
+        with open(log_path, "r", encoding="utf-8") as fh:
+            lines = fh.readlines()
+    except FileNotFoundError:
+        return stats
+    events = []
+    for line in lines:
+        try:
+            events.append(tuple(json.loads(line)))
+        except ValueError:
+            continue  # torn final line
+    stats.apply(events)
+    atomic_write_text(_resolve_stats_file(), stats.dump())
+    log_path.unlink()
+    return stats
+
+
+def _percentile(samples, pct):
+    """Nearest-rank percentile of *samples* (which must be non-empty)."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class _ContentionStats:
+    """Per-path contention counters and per-agent hold-time samples."""
+
+    def __init__(self, data=None):
+        data = data if isinstance(data, dict) else {}
+        self.since = data.get("since") or datetime.utcnow().strftime(_ISO_FMT)
+        self.paths = data.get("paths") or {}
+        self.agents = data.get("agents") or {}
+
+    @classmethod
+    def load(cls):
+        try:
+            with open(_resolve_stats_file(), "r", encoding="utf-8") as fh:
+                return cls(json.load(fh))
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return cls()
+
+    def dump(self):
+        return json.dumps(
+            {"since": self.since, "paths": self.paths, "agents": self.agents},
+            separators=(",", ":"),
+        )
+
+    def apply(self, events):
+        for kind, key, agent, seconds in events:
+            counters = self.paths.setdefault(key, {})
+            if kind == "acquire":
+                counters["acquired"] = counters.get("acquired", 0) + 1
+            elif kind == "reject":
+                counters["rejected"] = counters.get("rejected", 0) + 1
+            elif kind == "reclaim":
+                counters["reclaimed"] = counters.get("reclaimed", 0) + 1
+            elif kind == "wait":
+                counters["waits"] = counters.get("waits", 0) + 1
+                counters["wait_total"] = round(counters.get("wait_total", 0) + seconds, 3)
+                counters["wait_max"] = round(max(counters.get("wait_max", 0), seconds), 3)
+            elif kind == "hold":
+                counters["holds"] = counters.get("holds", 0) + 1
+                counters["hold_total"] = round(counters.get("hold_total", 0) + seconds, 3)
+                samples = self.agents.setdefault(agent, [])
+                samples.append(round(seconds, 3))
+                del samples[:-STATS_HOLD_SAMPLES]
+
+    def report(self, top=10):
+        """Return the *top* most contended paths and per-agent hold times.
+
+        Paths are ranked by rejections plus waits plus reclaimed expiries,
+        then by total time agents spent waiting for them.
+        """
+        files = []
+        for key, counters in self.paths.items():
+            c = {name: counters.get(name, 0) for name in _PATH_COUNTERS}
+            files.append({
+                "file": key,
+                "contention": c["rejected"] + c["waits"] + c["reclaimed"],
+                "acquired": c["acquired"],
+                "rejected": c["rejected"],
+                "waits": c["waits"],
+                "avg_wait": round(c["wait_total"] / c["waits"], 3) if c["waits"] else 0.0,
+                "max_wait": float(c["wait_max"]),
+                "total_wait": float(c["wait_total"]),
+                "avg_hold": round(c["hold_total"] / c["holds"], 3) if c["holds"] else 0.0,
+                "reclaimed": c["reclaimed"],
+            })
+        files.sort(key=lambda f: (-f["contention"], -f["total_wait"], f["file"]))
+        agents = {
+            agent: {
+                "holds": len(samples),
+                "p50": _percentile(samples, 50),
+                "p90": _percentile(samples, 90),
+                "p99": _percentile(samples, 99),
+            }
+            for agent, samples in sorted(self.agents.items())
+            if samples
+        }
+        return {"since": self.since, "files": files[:top], "agents": agents}
+
+
+def contention_stats(top=10, reset=False):
+    """Report the most contended paths, or clear the statistics.
+
+    Args:
+        top (int): Number of paths to list.
+        reset (bool): Discard all statistics collected so far instead.
+
+    Returns:
+        dict: ``since`` (when collection started), ``files`` (the *top*
+        paths with acquisition, rejection, wait, hold and reclaim figures)
+        and ``agents`` (hold-time percentiles in seconds over each agent's
+        recent holds); or a ``success``/``message`` result when resetting.
+    """
+    store = _active_store()
+    if reset:
+        store.reset_stats()
+        return {"success": True, "message": "Contention statistics reset"}
+    return store.read_stats().report(top)
+
+
+# ---------------------------------------------------------------------------
+# Lock broker
+# ---------------------------------------------------------------------------
+#
+# The broker is an optional resident process that owns the registry in
+# memory and serves operations over a Unix socket (see coordination.py for
+# the protocol).
+
+def _ping():
+    return {"pong": True, "pid": os.getpid()}
+
+
+# Operations the broker will execute on behalf of clients
+_OPERATIONS = {
+    "acquire": acquire_lock,
+    "acquire_many": acquire_many,
+    "wait": wait_for_lock,
+    "upgrade": upgrade_lock,
+    "downgrade": downgrade_lock,
+    "release": release_lock,
+    "release_many": release_many,
+    "renew": renew_leases,
+    "deadlocks": find_deadlocks,
+    "check": check_lock,
+    "list": list_locks,
+    "clean": clean_expired,
+    "stats": contention_stats,
+    "version": file_version,
+    "commit_check": commit_check,
+    "ping": _ping,
+}
+
+
+def _resolve_broker_socket():
+    """Resolve the broker socket path next to the lock registry."""
+    return _resolve_lock_file().parent / Path(BROKER_SOCKET).name
+
+
+def _broker_request(op, args=None, timeout=BROKER_TIMEOUT):
+    """Send one operation to the running broker.
+
+    Args:
+        op (str): Operation name (a key of ``_OPERATIONS``).
+        args (dict, optional): Keyword arguments for the operation.
+        timeout (float): Seconds to wait for the reply.
+
+    Returns:
+        The operation result, or ``NO_BROKER`` if no broker is listening.
+
+    Raises:
+        RuntimeError: If the broker rejected or failed the operation.
+    """
+    return broker_request(_resolve_broker_socket(), op, args, timeout, "lock broker")
+
+
+def _call_operation(op, kwargs, use_broker=True, reply_timeout=BROKER_TIMEOUT):
+    """Run *op* through the broker if one is listening, else in-process."""
+    result = NO_BROKER
+    if use_broker:
+        result = _broker_request(op, kwargs, timeout=reply_timeout)
+    if result is NO_BROKER:
+        result = _OPERATIONS[op](**kwargs)
+    return result
+
+
+def serve_broker(flush_interval=BROKER_FLUSH_INTERVAL):
+    """Run the lock broker in the foreground until interrupted.
+
+    Loads the registry into memory, listens on ``BROKER_SOCKET`` and journals
+    changes back to ``file-ownership.json`` asynchronously.  A final snapshot
+    is written on shutdown.
+
+    Args:
+        flush_interval (float): Minimum seconds between journal writes.
+
+    Returns:
+        dict: Result with ``success`` and ``message``.
+    """
+    global _STORE
+
+    sock_path = _resolve_broker_socket()
+    if not claim_broker_socket(sock_path):
+        return {
+            "success": False,
+            "message": f"A lock broker is already listening on {sock_path}",
+        }
+
+    # Load and bind under the guard so no file-mode write slips in between
+    with _registry_guard():
+        _STORE = _MemoryStore(_disk_store(), flush_interval)
+        server = BrokerServer(sock_path, _OPERATIONS)
+
+    try:
+        serve_broker_socket(server, sock_path, "lock broker")
+    finally:
+        _STORE.close()
+        _STORE = None
+
+    return {"success": True, "message": "Lock broker stopped"}
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
+def _positive_seconds(value):
+    """argparse type for lease lengths: a number of seconds greater than 0."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number of seconds: {value!r}")
+    if not 0 < seconds < float("inf"):
+        raise argparse.ArgumentTypeError(f"must be a positive number, got {value}")
+    return seconds
+
+
 def _build_parser():
     parser = argparse.ArgumentParser(
         description="File lock manager for parallel agent coordination.",
@@ -306,12 +2861,32 @@ def _build_parser():
             "Examples:\n"
             "  %(prog)s acquire src/main.py impl-a \"Refactoring\"\n"
             "  %(prog)s check   src/main.py\n"
+            "  %(prog)s acquire src/main.py impl-b --wait --timeout 300\n"
+            "  %(prog)s acquire src/main.py impl-a --ttl 30 && \\\n"
+            "    %(prog)s keepalive impl-a --ttl 30 --pid $$ &\n"
+            "  %(prog)s acquire src/api/ impl-b \"API rewrite\"   # whole subtree\n"
+            "  %(prog)s acquire src/main.py reviewer --mode shared\n"
+            "  %(prog)s upgrade src/main.py reviewer --wait\n"
             "  %(prog)s release src/main.py impl-a\n"
+            "  %(prog)s acquire-many impl-a --glob 'src/api/**/*.py'\n"
             "  %(prog)s list\n"
             "  %(prog)s clean\n"
+            "  %(prog)s deadlocks --break\n"
+            "  %(prog)s stats --top 5\n"
+            "  V=$(%(prog)s version src/util.py | jq -r .version)\n"
+            "  %(prog)s commit-check src/util.py impl-a \"$V\" --from /tmp/util.py\n"
+            "  %(prog)s migrate --store sharded --shards 64\n"
+            "  %(prog)s serve &                 # optional resident broker\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
+    parser.add_argument(
+        "--no-broker",
+        action="store_true",
+        help="Read the registry files directly instead of asking a running broker "
+             "(read-only commands only: check, list, version, stats without "
+             "--reset, deadlocks without --break)",
+    )
     sub = parser.add_subparsers(dest="command", help="Lock operation to perform")
 
     # acquire
@@ -319,15 +2894,100 @@ def _build_parser():
     acq.add_argument("file_path", help="File path to lock")
     acq.add_argument("agent_name", help="Name of the agent requesting the lock")
     acq.add_argument("reason", nargs="?", default="", help="Reason for the lock")
+    acq.add_argument(
+        "--scope", choices=SCOPES, default=None,
+        help="Lock a single file, a directory subtree or a glob (default: inferred)",
+    )
+    acq.add_argument(
+        "--ttl", type=_positive_seconds, default=None, metavar="SEC",
+        help="Lease length in seconds (default: %d)" % LOCK_DURATION.total_seconds(),
+    )
+    acq.add_argument(
+        "--mode", choices=MODES, default="exclusive",
+        help="shared locks admit any number of readers (default: exclusive)",
+    )
+    acq.add_argument(
+        "--wait", action="store_true",
+        help="Queue for the lock instead of failing when it is held",
+    )
+    acq.add_argument(
+        "--timeout", type=float, default=None, metavar="SEC",
+        help="With --wait, give up after SEC seconds (default: wait forever)",
+    )
+    acq.add_argument(
+        "--victim-policy", choices=VICTIM_POLICIES, default=None,
+        help="Waiter to abort if this wait closes a deadlock "
+             f"(default: {DEADLOCK_VICTIM_POLICY})",
+    )
 
     # release
     rel = sub.add_parser("release", help="Release a lock on a file")
     rel.add_argument("file_path", help="File path to unlock")
     rel.add_argument("agent_name", help="Name of the agent releasing the lock")
+    rel.add_argument("--scope", choices=SCOPES, default=None, help="Lock scope")
+
+    # upgrade / downgrade
+    upg = sub.add_parser("upgrade", help="Turn a shared lock into an exclusive one")
+    upg.add_argument("file_path", help="Locked path")
+    upg.add_argument("agent_name", help="Name of the agent holding the shared lock")
+    upg.add_argument("--scope", choices=SCOPES, default=None, help="Lock scope")
+    upg.add_argument("--wait", action="store_true",
+                     help="Wait for the other readers to release")
+    upg.add_argument("--timeout", type=float, default=None, metavar="SEC",
+                     help="With --wait, give up after SEC seconds")
+
+    dwn = sub.add_parser("downgrade", help="Turn an exclusive lock into a shared one")
+    dwn.add_argument("file_path", help="Locked path")
+    dwn.add_argument("agent_name", help="Name of the agent holding the lock")
+    dwn.add_argument("--scope", choices=SCOPES, default=None, help="Lock scope")
+
+    # acquire-many / release-many
+    acqm = sub.add_parser(
+        "acquire-many", help="Acquire locks on several files (all or nothing)"
+    )
+    acqm.add_argument("agent_name", help="Name of the agent requesting the locks")
+    acqm.add_argument("file_paths", nargs="*", help="File paths to lock")
+    acqm.add_argument(
+        "--glob", action="append", default=[], metavar="PATTERN",
+        help="Also lock files matching PATTERN (repeatable, ** supported)",
+    )
+    acqm.add_argument("--reason", default="", help="Reason for the locks")
+    acqm.add_argument("--ttl", type=_positive_seconds, default=None, metavar="SEC",
+                      help="Lease length in seconds")
+    acqm.add_argument("--mode", choices=MODES, default="exclusive",
+                      help="Lock mode for every path (default: exclusive)")
+
+    relm = sub.add_parser(
+        "release-many", help="Release locks on several files (all or nothing)"
+    )
+    relm.add_argument("agent_name", help="Name of the agent releasing the locks")
+    relm.add_argument("file_paths", nargs="*", help="File paths to unlock")
+    relm.add_argument(
+        "--glob", action="append", default=[], metavar="PATTERN",
+        help="Also unlock files matching PATTERN (repeatable, ** supported)",
+    )
+
+    # renew / keepalive
+    ren = sub.add_parser("renew", help="Extend the leases on an agent's locks")
+    ren.add_argument("agent_name", help="Lease holder")
+    ren.add_argument("file_paths", nargs="*", help="Locks to renew (default: all)")
+    ren.add_argument("--ttl", type=_positive_seconds, default=None, metavar="SEC",
+                     help="New lease length in seconds")
+
+    kpa = sub.add_parser(
+        "keepalive", help="Keep renewing an agent's leases in the foreground"
+    )
+    kpa.add_argument("agent_name", help="Lease holder")
+    kpa.add_argument("file_paths", nargs="*", help="Locks to renew (default: all)")
+    kpa.add_argument("--ttl", type=_positive_seconds, default=30, metavar="SEC",
+                     help="Lease length to maintain (default: 30)")
+    kpa.add_argument("--pid", type=int, default=None,
+                     help="Stop renewing once this process exits")
 
     # check
     chk = sub.add_parser("check", help="Check lock status of a file")
     chk.add_argument("file_path", help="File path to check")
+    chk.add_argument("--scope", choices=SCOPES, default=None, help="Lock scope")
 
     # list
     sub.add_parser("list", help="List all current locks")
@@ -335,9 +2995,177 @@ def _build_parser():
     # clean
     sub.add_parser("clean", help="Remove expired locks")
 
+    # deadlocks
+    dlk = sub.add_parser(
+        "deadlocks", help="Report circular waits between agents"
+    )
+    dlk.add_argument("--break", dest="break_cycles", action="store_true",
+                     help="Abort one waiter in each breakable cycle")
+    dlk.add_argument("--victim-policy", choices=VICTIM_POLICIES, default=None,
+                     help=f"Which waiter to abort (default: {DEADLOCK_VICTIM_POLICY})")
+
+    # version / commit-check
+    ver = sub.add_parser("version", help="Print a file's version for an optimistic write")
+    ver.add_argument("file_path", help="File to read the version of")
+
+    cc = sub.add_parser(
+        "commit-check",
+        help="Check a file is unchanged since VERSION (and install an edit)",
+    )
+    cc.add_argument("file_path", help="File being written")
+    cc.add_argument("agent_name", help="Name of the writing agent")
+    cc.add_argument("version", help="Version the agent read (from 'version')")
+    cc.add_argument("--from", dest="source", default=None, metavar="FILE",
+                    help="Atomically replace the file with FILE if the check passes")
+
+    # stats
+    sts = sub.add_parser("stats", help="Show the most contended files")
+    sts.add_argument("--top", type=int, default=10, metavar="N",
+                     help="Number of files to list (default: 10)")
+    sts.add_argument("--reset", action="store_true",
+                     help="Discard the statistics collected so far")
+
+    # migrate
+    mig = sub.add_parser("migrate", help="Move the registry to another storage layout")
+    mig.add_argument("--store", choices=STORES, required=True,
+                     help="Target layout")
+    mig.add_argument("--shards", type=int, default=DEFAULT_SHARD_COUNT,
+                     help=f"Shard count for --store sharded (default: {DEFAULT_SHARD_COUNT})")
+
+    # serve
+    srv = sub.add_parser("serve", help="Run the resident lock broker")
+    srv.add_argument(
+        "--flush-interval", type=float, default=BROKER_FLUSH_INTERVAL,
+        metavar="SEC", help="Seconds between journal writes to disk",
+    )
+
     return parser
 
 
+def _expand_paths(file_paths, patterns):
+    """Combine explicit paths with glob matches, preserving order."""
+    expanded = list(file_paths)
+    for pattern in patterns:
+        expanded.extend(sorted(glob.glob(pattern, recursive=True)))
+    return list(dict.fromkeys(expanded))
+
+
+def _command_call(args):
+    """Translate parsed CLI arguments into an ``(operation, kwargs)`` pair."""
+    if args.command == "acquire":
+        kwargs = {
+            "file_path": args.file_path,
+            "agent_name": args.agent_name,
+            "reason": args.reason,
+            "scope": args.scope,
+        }
+        kwargs.update(ttl=args.ttl, mode=args.mode)
+        if args.wait:
+            kwargs.update(
+                timeout=args.timeout, pid=os.getpid(),
+                victim_policy=args.victim_policy,
+            )
+            return "wait", kwargs
+        return "acquire", kwargs
+    if args.command == "release":
+        return "release", {
+            "file_path": args.file_path,
+            "agent_name": args.agent_name,
+            "scope": args.scope,
+        }
+    if args.command == "upgrade":
+        return "upgrade", {
+            "file_path": args.file_path,
+            "agent_name": args.agent_name,
+            "scope": args.scope,
+            "wait": args.wait,
+            "timeout": args.timeout,
+            "pid": os.getpid(),
+        }
+    if args.command == "downgrade":
+        return "downgrade", {
+            "file_path": args.file_path,
+            "agent_name": args.agent_name,
+            "scope": args.scope,
+        }
+    if args.command in ("acquire-many", "release-many"):
+        kwargs = {
+            "file_paths": _expand_paths(args.file_paths, args.glob),
+            "agent_name": args.agent_name,
+        }
+        if args.command == "acquire-many":
+            kwargs.update(reason=args.reason, ttl=args.ttl, mode=args.mode)
+            return "acquire_many", kwargs
+        return "release_many", kwargs
+    if args.command == "check":
+        return "check", {"file_path": args.file_path, "scope": args.scope}
+    if args.command in ("renew", "keepalive"):
+        kwargs = {
+            "agent_name": args.agent_name,
+            "file_paths": args.file_paths or None,
+            "ttl": args.ttl,
+        }
+        if args.command == "keepalive":
+            kwargs["watch_pid"] = args.pid
+        return args.command, kwargs
+    if args.command == "deadlocks":
+        return "deadlocks", {
+            "break_cycles": args.break_cycles,
+            "victim_policy": args.victim_policy,
+        }
+    if args.command == "version":
+        return "version", {
+            "file_path": args.file_path,
+            "real_path": os.path.abspath(args.file_path),
+        }
+    if args.command == "commit-check":
+        return "commit_check", {
+            "file_path": args.file_path,
+            "agent_name": args.agent_name,
+            "expected": args.version,
+            "source": args.source and os.path.abspath(args.source),
+            "real_path": os.path.abspath(args.file_path),
+        }
+    if args.command == "stats":
+        return "stats", {"top": args.top, "reset": args.reset}
+    if args.command in ("list", "clean"):
+        return args.command, {}
+    return None, None
+
+
+def _read_only_call(op, kwargs):
+    """Return True if operation *op* with *kwargs* leaves the registry alone."""
+    if op in ("check", "list", "version"):
+        return True
+    if op == "stats":
+        return not kwargs["reset"]
+    if op == "deadlocks":
+        return not kwargs["break_cycles"]
+    return False
+
+
+def _run_keepalive(kwargs, use_broker):
+    """Renew leases in the foreground until interrupted or the pid exits."""
+    keeper = LeaseKeeper(
+        kwargs["agent_name"], kwargs["file_paths"], ttl=kwargs["ttl"],
+        watch_pid=kwargs["watch_pid"], use_broker=use_broker,
+    )
+    print(
+        f"keeping {kwargs['agent_name']}'s leases alive every "
+        f"{keeper.interval:g}s (ttl {keeper.ttl:g}s)",
+        file=sys.stderr,
+    )
+    try:
+        keeper.run()
+    except KeyboardInterrupt:
+        pass
+    return {
+        "success": not keeper.lost,
+        "message": f"Stopped renewing leases for {kwargs['agent_name']}",
+        "lost": keeper.lost,
+    }
+
+
 def main():
     parser = _build_parser()
     args = parser.parse_args()
@@ -346,19 +3174,36 @@ def main():
         parser.print_help()
         sys.exit(1)
 
-    if args.command == "acquire":
-        result = acquire_lock(args.file_path, args.agent_name, args.reason)
-    elif args.command == "release":
-        result = release_lock(args.file_path, args.agent_name)
-    elif args.command == "check":
-        result = check_lock(args.file_path)
-    elif args.command == "list":
-        result = list_locks()
-    elif args.command == "clean":
-        result = clean_expired()
+    if args.command == "serve":
+        result = serve_broker(args.flush_interval)
+    elif args.command == "migrate":
+        try:
+            result = migrate_store(args.store, args.shards)
+        except ValueError as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
     else:
-        parser.print_help()
-        sys.exit(1)
+        op, kwargs = _command_call(args)
+        if op is None:
+            parser.print_help()
+            sys.exit(1)
+        if args.no_broker and not _read_only_call(op, kwargs):
+            # A running broker owns the registry; writing behind it would be lost
+            parser.error(f"--no-broker only applies to read-only commands, not {args.command}")
+
+        # Prefer the resident broker; fall back to direct file mode
+        reply_timeout = BROKER_TIMEOUT
+        if op == "wait" or kwargs.get("wait"):
+            wait_timeout = kwargs["timeout"]
+            reply_timeout = None if wait_timeout is None else wait_timeout + BROKER_TIMEOUT
+        try:
+            if op == "keepalive":
+                result = _run_keepalive(kwargs, not args.no_broker)
+            else:
+                result = _call_operation(op, kwargs, not args.no_broker, reply_timeout)
+        except (RuntimeError, ValueError) as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
 
     print(json.dumps(result, indent=2))
 
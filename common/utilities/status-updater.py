@@ -4,10 +4,55 @@ Agent status updater for multi-agent coordination.
 
 Maintains a shared JSON registry of agent statuses so that every member of a
 team can see what the others are doing.  Each call updates the calling agent's
-entry and recomputes aggregate team metrics.
+entry and shifts the aggregate team metrics by that one agent's status
+change; a full recount runs periodically to correct any drift.
 
 The status file lives at ``shared-state/agent-status.json`` relative to the
-project root.
+project root.  Every write is a transaction: an exclusive ``fcntl`` lock on
+``agent-status.json.lock`` serializes the read-modify-write cycle across
+agents, and the new document is committed with an atomic rename, so
+concurrent heartbeats never overwrite each other and readers never see a
+partially written file.
+
+For large fleets the registry can be migrated to per-agent shards
+(``migrate --store sharded``): each agent then writes only its own small
+record under ``shared-state/agent-status.d/``, so a heartbeat costs the
+same however many agents there are, and readers merge the shards lazily.
+``migrate --store sqlite`` moves it into a WAL-mode SQLite database
+(``shared-state/agent-status.db``) with indexed lookups by agent, status
+and team.  In both layouts ``agent-status.json`` stays in place as a
+snapshot for tools that read the JSON file, refreshed after commits at most
+once per ``JSON_SNAPSHOT_INTERVAL``; ``export-json`` refreshes it on demand.
+
+Every update also appends a compact binary sample (time, status, progress,
+task) to the agent's history under ``shared-state/agent-history.d/``;
+``history --agent X --since T`` answers range queries by binary search, and
+old samples are downsampled and eventually dropped on compaction.
+
+Records of unfinished agents carry an ``eta`` forecast (completion time with
+90% bounds) fitted robustly to their recent progress samples; ``get --eta``
+recomputes it on demand.
+
+Agents that report often should use ``HeartbeatClient`` from this module
+instead of spawning the CLI per tick: it coalesces progress updates and
+sends at most one per ``HEARTBEAT_FLUSH_INTERVAL`` (status changes go out
+immediately).  ``serve`` runs an optional broker on
+``shared-state/agent-status.sock`` that buffers updates from every agent and
+writes them in one batch per interval; ``update`` uses it when it is running.
+
+``federation`` answers fleet-wide queries (e.g. every blocked agent)
+across all registries under ``projects/``, from an index at
+``shared-state/federation-index.json`` that re-reads only the projects
+whose registry changed since the last query.
+
+Every change (status, task, progress or ``blocked_by``; removals, reaps and
+resets) is also appended to ``shared-state/agent-status.events`` as one
+NDJSON event with a resumable offset, so dashboards and coordinators can
+``events --follow`` instead of re-reading snapshots.
+
+Agents whose heartbeat is older than the threshold for their status
+(``STALE_AFTER``), or whose ``--watch-pid`` process has exited, are moved to
+``offline`` by ``reap`` and, lazily, by any ``get`` at most once a minute.
 
 Usage:
     python status-updater.py <agent_name> <status> <task> <progress> [blocked_by]
@@ -27,17 +72,132 @@ Examples:
 """
 
 import argparse
+import fcntl
 import json
+import math
 import os
 import sys
-from datetime import datetime
+import shutil
+import socket
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from urllib.parse import quote, unquote
+
+from agent_registry import (
+    VALID_STATUSES,
+    ShardReader,
+    compute_metrics,
+    metric_bucket,
+    read_agents,
+    read_shard,
+    shard_filename,
+)
+from coordination import (
+    NO_BROKER,
+    BrokerServer,
+    atomic_write_text,
+    broker_request,
+    claim_broker_socket,
+    directory_mode,
+    pid_alive,
+    replacement_mode,
+    serve_broker_socket,
+)
 
 # Path to the shared status registry (relative to project root)
 STATUS_FILE = "shared-state/agent-status.json"
 
-# Valid status values
-VALID_STATUSES = {"active", "awaiting", "blocked", "completed", "offline"}
+# Per-agent record files; the registry is sharded while this directory exists
+SHARD_DIR = "shared-state/agent-status.d"
+
+# SQLite (WAL) registry; takes precedence over the other layouts while it exists
+STATUS_DB = "shared-state/agent-status.db"
+
+# Seconds a SQLite writer waits for another writer's transaction
+STATUS_DB_TIMEOUT = 10.0
+
+# Storage layouts accepted by ``migrate --store``
+STORES = ("json", "sharded", "sqlite")
+
+# An agent whose last heartbeat is older than the threshold for its status is
+# considered dead and moved to ``offline``; statuses not listed never expire
+STALE_AFTER = {
+    "active": timedelta(minutes=15),
+    "awaiting": timedelta(hours=1),
+    "blocked": timedelta(hours=1),
+}
+
+# Reads reap stale agents at most this often (see ``reap_stale``)
+REAP_INTERVAL = timedelta(seconds=60)
+
+# With the sharded or SQLite store, agent-status.json is kept as a snapshot
+# for plain-JSON readers, rewritten after commits at most this often (seconds)
+JSON_SNAPSHOT_INTERVAL = 1.0
+
+# HeartbeatClient sends at most one update per this many seconds unless the
+# status changes; intermediate progress ticks are coalesced
+HEARTBEAT_FLUSH_INTERVAL = 2.0
+
+# Unix socket the optional status broker listens on (relative to project root)
+STATUS_BROKER_SOCKET = "shared-state/agent-status.sock"
+
+# How often the broker writes the updates it has buffered (seconds)
+STATUS_BROKER_FLUSH_INTERVAL = 1.0
+
+# How long a client waits for a broker reply before giving up (seconds)
+STATUS_BROKER_TIMEOUT = 5.0
+
+# Append-only NDJSON log of registry changes, for subscribers
+EVENT_LOG = "shared-state/agent-status.events"
+
+# The event log is rotated to ``.events.1`` once it grows past this size
+EVENT_LOG_MAX_BYTES = 4 * 1024 * 1024
+
+# How often ``events --follow`` checks the log for new lines (seconds)
+EVENT_POLL_INTERVAL = 0.05
+
+# Per-agent heartbeat history (binary, append-only)
+HISTORY_DIR = "shared-state/agent-history.d"
+
+# Samples older than this are dropped when a history file is compacted
+HISTORY_RETENTION = timedelta(days=14)
+
+# Samples older than this are thinned to one per bucket, keeping transitions
+HISTORY_DOWNSAMPLE_AFTER = timedelta(hours=24)
+HISTORY_DOWNSAMPLE_BUCKET = timedelta(minutes=5)
+
+# Compact once this many samples were appended since the last compaction
+HISTORY_COMPACT_RECORDS = 4096
+
+# ETA forecasts use at most this many recent samples of the current task
+ETA_WINDOW = 20
+
+# ...and need at least this many before predicting anything
+ETA_MIN_SAMPLES = 3
+
+# A progress drop larger than this marks a restarted task for ETA purposes
+ETA_RESTART_DROP = 10
+
+# z-score for the ETA confidence bounds (1.645 = 90% two-sided)
+ETA_CONFIDENCE_Z = 1.645
+
+# Project workspaces whose registries federation mode aggregates (relative
+# to the foundry root)
+FEDERATION_PROJECTS = "projects/*"
+
+# Cross-project index kept by federation mode (relative to the foundry root)
+FEDERATION_INDEX = "shared-state/federation-index.json"
+
+# team_metrics are adjusted per update and fully recounted this often, so
+# hand edits or a crash between read and write cannot leave them drifting
+METRICS_RECONCILE_EVERY = 256
 
 
 def _resolve_status_file():
@@ -93,49 +253,1310 @@ def _read_status():
     # Ensure required top-level keys exist
     data.setdefault("agents", {})
     data.setdefault("team_metrics", default["team_metrics"])
+    data.pop("updates_since_reconcile", None)  # kept in the document by older versions
     return data
 
 
 def _write_status(data):
-    """Persist the status registry to disk.
+    """Persist the status registry to disk atomically.
+
+    A reconcile count left in *data* by ``_apply_metrics`` is removed and
+    saved to its sidecar instead of the document.
 
     Args:
         data (dict): The full status document to write.
     """
+    pending = data.pop(_PENDING_KEY, None)
+    atomic_write_text(_resolve_status_file(), json.dumps(data, indent=2))
+    if pending is not None:
+        _write_reconcile_count(pending)
+
+
+# Key under which _apply_metrics carries the reconcile count through a
+# transaction; never written to the document
+_PENDING_KEY = "_updates_since_reconcile"
+
+
+def _reconcile_count_path():
+    status_path = _resolve_status_file()
+    return status_path.with_name(status_path.name + ".reconcile")
+
+
+def _read_reconcile_count():
+    """Return the updates since the last metrics recount (call under the guard).
+
+    A missing or unreadable count forces a recount.
+    """
+    try:
+        return int(_reconcile_count_path().read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError, IOError):
+        return METRICS_RECONCILE_EVERY
+
+
+def _write_reconcile_count(pending):
+    # A torn write just reads back as invalid and triggers a recount
+    with open(_reconcile_count_path(), "w", encoding="utf-8") as fh:
+        fh.write(str(pending))
+
+
+@contextmanager
+def _status_guard(shared=False):
+    """Hold the cross-process ``fcntl`` lock on ``<status file>.lock``.
+
+    SQLite writers take it *shared* (the database serializes them itself)
+    so that a migration, which takes it exclusively, never swaps the
+    database out from under a transaction.
+    """
     status_path = _resolve_status_file()
     status_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(status_path, "w", encoding="utf-8") as fh:
-        json.dump(data, fh, indent=2)
+    guard_path = status_path.with_name(status_path.name + ".lock")
+    with open(guard_path, "a") as guard:
+        fcntl.flock(guard.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(guard.fileno(), fcntl.LOCK_UN)
+
+
+def _shift_metrics(metrics, old_record, new_record):
+    """Adjust *metrics* in place for one agent's old -> new record.
+
+    Either record may be ``None`` (agent added or removed).  Costs O(1)
+    regardless of the number of agents.
+    """
+    if old_record is not None:
+        metrics["total_agents"] -= 1
+        metrics[metric_bucket(old_record)] -= 1
+    if new_record is not None:
+        metrics["total_agents"] += 1
+        metrics[metric_bucket(new_record)] += 1
+
+
+def _metrics_consistent(metrics, agents):
+    """Cheap sanity check: every bucket present, non-negative and summing up."""
+    try:
+        buckets = [metrics[s] for s in VALID_STATUSES]
+        total = metrics["total_agents"]
+    except (KeyError, TypeError):
+        return False
+    return (
+        all(isinstance(n, int) and n >= 0 for n in buckets)
+        and total == len(agents)
+        and sum(buckets) == total
+    )
 
 
-def _compute_metrics(agents):
-    """Recompute aggregate team metrics from individual agent records.
+def _apply_metrics(data, old_record, new_record):
+    """Update ``data["team_metrics"]`` for a single agent change.
+
+    The counters are shifted incrementally; every
+    ``METRICS_RECONCILE_EVERY`` changes, or whenever the stored counters fail
+    the consistency check, they are recomputed from the agent records.  The
+    change count is kept in ``<status file>.reconcile`` rather than in the
+    document (``_write_status`` saves it).
+    """
+    metrics = data.get("team_metrics")
+    pending = data.get(_PENDING_KEY)
+    if pending is None:
+        pending = _read_reconcile_count()
+    pending += 1
+    if isinstance(metrics, dict):
+        metrics = dict(metrics)
+        try:
+            _shift_metrics(metrics, old_record, new_record)
+        except (KeyError, TypeError):
+            metrics = None
+    if (
+        pending >= METRICS_RECONCILE_EVERY
+        or not isinstance(metrics, dict)
+        or not _metrics_consistent(metrics, data["agents"])
+    ):
+        metrics = compute_metrics(data["agents"])
+        pending = 0
+    data["team_metrics"] = metrics
+    data[_PENDING_KEY] = pending
+
+
+# ---------------------------------------------------------------------------
+# Per-agent shards
+# ---------------------------------------------------------------------------
+#
+# In sharded mode each agent's record lives in its own file,
+# ``agent-status.d/<quoted agent name>.json``.  Agents write their shard
+# with an atomic rename and no shared lock (each file has one writer);
+# migrations take the status guard and swap the whole directory with a
+# rename, and a writer that finds the directory gone falls back to the
+# single document.
+
+def _resolve_shard_dir():
+    return _resolve_status_file().parent / Path(SHARD_DIR).name
+
+
+def _sharded():
+    return _resolve_shard_dir().is_dir()
+
+
+def _shard_path(agent_name, directory=None):
+    return (directory or _resolve_shard_dir()) / shard_filename(agent_name)
+
+
+@contextmanager
+def _shard_lock(agent_name):
+    """Hold an exclusive ``fcntl`` lock on one agent's shard.
+
+    Everything that rewrites or removes a shard (heartbeats, the reaper,
+    ``remove``) does its read-compare-write under this lock, so a heartbeat
+    can never be overwritten by a decision made on the record before it.
+    The lock file is ``.<shard name>.lock`` next to the shard, which shard
+    readers skip.  Raises FileNotFoundError if the registry is not sharded.
+    """
+    lock_path = _resolve_shard_dir() / ("." + shard_filename(agent_name) + ".lock")
+    with open(lock_path, "a") as guard:
+        fcntl.flock(guard.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(guard.fileno(), fcntl.LOCK_UN)
+
+
+def _write_shard(agent_name, record):
+    """Write one agent's shard under its ``_shard_lock``.
+
+    Raises FileNotFoundError if the registry is not sharded.
+    """
+    atomic_write_text(
+        _shard_path(agent_name), json.dumps(record, indent=2), create_dirs=False
+    )
+
+
+class _ShardCache(ShardReader):
+    """``ShardReader`` that also keeps the shards' team metrics.
+
+    The metrics are shifted only for the shards that changed since the
+    previous merge, with a full recount every ``METRICS_RECONCILE_EVERY``
+    changes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._metrics = compute_metrics({})
+        self._pending = 0
+
+    def changed(self, old_record, new_record):
+        _shift_metrics(self._metrics, old_record, new_record)
+        self._pending += 1
+
+    def metrics(self):
+        """Return the team metrics for the shards seen by the last ``records``."""
+        if self._pending >= METRICS_RECONCILE_EVERY:
+            self._metrics = compute_metrics(
+                {path: rec for path, (_, rec) in self._entries.items() if rec is not None}
+            )
+            self._pending = 0
+        return dict(self._metrics)
+
+
+_SHARD_CACHE = _ShardCache()
+
+
+def _merged_status():
+    """Return the team view as one status document, whatever the layout."""
+    kind = _store_kind()
+    if kind == "sqlite":
+        try:
+            return _db_view()
+        except FileNotFoundError:
+            kind = _store_kind()  # migrated away meanwhile
+    if kind != "sharded":
+        return _read_status()
+    agents = _SHARD_CACHE.records(_resolve_shard_dir())
+    heartbeats = [r.get("last_heartbeat") for r in agents.values() if r.get("last_heartbeat")]
+    return {
+        "last_updated": max(heartbeats) if heartbeats else None,
+        "agents": agents,
+        "team_metrics": _SHARD_CACHE.metrics(),
+    }
+
+
+def _write_json_snapshot():
+    """Rewrite agent-status.json from a sharded or SQLite registry.
+
+    Call with the registry guard held (shared or exclusive), so a migration
+    back to the JSON store is never overwritten by a late snapshot.  A no-op
+    while the JSON document is itself the store.
+    """
+    if _store_kind() != "json":
+        atomic_write_text(_resolve_status_file(), json.dumps(_merged_status(), indent=2))
+
+
+def _refresh_json_snapshot():
+    """Refresh the JSON snapshot after a commit, at most once per interval.
+
+    Skipped if the snapshot is younger than ``JSON_SNAPSHOT_INTERVAL`` or
+    another process is already rewriting it, so a busy fleet pays for one
+    merge per interval rather than one per heartbeat.  Call with no registry
+    lock held.
+    """
+    if _store_kind() == "json":
+        return
+    status_path = _resolve_status_file()
+    try:
+        if time.time() - status_path.stat().st_mtime < JSON_SNAPSHOT_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    lock_path = status_path.with_name(status_path.name + ".snapshot")
+    with open(lock_path, "a") as guard:
+        try:
+            fcntl.flock(guard.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another process is writing it right now
+        try:
+            with _status_guard(shared=True):
+                _write_json_snapshot()
+        finally:
+            fcntl.flock(guard.fileno(), fcntl.LOCK_UN)
+
+
+# ---------------------------------------------------------------------------
+# SQLite engine
+# ---------------------------------------------------------------------------
+#
+# ``agent-status.db`` holds one row per agent (the full record as JSON, plus
+# indexed ``status`` and ``team`` columns) in WAL mode, so readers never
+# block writers and an update is a single-row upsert.  Triggers keep the
+# per-status counts in ``metrics`` exact inside every transaction.
+
+_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agents (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    team TEXT,
+    last_heartbeat TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS agents_by_status ON agents (status);
+CREATE INDEX IF NOT EXISTS agents_by_team ON agents (team, status);
+CREATE TABLE IF NOT EXISTS metrics (status TEXT PRIMARY KEY, n INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TRIGGER IF NOT EXISTS agents_inserted AFTER INSERT ON agents BEGIN
+    UPDATE metrics SET n = n + 1 WHERE status = NEW.status;
+END;
+CREATE TRIGGER IF NOT EXISTS agents_deleted AFTER DELETE ON agents BEGIN
+    UPDATE metrics SET n = n - 1 WHERE status = OLD.status;
+END;
+CREATE TRIGGER IF NOT EXISTS agents_moved AFTER UPDATE OF status ON agents
+WHEN OLD.status != NEW.status BEGIN
+    UPDATE metrics SET n = n - 1 WHERE status = OLD.status;
+    UPDATE metrics SET n = n + 1 WHERE status = NEW.status;
+END;
+"""
+
+_DB_UPSERT = """
+INSERT INTO agents (name, status, team, last_heartbeat, record) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET
+    status = excluded.status, team = excluded.team,
+    last_heartbeat = excluded.last_heartbeat, record = excluded.record
+"""
+
+# One connection per thread (HeartbeatClient timers and broker threads
+# each get their own), reopened if the database file was replaced
+_DB_LOCAL = threading.local()
+
+
+def _resolve_status_db():
+    return _resolve_status_file().parent / Path(STATUS_DB).name
+
+
+def _store_kind():
+    """Return the active layout: ``sqlite``, ``sharded`` or ``json``."""
+    if _resolve_status_db().exists():
+        return "sqlite"
+    if _sharded():
+        return "sharded"
+    return "json"
+
+
+def _db_open(path):
+    """Open (creating if needed) a registry database at *path*."""
+    conn = sqlite3.connect(str(path), timeout=STATUS_DB_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_DB_SCHEMA)
+    conn.executemany("INSERT OR IGNORE INTO metrics VALUES (?, 0)",
+                     [(status,) for status in sorted(VALID_STATUSES)])
+    return conn
+
+
+def _db_connect():
+    """Return this thread's connection to the live registry database.
+
+    Raises:
+        FileNotFoundError: If the registry is not in SQLite mode.
+    """
+    path = _resolve_status_db()
+    key = (str(path), os.stat(path).st_ino)
+    cached = getattr(_DB_LOCAL, "conn", None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+    conn = _db_open(path)
+    _DB_LOCAL.conn = (key, conn)
+    return conn
+
+
+@contextmanager
+def _db_transaction(conn):
+    """Run a write transaction, taking the write lock up front."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _team_of(agent_name, record):
+    """Team an agent belongs to: its ``team`` field, else its name's prefix.
+
+    ``teams/<team>/agents/<agent>`` and ``<team>/<agent>`` names are
+    recognized; other names have no team.
+    """
+    if record.get("team"):
+        return record["team"]
+    parts = agent_name.split("/")
+    if len(parts) >= 3 and parts[0] == "teams":
+        return parts[1]
+    return parts[0] if len(parts) >= 2 else None
+
+
+def _db_row(agent_name, record):
+    return (agent_name, metric_bucket(record), _team_of(agent_name, record),
+            record.get("last_heartbeat"), json.dumps(record))
+
+
+def _db_upsert(conn, records, resolve=None):
+    """Upsert *records* inside the caller's transaction; return change events.
+
+    *resolve*, if given, is called as ``resolve(name, record, old_record)``
+    before each row is written (see ``_commit_records``).
+    """
+    events = []
+    for agent_name, agent_record in records.items():
+        row = conn.execute("SELECT record FROM agents WHERE name = ?", (agent_name,)).fetchone()
+        old_record = json.loads(row[0]) if row else None
+        if resolve is not None:
+            resolve(agent_name, agent_record, old_record)
+        conn.execute(_DB_UPSERT, _db_row(agent_name, agent_record))
+        events.append(_change_event(agent_name, old_record, agent_record))
+    heartbeats = [r["last_heartbeat"] for r in records.values() if r.get("last_heartbeat")]
+    if heartbeats:
+        conn.execute(
+            "INSERT INTO meta VALUES ('last_updated', ?) ON CONFLICT (key) DO UPDATE"
+            " SET value = excluded.value WHERE excluded.value > meta.value",
+            (max(heartbeats),),
+        )
+    return events
+
+
+def _db_agents(conn, status=None, team=None):
+    """Return ``{name: record}``, filtered through the status/team indexes."""
+    clauses, params = [], []
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if team:
+        clauses.append("team = ?")
+        params.append(team)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(f"SELECT name, record FROM agents{where} ORDER BY name", params)
+    return {name: json.loads(record) for name, record in rows}
+
+
+def _db_view(status=None, team=None):
+    """Return the registry (optionally filtered) as a status document."""
+    conn = _db_connect()
+    agents = _db_agents(conn, status, team)
+    if status or team:
+        metrics = compute_metrics(agents)
+    else:
+        counts = dict(conn.execute("SELECT status, n FROM metrics"))
+        metrics = {"total_agents": sum(counts.values())}
+        metrics.update({s: counts.get(s, 0) for s in
+                        ("active", "awaiting", "blocked", "completed", "offline")})
+    row = conn.execute("SELECT value FROM meta WHERE key = 'last_updated'").fetchone()
+    return {"last_updated": row[0] if row else None, "agents": agents, "team_metrics": metrics}
+
+
+def _db_get(agent_name):
+    row = _db_connect().execute(
+        "SELECT record FROM agents WHERE name = ?", (agent_name,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _filter_view(data, status=None, team=None):
+    """Apply ``get --status/--team`` filters to a status document."""
+    if not status and not team:
+        return data
+    agents = {
+        name: record for name, record in data["agents"].items()
+        if (not status or metric_bucket(record) == status)
+        and (not team or _team_of(name, record) == team)
+    }
+    return dict(data, agents=agents, team_metrics=compute_metrics(agents))
+
+
+def export_json(output=None):
+    """Write the registry as a single ``agent-status.json``-style document.
+
+    The default path is the snapshot commits already refresh periodically
+    while the registry lives in SQLite or shards; this brings it up to date
+    immediately, or writes a copy elsewhere.
 
     Args:
-        agents (dict): Mapping of agent names to their status records.
+        output (str, optional): Destination path; defaults to the status file.
 
     Returns:
-        dict: Aggregate metric counts.
+        dict: ``success``, ``message``, ``path`` and ``agents`` (count).
     """
-    counts = {s: 0 for s in VALID_STATUSES}
-    for record in agents.values():
-        status = record.get("status", "offline")
-        if status in counts:
-            counts[status] += 1
+    path = Path(output) if output else _resolve_status_file()
+    if not output and _store_kind() == "json":
+        return {"success": True, "message": "Registry is already a JSON document",
+                "path": str(path), "agents": len(_read_status()["agents"])}
+    if output:
+        data = _merged_status()
+        atomic_write_text(path, json.dumps(data, indent=2))
+    else:
+        with _status_guard(shared=True):
+            _write_json_snapshot()
+        data = _read_status()
+    return {"success": True, "message": f"Exported {len(data['agents'])} agents",
+            "path": str(path), "agents": len(data["agents"])}
+
+
+def migrate_storage(store):
+    """Move the registry between the JSON document, shards and SQLite.
+
+    Args:
+        store (str): ``json``, ``sharded`` or ``sqlite``.
+
+    Returns:
+        dict: Result with ``success``, ``message`` and ``store``.
+
+    Raises:
+        ValueError: If *store* is not a recognized layout.
+    """
+    if store not in STORES:
+        raise ValueError(f"Invalid store '{store}'. Must be one of: {', '.join(STORES)}")
+
+    status_path = _resolve_status_file()
+    shard_dir = _resolve_shard_dir()
+    db_path = _resolve_status_db()
+    with _status_guard():
+        current = _store_kind()
+        if current == store:
+            return {"success": True, "message": f"Registry is already in the {store} store",
+                    "store": store}
+
+        # Take the current layout out of service first, so no write lands
+        # in it after its records were read
+        if current == "sharded":
+            retired = shard_dir.with_name(f".{shard_dir.name}.retired")
+            shutil.rmtree(retired, ignore_errors=True)
+            os.rename(shard_dir, retired)
+            agents = ShardReader().records(retired)
+        elif current == "sqlite":
+            agents = _db_view()["agents"]
+            _db_connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            retired = db_path.with_name(f".{db_path.name}.retired")
+            os.replace(db_path, retired)
         else:
-            counts["offline"] += 1
+            agents = _read_status()["agents"]
+
+        # Build the new layout aside and rename it into place, so agents
+        # switch over only once every record is there
+        if store == "sharded":
+            staging = Path(tempfile.mkdtemp(prefix=".agent-status.", dir=str(status_path.parent)))
+            os.chmod(staging, directory_mode())
+            for name, record in agents.items():
+                atomic_write_text(_shard_path(name, staging), json.dumps(record, indent=2))
+            os.rename(staging, shard_dir)
+        elif store == "sqlite":
+            fd, staging = tempfile.mkstemp(prefix=".agent-status.", suffix=".db",
+                                           dir=str(status_path.parent))
+            os.fchmod(fd, replacement_mode(status_path))
+            os.close(fd)
+            conn = _db_open(staging)
+            with _db_transaction(conn):
+                _db_upsert(conn, agents)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.close()
+            os.replace(staging, db_path)
+        else:
+            heartbeats = [r.get("last_heartbeat") for r in agents.values() if r.get("last_heartbeat")]
+            _write_status({
+                "last_updated": max(heartbeats) if heartbeats else None,
+                "agents": agents,
+                "team_metrics": compute_metrics(agents),
+            })
+
+        if current == "sharded":
+            shutil.rmtree(retired, ignore_errors=True)
+        elif current == "sqlite":
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{retired}{suffix}").unlink(missing_ok=True)
+            Path(f"{db_path}-wal").unlink(missing_ok=True)
+            Path(f"{db_path}-shm").unlink(missing_ok=True)
+        if store != "json":
+            # Keep agent-status.json as a snapshot for plain-JSON readers
+            _write_json_snapshot()
+    return {
+        "success": True,
+        "message": f"Migrated {len(agents)} agents to the {store} store",
+        "store": store,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Heartbeat history
+# ---------------------------------------------------------------------------
+#
+# Every update appends one fixed-size sample to
+# ``agent-history.d/<quoted agent name>.bin``:
+#
+#     header:  magic "AFHS", version, record size, records kept by the
+#              last compaction, time of the last compaction
+#     records: epoch seconds (float64), status code, progress, task crc32
+#
+# Task strings are stored once per change in the ``.tasks`` sidecar as
+# ``<crc32 hex>\t<json string>`` lines.  Samples are appended in time order,
+# so a range query binary-searches the fixed-size records instead of
+# scanning the file.  Writers hold an ``fcntl`` lock on the ``.bin`` file;
+# compaction rewrites both files and swaps them in with an atomic rename.
+
+_HISTORY_HEADER = struct.Struct("<4sHHId")
+_HISTORY_RECORD = struct.Struct("<dBBxxI")
+_HISTORY_MAGIC = b"AFHS"
+_HISTORY_VERSION = 1
+_HISTORY_STATUSES = ("active", "awaiting", "blocked", "completed", "offline")
+
+
+def _resolve_history_dir():
+    return _resolve_status_file().parent / Path(HISTORY_DIR).name
+
+
+def _history_paths(agent_name):
+    base = _resolve_history_dir() / quote(agent_name, safe="")
+    return base.with_name(base.name + ".bin"), base.with_name(base.name + ".tasks")
+
+
+def _epoch(timestamp):
+    """Convert a naive UTC ISO timestamp (as written to the registry) to epoch seconds."""
+    return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _task_crc(task):
+    return zlib.crc32(task.encode("utf-8"))
+
+
+@contextmanager
+def _history_file(path):
+    """Open and exclusively lock *path*, creating it with a header if needed.
+
+    Compaction replaces the file by rename, so after taking the lock the
+    handle is checked against the path and reopened if it went stale.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            current = os.stat(path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(fd).st_ino:
+            break
+        os.close(fd)
+    try:
+        if os.fstat(fd).st_size < _HISTORY_HEADER.size:
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, _HISTORY_HEADER.pack(
+                _HISTORY_MAGIC, _HISTORY_VERSION, _HISTORY_RECORD.size, 0, 0.0), 0)
+        yield fd
+    finally:
+        os.close(fd)
+
+
+def _history_count(fd):
+    """Number of complete records in an open history file."""
+    size = os.fstat(fd).st_size - _HISTORY_HEADER.size
+    return max(size, 0) // _HISTORY_RECORD.size
+
+
+def _history_record(fd, index):
+    offset = _HISTORY_HEADER.size + index * _HISTORY_RECORD.size
+    return _HISTORY_RECORD.unpack(os.pread(fd, _HISTORY_RECORD.size, offset))
+
+
+def _history_header(fd):
+    magic, version, record_size, kept, compacted = _HISTORY_HEADER.unpack(
+        os.pread(fd, _HISTORY_HEADER.size, 0))
+    if magic != _HISTORY_MAGIC or version != _HISTORY_VERSION or record_size != _HISTORY_RECORD.size:
+        raise ValueError("unrecognized history file format")
+    return kept, compacted
+
+
+def _record_history(agent_name, record):
+    """Append one sample for *record* to the agent's history file."""
+    bin_path, tasks_path = _history_paths(agent_name)
+    ts = _epoch(record["last_heartbeat"])
+    crc = _task_crc(record["current_task"])
+    with _history_file(bin_path) as fd:
+        count = _history_count(fd)
+        # Drop a torn trailing record left by a crashed writer
+        os.ftruncate(fd, _HISTORY_HEADER.size + count * _HISTORY_RECORD.size)
+        last_crc = None
+        if count:
+            last_ts, _, _, last_crc = _history_record(fd, count - 1)
+            ts = max(ts, last_ts)  # keep the file sorted despite clock steps
+        if crc != last_crc:
+            with open(tasks_path, "a", encoding="utf-8") as fh:
+                fh.write(f"{crc:08x}\t{json.dumps(record['current_task'])}\n")
+        os.pwrite(fd, _HISTORY_RECORD.pack(
+            ts, _HISTORY_STATUSES.index(metric_bucket(record)),
+            record["progress"], crc,
+        ), _HISTORY_HEADER.size + count * _HISTORY_RECORD.size)
+        kept, _ = _history_header(fd)
+        if count + 1 - kept >= HISTORY_COMPACT_RECORDS:
+            _compact_history_locked(fd, bin_path, tasks_path)
+
+
+def _downsample(records, now):
+    """Apply retention and downsampling to time-ordered history records.
+
+    Samples past ``HISTORY_RETENTION`` are dropped.  Samples older than
+    ``HISTORY_DOWNSAMPLE_AFTER`` are reduced to the last one per
+    ``HISTORY_DOWNSAMPLE_BUCKET``, except that the first and last sample of
+    every status/task run are always kept so transitions stay exact.
+    """
+    cutoff = now - HISTORY_RETENTION.total_seconds()
+    thin_before = now - HISTORY_DOWNSAMPLE_AFTER.total_seconds()
+    bucket = HISTORY_DOWNSAMPLE_BUCKET.total_seconds()
+    records = [r for r in records if r[0] >= cutoff]
+    kept = []
+    for i, rec in enumerate(records):
+        if rec[0] >= thin_before:
+            kept.append(rec)
+            continue
+        prev = records[i - 1] if i else None
+        nxt = records[i + 1] if i + 1 < len(records) else None
+        run = (rec[1], rec[3])
+        if (
+            prev is None or (prev[1], prev[3]) != run
+            or nxt is None or (nxt[1], nxt[3]) != run
+            or nxt[0] // bucket != rec[0] // bucket
+        ):
+            kept.append(rec)
+    return kept
+
+
+def _compact_history_locked(fd, bin_path, tasks_path):
+    """Rewrite a locked history file after retention and downsampling."""
+    now = datetime.now(timezone.utc).timestamp()
+    count = _history_count(fd)
+    raw = os.pread(fd, count * _HISTORY_RECORD.size, _HISTORY_HEADER.size)
+    records = _downsample(list(_HISTORY_RECORD.iter_unpack(raw)), now)
+    referenced = {r[3] for r in records}
+    tasks = {crc: line for crc, line in _read_history_tasks(tasks_path, raw=True).items()
+             if crc in referenced}
+    atomic_write_text(tasks_path, "".join(tasks.values()))
+    body = b"".join(_HISTORY_RECORD.pack(*r) for r in records)
+    header = _HISTORY_HEADER.pack(
+        _HISTORY_MAGIC, _HISTORY_VERSION, _HISTORY_RECORD.size, len(records), now)
+    tmp_fd, tmp_name = tempfile.mkstemp(prefix=f".{bin_path.name}.", dir=str(bin_path.parent))
+    try:
+        os.fchmod(tmp_fd, replacement_mode(bin_path))
+        with os.fdopen(tmp_fd, "wb") as fh:
+            fh.write(header + body)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, bin_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    return count, len(records)
+
+
+def _read_history_tasks(tasks_path, raw=False):
+    """Map task crc32 -> task string (or the raw sidecar line)."""
+    tasks = {}
+    try:
+        with open(tasks_path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                crc, sep, text = line.partition("\t")
+                if not sep or not line.endswith("\n"):
+                    continue
+                try:
+                    tasks[int(crc, 16)] = line if raw else json.loads(text)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return tasks
+
+
+def _parse_since(value, now=None):
+    """Parse an ISO timestamp or a relative age such as ``90s``, ``15m``, ``2h``, ``7d``.
+
+    Returns:
+        float: Epoch seconds.
+
+    Raises:
+        ValueError: If *value* is neither form.
+    """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in units and value[:-1].replace(".", "", 1).isdigit():
+        now = datetime.now(timezone.utc).timestamp() if now is None else now
+        return now - float(value[:-1]) * units[value[-1]]
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(
+            f"Invalid time '{value}'. Use an ISO timestamp or an age like 30m, 2h, 7d"
+        ) from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def get_history(agent_name, since=None, until=None, limit=None):
+    """Return the recorded samples for one agent within a time range.
+
+    Args:
+        agent_name (str): Agent whose history to read.
+        since (str, optional): Lower bound, ISO timestamp or relative age.
+        until (str, optional): Upper bound, same formats as *since*.
+        limit (int, optional): Return only the most recent *limit* samples.
+
+    Returns:
+        dict: ``agent``, ``since``, ``until`` and ``samples`` (oldest first),
+        each sample holding ``timestamp``, ``status``, ``progress`` and
+        ``task``.
+
+    Raises:
+        ValueError: If a bound cannot be parsed.
+    """
+    lo = _parse_since(since) if since else None
+    hi = _parse_since(until) if until else None
+    bin_path, tasks_path = _history_paths(agent_name)
+    result = {"agent": agent_name, "since": _iso(lo) if lo is not None else None,
+              "until": _iso(hi) if hi is not None else None, "samples": []}
+    try:
+        fd = os.open(bin_path, os.O_RDONLY)
+    except FileNotFoundError:
+        return result
+    try:
+        try:
+            _history_header(fd)
+        except (ValueError, struct.error):
+            return result
+        count = _history_count(fd)
+
+        def bisect(bound, inclusive):
+            low, high = 0, count
+            while low < high:
+                mid = (low + high) // 2
+                ts = _history_record(fd, mid)[0]
+                if ts < bound or (not inclusive and ts == bound):
+                    low = mid + 1
+                else:
+                    high = mid
+            return low
+
+        first = bisect(lo, True) if lo is not None else 0
+        end = bisect(hi, False) if hi is not None else count
+        if limit is not None:
+            first = max(first, end - limit)
+        raw = os.pread(fd, max(end - first, 0) * _HISTORY_RECORD.size,
+                       _HISTORY_HEADER.size + first * _HISTORY_RECORD.size)
+    finally:
+        os.close(fd)
+
+    tasks = _read_history_tasks(tasks_path)
+    for ts, status, progress, crc in _HISTORY_RECORD.iter_unpack(raw):
+        result["samples"].append({
+            "timestamp": _iso(ts),
+            "status": _HISTORY_STATUSES[status] if status < len(_HISTORY_STATUSES) else "offline",
+            "progress": progress,
+            "task": tasks.get(crc),
+        })
+    return result
+
+
+def _recent_samples(agent_name, count):
+    """Return the agent's last *count* history records, oldest first."""
+    bin_path, _ = _history_paths(agent_name)
+    try:
+        fd = os.open(bin_path, os.O_RDONLY)
+    except FileNotFoundError:
+        return []
+    try:
+        _history_header(fd)
+        total = _history_count(fd)
+        first = max(total - count, 0)
+        raw = os.pread(fd, (total - first) * _HISTORY_RECORD.size,
+                       _HISTORY_HEADER.size + first * _HISTORY_RECORD.size)
+    except (ValueError, struct.error):
+        return []
+    finally:
+        os.close(fd)
+    return list(_HISTORY_RECORD.iter_unpack(raw))
+
+
+def _theil_sen(points, z=ETA_CONFIDENCE_Z):
+    """Robust slope of (t, y) points with confidence bounds.
+
+    The slope is the median of all pairwise slopes, so a few stalled or
+    jumpy samples barely move it; the bounds are the pairwise slopes at the
+    ranks given by the Kendall-tau variance (Sen, 1968).
+
+    Returns:
+        tuple: (slope, low, high), or ``None`` with fewer than two distinct
+        timestamps.
+    """
+    slopes = sorted(
+        (y2 - y1) / (t2 - t1)
+        for i, (t1, y1) in enumerate(points)
+        for t2, y2 in points[i + 1:]
+        if t2 > t1
+    )
+    if not slopes:
+        return None
+    count = len(slopes)
+    mid = count // 2
+    slope = slopes[mid] if count % 2 else (slopes[mid - 1] + slopes[mid]) / 2
+    n = len(points)
+    spread = z * math.sqrt(n * (n - 1) * (2 * n + 5) / 18)
+    low = slopes[max(int((count - spread) / 2), 0)]
+    high = slopes[min(math.ceil((count + spread) / 2), count - 1)]
+    return slope, low, high
+
+
+def _forecast(samples):
+    """Predict when the current task reaches 100% from history records.
+
+    Only the trailing run of the current task is used: the window stops at
+    a task change or a progress drop of more than ``ETA_RESTART_DROP``
+    points (a restarted task).
+
+    Returns:
+        dict: ``completion``, ``earliest`` and ``latest`` (ISO timestamps,
+        the bounds ``None`` when unbounded), ``rate_per_hour`` and
+        ``samples``; or ``None`` if there is not enough evidence of progress.
+    """
+    if not samples:
+        return None
+    run = [samples[-1]]
+    for rec in reversed(samples[:-1]):
+        if rec[3] != run[-1][3] or rec[2] - run[-1][2] > ETA_RESTART_DROP:
+            break
+        run.append(rec)
+    run.reverse()
+    last_ts, _, last_progress, _ = run[-1]
+    if last_progress >= 100:
+        return None
+    fit = _theil_sen([(ts, progress) for ts, _, progress, _ in run])
+    if len(run) < ETA_MIN_SAMPLES or fit is None or fit[0] <= 0:
+        return None
+    slope, low, high = fit
+    remaining = 100 - last_progress
+    return {
+        "completion": _iso(last_ts + remaining / slope),
+        "earliest": _iso(last_ts + remaining / high) if high > 0 else None,
+        "latest": _iso(last_ts + remaining / low) if low > 0 else None,
+        "rate_per_hour": round(slope * 3600, 2),
+        "samples": len(run),
+    }
+
+
+def estimate_eta(agent_name):
+    """Forecast the agent's completion time from its recent progress samples.
+
+    Returns:
+        dict: See ``_forecast``; ``None`` without enough samples.
+    """
+    return _forecast(_recent_samples(agent_name, ETA_WINDOW))
+
+
+def compact_history(agent_name=None):
+    """Apply retention and downsampling to one or every agent's history.
+
+    Returns:
+        dict: ``success`` and per-agent ``before``/``after`` sample counts.
+    """
+    history_dir = _resolve_history_dir()
+    if agent_name:
+        names = [agent_name]
+    else:
+        names = sorted(unquote(p.stem) for p in history_dir.glob("*.bin"))
+    compacted = {}
+    for name in names:
+        bin_path, tasks_path = _history_paths(name)
+        if not bin_path.exists():
+            continue
+        with _history_file(bin_path) as fd:
+            before, after = _compact_history_locked(fd, bin_path, tasks_path)
+        compacted[name] = {"before": before, "after": after}
+    return {"success": True, "agents": compacted}
 
+
+# ---------------------------------------------------------------------------
+# Change events
+# ---------------------------------------------------------------------------
+#
+# Every change to the registry appends one NDJSON line to
+# ``agent-status.events``:
+#
+#     {"offset": 1234, "ts": "...", "event": "update", "agent": "impl-a",
+#      "old_status": "active", "new_status": "blocked",
+#      "progress": 40, "progress_delta": 10}
+#
+# ``event`` is ``update``, ``remove``, ``reap`` or ``reset``.  Heartbeats
+# that change nothing but the timestamp are not logged.  ``offset`` is a
+# logical byte offset that keeps growing across rotations: each file starts
+# with a ``{"base": N}`` line giving the offset of its first byte, so a
+# subscriber resumes from the last ``next_offset`` it saw with
+# ``read_events`` and never has to re-read a snapshot.
+
+def _resolve_event_log():
+    return _resolve_status_file().parent / Path(EVENT_LOG).name
+
+
+def _change_event(agent_name, old_record, new_record, event="update"):
+    """Build the event for one agent's change, or ``None`` if nothing changed."""
+    fields = ("status", "current_task", "progress", "blocked_by")
+    if (
+        event == "update" and old_record is not None and new_record is not None
+        and all(old_record.get(f) == new_record.get(f) for f in fields)
+    ):
+        return None
+    old_progress = old_record.get("progress") if old_record else None
+    new_progress = new_record.get("progress") if new_record else None
     return {
-        "total_agents": len(agents),
-        "active": counts["active"],
-        "awaiting": counts["awaiting"],
-        "blocked": counts["blocked"],
-        "completed": counts["completed"],
-        "offline": counts["offline"],
+        "event": event,
+        "agent": agent_name,
+        "old_status": old_record.get("status") if old_record else None,
+        "new_status": new_record.get("status") if new_record else None,
+        "progress": new_progress,
+        "progress_delta": (
+            new_progress - old_progress
+            if isinstance(new_progress, int) and isinstance(old_progress, int) else None
+        ),
     }
 
 
-def update_status(agent_name, status, task, progress, blocked_by=None):
+def _event_header(path):
+    """Return the base offset recorded on the first line of an event log."""
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            header = json.loads(fh.readline())
+        return int(header["base"])
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _publish_events(events):
+    """Append change events to the event log, rotating it when it is full.
+
+    Publishing is best-effort: a failure here never fails the update.
+    """
+    events = [e for e in events if e is not None]
+    if not events:
+        return
+    path = _resolve_event_log()
+    ts = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(fd).st_ino:
+                break
+            os.close(fd)  # rotated while we waited for the lock
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                header = json.dumps({"base": 0}) + "\n"
+                os.write(fd, header.encode("utf-8"))
+                size = len(header)
+            base = _event_header(path) or 0
+            lines = []
+            for event in events:
+                line = json.dumps(dict({"offset": base + size, "ts": ts}, **event)) + "\n"
+                lines.append(line)
+                size += len(line.encode("utf-8"))
+            os.write(fd, "".join(lines).encode("utf-8"))
+            if size >= EVENT_LOG_MAX_BYTES:
+                # Start a new file whose first offset continues this one's
+                fresh = tempfile.NamedTemporaryFile(
+                    "w", prefix=f".{path.name}.", dir=str(path.parent), delete=False)
+                with fresh:
+                    os.fchmod(fresh.fileno(), replacement_mode(path))
+                    fresh.write(json.dumps({"base": base + size}) + "\n")
+                os.replace(path, path.with_name(path.name + ".1"))
+                os.replace(fresh.name, path)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def _read_event_file(path, offset, limit):
+    """Read events at or after logical *offset* from one log file.
+
+    Returns:
+        tuple: (events, next_offset, base) where *base* is ``None`` if the
+        file does not exist.
+    """
+    base = _event_header(path)
+    if base is None:
+        return [], offset, None
+    events = []
+    with open(path, "rb") as fh:
+        header_len = len(fh.readline())
+        fh.seek(max(offset - base, header_len))
+        position = fh.tell()
+        for raw in fh:
+            if not raw.endswith(b"\n") or (limit is not None and len(events) >= limit):
+                break  # incomplete trailing line, or enough for this call
+            position += len(raw)
+            try:
+                events.append(json.loads(raw))
+            except json.JSONDecodeError:
+                continue
+    return events, base + position, base
+
+
+def read_events(offset=None, limit=None):
+    """Read change events published at or after *offset*.
+
+    Args:
+        offset (int, optional): Logical offset to resume from (the
+            ``next_offset`` of a previous call).  ``None`` means the
+            current end of the log, i.e. only future events.
+        limit (int, optional): Return at most this many events.
+
+    Returns:
+        dict: ``events``, ``next_offset`` and ``truncated`` (True if events
+        between *offset* and the oldest retained one were rotated away).
+    """
+    path = _resolve_event_log()
+    base = _event_header(path)
+    if base is None:
+        return {"events": [], "next_offset": offset or 0, "truncated": False}
+    if offset is None:
+        return {"events": [], "next_offset": base + path.stat().st_size, "truncated": False}
+
+    events, truncated = [], False
+    if offset < base:
+        archive = path.with_name(path.name + ".1")
+        archive_base = _event_header(archive)
+        if archive_base is None or offset < archive_base:
+            truncated = True
+            offset = archive_base if archive_base is not None else base
+        if archive_base is not None and offset < base:
+            events, offset, _ = _read_event_file(archive, offset, limit)
+            if offset < base and (limit is None or len(events) < limit):
+                offset = base
+    if limit is None or len(events) < limit:
+        more, offset, _ = _read_event_file(
+            path, offset, None if limit is None else limit - len(events))
+        events.extend(more)
+    return {"events": events, "next_offset": offset, "truncated": truncated}
+
+
+def follow_events(offset=None, poll_interval=EVENT_POLL_INTERVAL):
+    """Yield change events as they are published, starting at *offset*.
+
+    Checking for new events costs one ``stat`` per *poll_interval*; the log
+    is only read when it has grown or been rotated.
+    """
+    path = _resolve_event_log()
+    if offset is None:
+        offset = read_events()["next_offset"]
+    last_seen = None
+    while True:
+        try:
+            st = path.stat()
+            seen = (st.st_ino, st.st_size)
+        except FileNotFoundError:
+            seen = None
+        if seen != last_seen:
+            batch = read_events(offset)
+            offset = batch["next_offset"]
+            yield from batch["events"]
+            last_seen = seen
+        time.sleep(poll_interval)
+
+
+# ---------------------------------------------------------------------------
+# Liveness
+# ---------------------------------------------------------------------------
+#
+# ``pid`` holds the session id or the pid of the short-lived updater
+# process, so it says nothing about whether the agent is still running.
+# Agents that heartbeat from a long-lived process can pass ``watch_pid``;
+# the record then carries ``watch_pid`` and ``host`` and is reaped as soon
+# as that process is gone.  Otherwise liveness is judged by heartbeat age.
+
+def _stale_reason(record, now, host):
+    """Return why *record* belongs to a dead agent, or ``None`` if it is live.
+
+    Args:
+        record (dict): An agent status record.
+        now (float): Current time in epoch seconds.
+        host (str): This machine's hostname.
+    """
+    limit = STALE_AFTER.get(record.get("status"))
+    if limit is None:
+        return None
+    watch_pid = record.get("watch_pid")
+    if watch_pid is not None and record.get("host") == host and not pid_alive(watch_pid):
+        return f"process {watch_pid} exited"
+    try:
+        age = now - _epoch(record["last_heartbeat"])
+    except (KeyError, TypeError, ValueError):
+        return "no heartbeat recorded"
+    if age > limit.total_seconds():
+        return f"no heartbeat for {int(age)}s (limit {int(limit.total_seconds())}s)"
+    return None
+
+
+def _reaped(record, reason, now):
+    reaped = dict(record)
+    reaped["status"] = "offline"
+    reaped["previous_status"] = record.get("status")
+    reaped["reaped_at"] = now
+    reaped["reap_reason"] = reason
+    return reaped
+
+
+def reap_stale(dry_run=False):
+    """Move agents that stopped heartbeating (or whose process exited) to ``offline``.
+
+    Args:
+        dry_run (bool): Only report which agents would be reaped.
+
+    Returns:
+        dict: ``success``, ``dry_run`` and ``reaped`` mapping agent names to
+        the reason they were judged dead.
+    """
+    now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")
+    now_epoch = _epoch(now)
+    host = socket.gethostname()
+    reaped = {}
+    events = []
+    with _status_guard():
+        kind = _store_kind()
+        if kind == "sqlite":
+            conn = _db_connect()
+            stale = sorted(STALE_AFTER)
+            rows = conn.execute(
+                f"SELECT name, record FROM agents WHERE status IN ({','.join('?' * len(stale))})",
+                stale,
+            ).fetchall()
+            offline = {}
+            for name, raw in rows:
+                record = json.loads(raw)
+                reason = _stale_reason(record, now_epoch, host)
+                if reason is not None:
+                    reaped[name] = reason
+                    offline[name] = _reaped(record, reason, now)
+                    events.append(_change_event(name, record, offline[name], "reap"))
+            if offline and not dry_run:
+                with _db_transaction(conn):
+                    conn.executemany(_DB_UPSERT, [_db_row(n, r) for n, r in offline.items()])
+            if dry_run:
+                events = []
+        elif kind == "sharded":
+            for name, record in _SHARD_CACHE.records(_resolve_shard_dir()).items():
+                reason = _stale_reason(record, now_epoch, host)
+                if reason is None:
+                    continue
+                reaped[name] = reason
+                if dry_run:
+                    continue
+                # Skip the agent if it heartbeated since the merge above; the
+                # shard lock keeps a heartbeat from landing in between
+                try:
+                    with _shard_lock(name):
+                        current = read_shard(_shard_path(name))
+                        if (current is None or current.get("last_heartbeat")
+                                != record.get("last_heartbeat")):
+                            del reaped[name]
+                            continue
+                        offline = _reaped(current, reason, now)
+                        _write_shard(name, offline)
+                except FileNotFoundError:
+                    del reaped[name]  # migrated to another layout meanwhile
+                    continue
+                events.append(_change_event(name, current, offline, "reap"))
+        else:
+            data = _read_status()
+            for name, record in list(data["agents"].items()):
+                reason = _stale_reason(record, now_epoch, host)
+                if reason is None:
+                    continue
+                reaped[name] = reason
+                if not dry_run:
+                    data["agents"][name] = _reaped(record, reason, now)
+                    _apply_metrics(data, record, data["agents"][name])
+                    events.append(_change_event(name, record, data["agents"][name], "reap"))
+            if reaped and not dry_run:
+                data["last_updated"] = now
+                _write_status(data)
+        if events:
+            _write_json_snapshot()
+        _publish_events(events)
+    return {"success": True, "dry_run": dry_run, "reaped": reaped}
+
+
+def _maybe_reap():
+    """Reap stale agents if nobody has done so within ``REAP_INTERVAL``.
+
+    The time of the last pass is the mtime of ``<status file>.reaped``, so
+    concurrent readers cost one ``stat`` and only one of them does the work.
+    """
+    marker = _resolve_status_file()
+    marker = marker.with_name(marker.name + ".reaped")
+    try:
+        if time.time() - marker.stat().st_mtime < REAP_INTERVAL.total_seconds():
+            return
+    except FileNotFoundError:
+        pass
+    try:
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+        reap_stale()
+    except OSError:
+        pass
+
+
+def update_status(agent_name, status, task, progress, blocked_by=None, watch_pid=None,
+                  use_broker=True, team=None):
     """Update an agent's status in the shared registry.
 
     Args:
@@ -145,9 +1566,34 @@ def update_status(agent_name, status, task, progress, blocked_by=None):
         task (str): Short description of the current task.
         progress (int): Percentage complete (0-100).
         blocked_by (str, optional): Agent or resource causing a block.
+        watch_pid (int, optional): Long-lived process running the agent;
+            the agent is reaped as soon as it exits.
+        use_broker (bool): Hand the update to the status broker if one is
+            listening, instead of writing the registry directly.
+        team (str, optional): Team the agent belongs to, when its name does
+            not say (see ``_team_of``).
 
     Returns:
-        dict: The updated full status document.
+        dict: The updated full status document.  When the registry is
+        sharded, or the update went through the broker, only this agent's
+        entry is included (merging the whole team would defeat the point);
+        use ``get_status`` for the team view.
+
+    Raises:
+        ValueError: If *status* is not a recognized value or *progress* is
+            out of range.
+    """
+    agent_record = _build_record(status, task, progress, blocked_by, watch_pid, team)
+    if use_broker:
+        result = _status_broker_request(
+            "submit", {"agent_name": agent_name, "record": agent_record})
+        if result is not NO_BROKER:
+            return result
+    return _commit_records({agent_name: agent_record})
+
+
+def _build_record(status, task, progress, blocked_by=None, watch_pid=None, team=None):
+    """Validate an update and build the agent's status record.
 
     Raises:
         ValueError: If *status* is not a recognized value or *progress* is
@@ -162,7 +1608,6 @@ def update_status(agent_name, status, task, progress, blocked_by=None):
     if progress < 0 or progress > 100:
         raise ValueError(f"Progress must be 0-100, got {progress}")
 
-    data = _read_status()
     now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")
 
     # Build the agent's status record
@@ -175,29 +1620,272 @@ def update_status(agent_name, status, task, progress, blocked_by=None):
     }
     if blocked_by:
         agent_record["blocked_by"] = blocked_by
+    if watch_pid is not None:
+        agent_record["watch_pid"] = int(watch_pid)
+        agent_record["host"] = socket.gethostname()
+    if team:
+        agent_record["team"] = team
+    return agent_record
+
+
+def _write_records(records, keep=None):
+    """Write several agents' records in one pass (see ``_commit_records``).
+
+    In single-document mode the whole batch costs one guarded read and one
+    write; in sharded mode each agent's shard is written once; in SQLite
+    mode the batch is one transaction of single-row upserts.
+
+    Args:
+        records (dict): Mapping of agent names to complete status records.
+        keep (dict, optional): Agent name -> record fields (``current_task``,
+            ``progress``) to carry over from the agent's current record.
+            They are read in the same transaction (or under the same shard
+            lock) as the write, so a concurrent update is never reverted.
 
-    data["agents"][agent_name] = agent_record
-    data["last_updated"] = now
-    data["team_metrics"] = _compute_metrics(data["agents"])
+    Returns:
+        dict: The updated full status document.  When the registry is
+        sharded or in SQLite only the written entries are included.
+    """
+    keep = keep or {}
+    annotated = set()
 
-    _write_status(data)
+    def annotate(agent_name, agent_record):
+        if agent_name in annotated:
+            return
+        annotated.add(agent_name)
+        try:
+            _record_history(agent_name, agent_record)
+            if agent_record["status"] not in ("completed", "offline"):
+                eta = estimate_eta(agent_name)
+                if eta:
+                    agent_record["eta"] = eta
+        except (OSError, ValueError, struct.error):
+            pass  # history is best-effort; never fail the heartbeat over it
+
+    def resolve(agent_name, agent_record, old_record):
+        """Fill in kept fields from *old_record*; called inside the write."""
+        if agent_name in keep:
+            for field in keep[agent_name]:
+                if old_record and field in old_record:
+                    agent_record[field] = old_record[field]
+            annotate(agent_name, agent_record)
+
+    # Records without kept fields are final: do the history work up front,
+    # outside any registry lock
+    for agent_name, agent_record in records.items():
+        if agent_name not in keep:
+            annotate(agent_name, agent_record)
+
+    now = max(r["last_heartbeat"] for r in records.values())
+    shard_result = {"last_updated": now, "agents": dict(records)}
+
+    def write_shards():
+        events = []
+        for agent_name, agent_record in records.items():
+            with _shard_lock(agent_name):
+                old_record = read_shard(_shard_path(agent_name))
+                resolve(agent_name, agent_record, old_record)
+                _write_shard(agent_name, agent_record)
+            events.append(_change_event(agent_name, old_record, agent_record))
+        _publish_events(events)
+
+    def write_db():
+        conn = _db_connect()
+        with _db_transaction(conn):
+            events = _db_upsert(conn, records, resolve)
+        _publish_events(events)
+
+    kind = _store_kind()
+    if kind == "sharded":
+        try:
+            write_shards()
+            return shard_result
+        except FileNotFoundError:
+            pass  # migrated to another layout meanwhile
+    elif kind == "sqlite":
+        with _status_guard(shared=True):
+            if _store_kind() == "sqlite":
+                write_db()
+                return shard_result
+
+    with _status_guard():
+        kind = _store_kind()  # the layout may have changed while we waited
+        if kind == "sharded":
+            write_shards()
+            return shard_result
+        if kind == "sqlite":
+            write_db()
+            return shard_result
+        data = _read_status()
+        events = []
+        for agent_name, agent_record in records.items():
+            old_record = data["agents"].get(agent_name)
+            resolve(agent_name, agent_record, old_record)
+            data["agents"][agent_name] = agent_record
+            _apply_metrics(data, old_record, agent_record)
+            events.append(_change_event(agent_name, old_record, agent_record))
+        data["last_updated"] = now
+        _write_status(data)
+        _publish_events(events)
     return data
 
 
-def get_status(agent_name=None):
+def _commit_records(records, keep=None):
+    """Write several agents' records, then refresh the JSON snapshot.
+
+    Args and return value are those of ``_write_records``; the snapshot
+    refresh runs after every registry lock has been released.
+    """
+    result = _write_records(records, keep)
+    _refresh_json_snapshot()
+    return result
+
+
+def update_many(updates):
+    """Apply status updates for several agents in one registry transaction.
+
+    Every update is validated before anything is written, so a bad entry
+    leaves the registry untouched.  An update may omit ``task`` or
+    ``progress`` to keep the agent's current value.
+
+    Args:
+        updates (list[dict]): Each with ``agent_name`` (or ``agent``),
+            ``status``, and optionally ``task``, ``progress``,
+            ``blocked_by``, ``watch_pid`` and ``team``.
+
+    Returns:
+        dict: The updated full status document (only the written entries
+        when the registry is sharded).
+
+    Raises:
+        ValueError: If any update is malformed or invalid.
+    """
+    if not updates:
+        raise ValueError("No updates given")
+    records = {}
+    keep = {}
+    for index, update in enumerate(updates, 1):
+        if not isinstance(update, dict):
+            raise ValueError(f"Update {index}: expected an object, got {type(update).__name__}")
+        agent_name = update.get("agent_name") or update.get("agent")
+        if not agent_name:
+            raise ValueError(f"Update {index}: missing agent_name")
+        task = update.get("task", update.get("current_task"))
+        progress = update.get("progress")
+        # Omitted fields keep the agent's current value, resolved by
+        # _commit_records inside the write; validate with the defaults
+        kept = [field for field, value in (("current_task", task), ("progress", progress))
+                if value is None]
+        if kept:
+            keep[agent_name] = kept
+        else:
+            keep.pop(agent_name, None)  # a later entry for the same agent wins
+        task = "" if task is None else task
+        progress = 0 if progress is None else progress
+        try:
+            records[agent_name] = _build_record(
+                update.get("status"), task, progress,
+                update.get("blocked_by"), update.get("watch_pid"), update.get("team"),
+            )
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Update {index} ({agent_name}): {exc}") from None
+
+    # Anything the broker buffered is older than this batch; write it first
+    _status_broker_request("flush")
+    return _commit_records(records, keep)
+
+
+def _parse_updates(text, defaults=None):
+    """Parse a JSON array, a single JSON object or NDJSON into update dicts.
+
+    A status document (``{"agents": {name: record}}``) is accepted too.
+    *defaults* fill in fields an update leaves out.
+
+    Raises:
+        ValueError: If the input is not valid JSON or NDJSON.
+    """
+    text = text.strip()
+    try:
+        parsed = json.loads(text) if text else []
+    except json.JSONDecodeError:
+        parsed = []
+        for lineno, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                parsed.append(json.loads(line))
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"Line {lineno}: invalid JSON ({exc.msg})") from None
+    if isinstance(parsed, dict):
+        if isinstance(parsed.get("agents"), dict):
+            parsed = [dict(record, agent_name=name) for name, record in parsed["agents"].items()]
+        else:
+            parsed = [parsed]
+    if not isinstance(parsed, list):
+        raise ValueError("Expected a JSON array, object or NDJSON stream of updates")
+    defaults = {k: v for k, v in (defaults or {}).items() if v is not None}
+    return [dict(defaults, **u) if isinstance(u, dict) else u for u in parsed]
+
+
+def get_status(agent_name=None, status=None, team=None, eta=False):
     """Retrieve the current status of one agent or the whole team.
 
     Args:
         agent_name (str, optional): If given, return just that agent's record.
+        status (str, optional): Only include agents with this status.
+        team (str, optional): Only include agents of this team (see
+            ``_team_of``).
+        eta (bool): Recompute each agent's ``eta`` forecast from its
+            history (see ``estimate_eta``) instead of returning the one
+            stored at its last update.
+
+    Agents that stopped heartbeating are reaped to ``offline`` first (at
+    most once per ``REAP_INTERVAL``), so the view never counts dead agents.
 
     Returns:
         dict: The agent's record, or the full status document if
         *agent_name* is ``None``.
     """
-    data = _read_status()
+    _status_broker_request("flush")
+    _maybe_reap()
+    result = _lookup_status(agent_name, status, team)
+    if eta and "error" not in result:
+        if agent_name:
+            result = _with_fresh_eta(agent_name, result)
+        else:
+            result = dict(result, agents={name: _with_fresh_eta(name, record)
+                                          for name, record in result["agents"].items()})
+    return result
+
+
+def _with_fresh_eta(agent_name, record):
+    """Return a copy of *record* with its ``eta`` recomputed.
+
+    Copied because records may be shared with ``_SHARD_CACHE``, and a
+    forecast must not leak into later reads or writes from this process.
+    """
+    record = {key: value for key, value in record.items() if key != "eta"}
+    if record.get("status") not in ("completed", "offline"):
+        record["eta"] = estimate_eta(agent_name)
+    return record
+
+
+def _lookup_status(agent_name=None, status=None, team=None):
+    kind = _store_kind()
+    if kind == "sqlite":
+        try:
+            if agent_name:
+                return _db_get(agent_name) or {"error": f"Agent '{agent_name}' not found"}
+            return _db_view(status, team)
+        except FileNotFoundError:
+            kind = _store_kind()  # migrated away meanwhile
+    if agent_name and kind == "sharded":
+        record = read_shard(_shard_path(agent_name))
+        return record or {"error": f"Agent '{agent_name}' not found"}
+    data = _merged_status()
     if agent_name:
         return data["agents"].get(agent_name, {"error": f"Agent '{agent_name}' not found"})
-    return data
+    return _filter_view(data, status, team)
 
 
 def remove_agent(agent_name):
@@ -209,14 +1897,40 @@ def remove_agent(agent_name):
     Returns:
         dict: Result with ``success`` and ``message``.
     """
-    data = _read_status()
-    if agent_name not in data["agents"]:
-        return {"success": False, "message": f"Agent '{agent_name}' not found"}
-
-    del data["agents"][agent_name]
-    data["last_updated"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")
-    data["team_metrics"] = _compute_metrics(data["agents"])
-    _write_status(data)
+    _status_broker_request("flush")
+    with _status_guard():
+        kind = _store_kind()
+        if kind == "sqlite":
+            conn = _db_connect()
+            with _db_transaction(conn):
+                row = conn.execute(
+                    "SELECT record FROM agents WHERE name = ?", (agent_name,)).fetchone()
+                conn.execute("DELETE FROM agents WHERE name = ?", (agent_name,))
+            if row is None:
+                return {"success": False, "message": f"Agent '{agent_name}' not found"}
+            _write_json_snapshot()
+            _publish_events([_change_event(agent_name, json.loads(row[0]), None, "remove")])
+            return {"success": True, "message": f"Agent '{agent_name}' removed"}
+        if kind == "sharded":
+            try:
+                with _shard_lock(agent_name):
+                    old_record = read_shard(_shard_path(agent_name))
+                    _shard_path(agent_name).unlink()
+            except FileNotFoundError:
+                return {"success": False, "message": f"Agent '{agent_name}' not found"}
+            _write_json_snapshot()
+            _publish_events([_change_event(agent_name, old_record, None, "remove")])
+            return {"success": True, "message": f"Agent '{agent_name}' removed"}
+
+        data = _read_status()
+        if agent_name not in data["agents"]:
+            return {"success": False, "message": f"Agent '{agent_name}' not found"}
+
+        old_record = data["agents"].pop(agent_name)
+        data["last_updated"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")
+        _apply_metrics(data, old_record, None)
+        _write_status(data)
+        _publish_events([_change_event(agent_name, old_record, None, "remove")])
     return {"success": True, "message": f"Agent '{agent_name}' removed"}
 
 
@@ -238,10 +1952,368 @@ def reset_all():
             "offline": 0,
         },
     }
-    _write_status(data)
+    _status_broker_request("flush")
+    with _status_guard():
+        kind = _store_kind()
+        if kind == "sqlite":
+            conn = _db_connect()
+            with _db_transaction(conn):
+                conn.execute("DELETE FROM agents")
+                conn.execute("DELETE FROM meta WHERE key = 'last_updated'")
+        elif kind == "sharded":
+            for path in _resolve_shard_dir().glob("*.json"):
+                path.unlink(missing_ok=True)
+        _write_status(data)  # the store itself, or the JSON snapshot
+        _publish_events([{"event": "reset", "agent": None}])
     return data
 
 
+# ---------------------------------------------------------------------------
+# Federation
+# ---------------------------------------------------------------------------
+#
+# Every project under ``projects/`` has its own registry in whichever
+# layout it uses.  ``federation-index.json`` at the foundry root holds a
+# copy of each project's agents together with the (inode, mtime, size)
+# signature of the registry files they were read from.  A query stats each
+# project's registry and re-reads only those whose signature moved, so a
+# fleet-wide question costs one ``stat`` per project when nothing changed.
+
+def _resolve_foundry_root(root=None):
+    """Resolve the directory containing ``projects/``."""
+    if root:
+        return Path(root).resolve()
+    if (Path.cwd() / Path(FEDERATION_PROJECTS).parent).is_dir():
+        return Path.cwd()
+    return Path(__file__).resolve().parent.parent.parent
+
+
+def _registry_signature(state_dir):
+    """Fingerprint every file a project's registry may live in.
+
+    A SQLite registry's ``-wal`` file is also touched by readers, so
+    database changes are detected through the change-event log instead
+    (heartbeat-only updates then surface at the next checkpoint).
+    """
+    signature = []
+    for name in (Path(STATUS_FILE).name, Path(SHARD_DIR).name, Path(STATUS_DB).name,
+                 Path(EVENT_LOG).name):
+        try:
+            st = os.stat(state_dir / name)
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append([st.st_ino, st.st_mtime_ns, st.st_size])
+    return signature
+
+
+def _read_project_registry(state_dir):
+    """Read one project's agents, whatever layout its registry uses."""
+    return read_agents(state_dir, timeout=STATUS_DB_TIMEOUT)
+
+
+def refresh_federation(root=None):
+    """Bring the cross-project index up to date and return it.
+
+    Projects whose registry files are unchanged since the last refresh are
+    not read; vanished projects are dropped.
+
+    Args:
+        root (str, optional): Foundry root containing ``projects/``.
+
+    Returns:
+        dict: The index, ``{"projects": {name: {"path", "signature",
+        "agents", "team_metrics"}}, "team_metrics", "refreshed"}``, where
+        ``refreshed`` lists the projects re-read by this call.
+    """
+    root = _resolve_foundry_root(root)
+    index_path = root / FEDERATION_INDEX
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(index_path.with_name(index_path.name + ".lock"), "a") as guard:
+        fcntl.flock(guard.fileno(), fcntl.LOCK_EX)
+        try:
+            with open(index_path, "r", encoding="utf-8") as fh:
+                index = json.load(fh)
+            projects = index["projects"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            projects = {}
+
+        discovered = {}
+        for project_dir in sorted(root.glob(FEDERATION_PROJECTS)):
+            state_dir = project_dir / Path(STATUS_FILE).parent
+            if state_dir.is_dir():
+                discovered[project_dir.name] = state_dir
+
+        refreshed = []
+        for name, state_dir in discovered.items():
+            signature = _registry_signature(state_dir)
+            cached = projects.get(name)
+            if cached and cached.get("signature") == signature:
+                continue
+            agents = _read_project_registry(state_dir)
+            projects[name] = {
+                "path": str(state_dir.parent),
+                "signature": signature,
+                "agents": agents,
+                "team_metrics": compute_metrics(agents),
+            }
+            refreshed.append(name)
+        removed = set(projects) - set(discovered)
+        for name in removed:
+            del projects[name]
+
+        totals = compute_metrics({})
+        for project in projects.values():
+            for key, count in project["team_metrics"].items():
+                totals[key] = totals.get(key, 0) + count
+        index = {"projects": projects, "team_metrics": totals}
+        if refreshed or removed or not index_path.exists():
+            atomic_write_text(index_path, json.dumps(index))
+        fcntl.flock(guard.fileno(), fcntl.LOCK_UN)
+    return dict(index, refreshed=refreshed)
+
+
+def federated_status(status=None, team=None, project=None, root=None):
+    """Answer a fleet-wide query across every project's registry.
+
+    Args:
+        status (str, optional): Only agents with this status.
+        team (str, optional): Only agents of this team.
+        project (str, optional): Only this project.
+        root (str, optional): Foundry root containing ``projects/``.
+
+    Returns:
+        dict: ``agents`` (a list of records tagged with ``project`` and
+        ``agent``), ``team_metrics`` over the matched agents,
+        ``by_project`` counts, and the ``refreshed`` projects.
+    """
+    index = refresh_federation(root)
+    matched = []
+    by_project = {}
+    for project_name, entry in sorted(index["projects"].items()):
+        if project and project_name != project:
+            continue
+        view = _filter_view({"agents": entry["agents"]}, status, team)
+        for agent_name, record in sorted(view["agents"].items()):
+            matched.append(dict(record, project=project_name, agent=agent_name))
+        by_project[project_name] = len(view["agents"])
+    if status or team or project:
+        metrics = compute_metrics({(a["project"], a["agent"]): a for a in matched})
+    else:
+        metrics = index["team_metrics"]
+    return {
+        "projects": len(by_project),
+        "by_project": by_project,
+        "team_metrics": metrics,
+        "agents": matched,
+        "refreshed": index["refreshed"],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Heartbeat client and status broker
+# ---------------------------------------------------------------------------
+
+class HeartbeatClient:
+    """Debounced status reporting for one agent, for use inside its process.
+
+    Progress ticks are buffered and sent at most once per *flush_interval*
+    seconds; a change of status or ``blocked_by`` is sent immediately, and a
+    timer flushes the last buffered tick so the registry never lags by more
+    than one interval.  Updates go to the status broker when one is
+    listening, otherwise straight to the registry.
+
+    Example::
+
+        with HeartbeatClient("impl-a") as hb:
+            for i, chunk in enumerate(chunks):
+                hb.update("active", "Processing chunks", i * 100 // len(chunks))
+            hb.update("completed", "Processing chunks", 100)
+    """
+
+    def __init__(self, agent_name, flush_interval=HEARTBEAT_FLUSH_INTERVAL,
+                 watch_pid=None, use_broker=True):
+        """
+        Args:
+            agent_name (str): Unique agent identifier.
+            flush_interval (float): Minimum seconds between sends.
+            watch_pid (int, optional): Process whose exit marks the agent
+                dead; defaults to the calling process.
+            use_broker (bool): Send through the status broker if listening.
+        """
+        self.agent_name = agent_name
+        self.flush_interval = flush_interval
+        self.watch_pid = os.getpid() if watch_pid is None else watch_pid
+        self.use_broker = use_broker
+        self.sends = 0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending = None
+        self._sent = None
+        self._last_send = None
+        self._timer = None
+
+    def update(self, status, task, progress, blocked_by=None):
+        """Record the agent's current state, sending it now or within one interval.
+
+        Raises:
+            ValueError: If *status* or *progress* is invalid.
+        """
+        record = _build_record(status, task, progress, blocked_by, self.watch_pid)
+        with self._lock:
+            self._pending = record
+            urgent = self._sent is None or (
+                (self._sent["status"], self._sent.get("blocked_by"))
+                != (record["status"], record.get("blocked_by"))
+            )
+            wait = 0 if urgent else self.flush_interval - (time.monotonic() - self._last_send)
+            if wait > 0 and self._timer is None:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if wait <= 0:
+            self.flush()
+
+    def flush(self):
+        """Send the buffered update, if any."""
+        with self._send_lock:
+            with self._lock:
+                record, self._pending = self._pending, None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if record is None:
+                return
+            result = NO_BROKER
+            if self.use_broker:
+                result = _status_broker_request(
+                    "submit", {"agent_name": self.agent_name, "record": record})
+            if result is NO_BROKER:
+                _commit_records({self.agent_name: record})
+            with self._lock:
+                self._sent = record
+                self._last_send = time.monotonic()
+                self.sends += 1
+
+    def close(self):
+        """Flush anything still buffered."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _StatusBroker:
+    """Buffer updates from many agents and write them in periodic batches."""
+
+    def __init__(self, flush_interval=STATUS_BROKER_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, agent_name, record):
+        if not isinstance(record, dict) or record.get("status") not in VALID_STATUSES:
+            raise ValueError("record must be a status record")
+        with self._lock:
+            self._pending[agent_name] = record
+        return {"last_updated": record.get("last_heartbeat"), "agents": {agent_name: record}}
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if batch:
+                try:
+                    _commit_records(batch)
+                except (OSError, sqlite3.Error):
+                    # Keep the acknowledged updates for the next flush;
+                    # anything submitted meanwhile is newer and wins
+                    with self._lock:
+                        self._pending = {**batch, **self._pending}
+                    raise
+        return {"success": True, "written": len(batch)}
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except (OSError, sqlite3.Error) as exc:
+                print(f"status broker: flush failed: {exc}", file=sys.stderr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+
+_BROKER = None
+
+
+def _resolve_broker_socket():
+    """Resolve the broker socket path next to the status registry."""
+    return _resolve_status_file().parent / Path(STATUS_BROKER_SOCKET).name
+
+
+def _status_broker_request(op, args=None, timeout=STATUS_BROKER_TIMEOUT):
+    """Send one operation to the running status broker.
+
+    Returns:
+        The operation result, or ``NO_BROKER`` if no broker is listening
+        (or this process is the broker).
+
+    Raises:
+        RuntimeError: If the broker rejected or failed the operation.
+    """
+    if _BROKER is not None:
+        return NO_BROKER
+    return broker_request(
+        _resolve_broker_socket(), op, args, timeout, "status broker"
+    )
+
+
+def serve_broker(flush_interval=STATUS_BROKER_FLUSH_INTERVAL):
+    """Run the status broker in the foreground until interrupted.
+
+    Agents (the CLI ``update`` and ``HeartbeatClient``) hand their updates
+    to the broker, which keeps only the latest record per agent and writes
+    them all every *flush_interval* seconds, so a fleet costs one registry
+    write per interval instead of one per heartbeat.  Buffered updates are
+    written on shutdown.
+
+    Returns:
+        dict: Result with ``success`` and ``message``.
+    """
+    global _BROKER
+
+    sock_path = _resolve_broker_socket()
+    if not claim_broker_socket(sock_path):
+        return {
+            "success": False,
+            "message": f"A status broker is already listening on {sock_path}",
+        }
+
+    _BROKER = _StatusBroker(flush_interval)
+    server = BrokerServer(sock_path, {
+        "submit": _BROKER.submit,
+        "flush": _BROKER.flush,
+        "ping": lambda: {"success": True},
+    })
+    try:
+        serve_broker_socket(server, sock_path, "status broker")
+    finally:
+        _BROKER.close()
+        _BROKER = None
+
+    return {"success": True, "message": "Status broker stopped"}
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
@@ -253,10 +2325,20 @@ def _build_parser():
             "Examples:\n"
             '  %(prog)s update coordinator active "Assigning tasks" 10\n'
             '  %(prog)s update impl-a blocked "Waiting for API" 30 coordinator\n'
-            "  %(prog)s get coordinator\n"
+            "  printf '{\"agent\": \"impl-a\"}\\n{\"agent\": \"impl-b\"}\\n' | \\\n"
+            "      %(prog)s update-batch --status awaiting --task \"Phase gate\"\n"
+            "  %(prog)s get coordinator --eta\n"
             "  %(prog)s get\n"
             "  %(prog)s remove impl-b\n"
             "  %(prog)s reset\n"
+            "  %(prog)s get --status blocked --team code-implementation\n"
+            "  %(prog)s migrate --store sqlite\n"
+            "  %(prog)s export-json\n"
+            "  %(prog)s reap --dry-run\n"
+            "  %(prog)s serve\n"
+            "  %(prog)s events --follow\n"
+            "  %(prog)s federation --status blocked\n"
+            "  %(prog)s history --agent impl-a --since 2h\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
@@ -273,10 +2355,35 @@ def _build_parser():
     up.add_argument("task", help="Short task description")
     up.add_argument("progress", type=int, help="Completion percentage (0-100)")
     up.add_argument("blocked_by", nargs="?", default=None, help="Blocking agent/resource")
+    up.add_argument("--watch-pid", type=int, default=None,
+                    help="Long-lived agent process; reap the agent when it exits")
+    up.add_argument("--team", default=None, help="Team the agent belongs to")
+
+    # update-batch
+    ub = sub.add_parser(
+        "update-batch",
+        help="Update many agents at once from JSON/NDJSON on stdin",
+        description=(
+            "Read agent updates from stdin (a JSON array, NDJSON, or a status "
+            "document) and apply them in one transaction.  Each update has "
+            "agent_name, status and optionally task, progress, blocked_by; "
+            "omitted task/progress keep the agent's current values."
+        ),
+    )
+    ub.add_argument("--status", choices=sorted(VALID_STATUSES), default=None,
+                    help="Status for updates that do not set one")
+    ub.add_argument("--task", default=None, help="Task for updates that do not set one")
+    ub.add_argument("--progress", type=int, default=None,
+                    help="Progress for updates that do not set one")
 
     # get
     gt = sub.add_parser("get", help="Get status for one or all agents")
     gt.add_argument("agent_name", nargs="?", default=None, help="Agent name (omit for all)")
+    gt.add_argument("--status", choices=sorted(VALID_STATUSES), default=None,
+                    help="Only agents with this status")
+    gt.add_argument("--team", default=None, help="Only agents of this team")
+    gt.add_argument("--eta", action="store_true",
+                    help="Forecast completion times from recent progress")
 
     # remove
     rm = sub.add_parser("remove", help="Remove an agent from the registry")
@@ -285,6 +2392,61 @@ def _build_parser():
     # reset
     sub.add_parser("reset", help="Reset the entire status registry")
 
+    # migrate
+    mig = sub.add_parser("migrate", help="Switch between JSON, per-agent and SQLite storage")
+    mig.add_argument("--store", choices=STORES, required=True, help="Target layout")
+
+    # export-json
+    ex = sub.add_parser("export-json",
+                        help="Write the registry as agent-status.json for JSON readers")
+    ex.add_argument("--output", default=None,
+                    help="Destination file (default: shared-state/agent-status.json)")
+
+    # reap
+    rp = sub.add_parser("reap", help="Move agents that stopped heartbeating to offline")
+    rp.add_argument("--dry-run", action="store_true", help="Report without changing anything")
+    rp.add_argument("--loop", action="store_true",
+                    help="Keep reaping every --interval seconds until interrupted")
+    rp.add_argument("--interval", type=float, default=REAP_INTERVAL.total_seconds(),
+                    help="Seconds between passes with --loop (default: %(default)s)")
+
+    # serve
+    sv = sub.add_parser("serve", help="Run a broker that batches updates from many agents")
+    sv.add_argument("--flush-interval", type=float, default=STATUS_BROKER_FLUSH_INTERVAL,
+                    help="Seconds between batched writes (default: %(default)s)")
+
+    # federation
+    fed = sub.add_parser("federation",
+                         help="Query agents across every project under projects/")
+    fed.add_argument("--status", choices=sorted(VALID_STATUSES), default=None,
+                     help="Only agents with this status")
+    fed.add_argument("--team", default=None, help="Only agents of this team")
+    fed.add_argument("--project", default=None, help="Only this project")
+    fed.add_argument("--root", default=None,
+                     help="Foundry root containing projects/ (default: auto-detect)")
+
+    # events
+    ev = sub.add_parser("events", help="Read or follow the registry change-event log")
+    ev.add_argument("--offset", type=int, default=None,
+                    help="Resume from this offset (default: 0, or the end with --follow)")
+    ev.add_argument("--limit", type=int, default=None, help="Return at most N events")
+    ev.add_argument("--follow", action="store_true",
+                    help="Stream new events as NDJSON until interrupted")
+
+    # history
+    hist = sub.add_parser("history", help="Show an agent's recorded heartbeats")
+    hist.add_argument("--agent", required=True, help="Agent identifier")
+    hist.add_argument("--since", default=None,
+                      help="Start time: ISO timestamp or age such as 30m, 2h, 7d")
+    hist.add_argument("--until", default=None, help="End time, same formats as --since")
+    hist.add_argument("--limit", type=int, default=None,
+                      help="Only the most recent N samples in the range")
+
+    # compact-history
+    ch = sub.add_parser("compact-history",
+                        help="Apply retention and downsampling to heartbeat history")
+    ch.add_argument("--agent", default=None, help="Only this agent (default: all)")
+
     return parser
 
 
@@ -296,7 +2458,12 @@ def _try_legacy_invocation():
 
     Returns True if the invocation was handled, False otherwise.
     """
-    subcommands = {"update", "get", "remove", "reset", "-h", "--help"}
+    subcommands = {
+        "update", "update-batch", "get", "remove", "reset", "migrate",
+        "export-json", "reap", "serve", "federation", "events", "history",
+        "compact-history",
+        "-h", "--help",
+    }
     if len(sys.argv) >= 5 and sys.argv[1] not in subcommands:
         agent_name = sys.argv[1]
         status = sys.argv[2]
@@ -306,7 +2473,7 @@ def _try_legacy_invocation():
         try:
             result = update_status(agent_name, status, task, progress, blocked_by)
             print(json.dumps(result, indent=2))
-        except ValueError as exc:
+        except (ValueError, RuntimeError) as exc:
             print(f"Error: {exc}", file=sys.stderr)
             sys.exit(1)
         return True
@@ -329,17 +2496,71 @@ def main():
         try:
             result = update_status(
                 args.agent_name, args.status, args.task,
-                args.progress, args.blocked_by,
+                args.progress, args.blocked_by, args.watch_pid, team=args.team,
             )
+        except (ValueError, RuntimeError) as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
+    elif args.command == "update-batch":
+        try:
+            updates = _parse_updates(sys.stdin.read(), {
+                "status": args.status, "task": args.task, "progress": args.progress,
+            })
+            result = update_many(updates)
+        except (ValueError, RuntimeError) as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
+    elif args.command in ("get", "remove", "reset"):
+        # These flush a running broker first, which raises RuntimeError if
+        # the broker cannot write
+        try:
+            if args.command == "get":
+                result = get_status(args.agent_name, args.status, args.team, args.eta)
+            elif args.command == "remove":
+                result = remove_agent(args.agent_name)
+            else:
+                result = reset_all()
+        except RuntimeError as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            sys.exit(1)
+    elif args.command == "migrate":
+        result = migrate_storage(args.store)
+    elif args.command == "export-json":
+        result = export_json(args.output)
+    elif args.command == "reap":
+        if not args.loop:
+            result = reap_stale(args.dry_run)
+        else:
+            try:
+                while True:
+                    result = reap_stale(args.dry_run)
+                    if result["reaped"]:
+                        print(json.dumps(result), flush=True)
+                    time.sleep(args.interval)
+            except KeyboardInterrupt:
+                return
+    elif args.command == "serve":
+        result = serve_broker(args.flush_interval)
+    elif args.command == "federation":
+        result = federated_status(args.status, args.team, args.project, args.root)
+    elif args.command == "events":
+        if not args.follow:
+            result = read_events(args.offset or 0, args.limit)
+        else:
+            try:
+                for event in follow_events(args.offset):
+                    print(json.dumps(event), flush=True)
+            except KeyboardInterrupt:
+                pass
+            return
+    elif args.command == "history":
+        try:
+            result = get_history(args.agent, args.since, args.until, args.limit)
         except ValueError as exc:
             print(f"Error: {exc}", file=sys.stderr)
             sys.exit(1)
-    elif args.command == "get":
-        result = get_status(args.agent_name)
-    elif args.command == "remove":
-        result = remove_agent(args.agent_name)
-    elif args.command == "reset":
-        result = reset_all()
+    elif args.command == "compact-history":
+        result = compact_history(args.agent)
     else:
         parser.print_help()
         sys.exit(1)